@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark fanning out requests to many REST resources.
+
+GET requests for 1000 members of a collection are made to a local stand-in
+server (see ``tests/stand_in_async_http.py``, run in another process) that
+takes 5 ms to respond, with
+`~pyneric.rest_requests.RestCollection` resources from a pool of 16 threads
+and with `~pyneric.async_rest_requests.AsyncRestCollection` resources limited
+to 64 connections.  This requires Python 3.5+.
+
+Run from the project root::
+
+    PYTHONPATH=src python benchmarks/bench_async_rest_requests.py
+
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from pyneric.future import *
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import os
+import sys
+import timeit
+
+from pyneric.async_requests import StreamTransport
+from pyneric.async_rest_requests import AsyncRestCollection
+from pyneric.requests import SessionPool
+from pyneric.rest_requests import RestCollection
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+from stand_in_async_http import StandInAsyncServer, delayed  # noqa: E402
+
+
+NUMBER = 1000
+
+THREADS = 16
+
+CONNECTIONS = 64
+
+
+class Things(RestCollection):
+    url_path = 'things'
+
+
+class AsyncThings(AsyncRestCollection):
+    url_path = 'things'
+
+
+def serve(queue):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = StandInAsyncServer(delayed(0.005))
+    loop.run_until_complete(server.__aenter__())
+    queue.put(server.url)
+    # Serve until signaled.
+    loop.run_until_complete(loop.run_in_executor(None, queue.get))
+    loop.run_until_complete(server.__aexit__(None, None, None))
+    queue.put(server.connections)
+
+
+def threaded(root):
+    with SessionPool(max_connections_per_host=THREADS) as pool, \
+            ThreadPoolExecutor(THREADS) as executor:
+        things = [Things(root, i) for i in range(NUMBER)]
+        for thing in things:
+            thing.session_pool = pool
+        for response in executor.map(lambda x: x.get(), things):
+            response.raise_for_status()
+
+
+def asynchronous(root):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    transport = StreamTransport(max_connections=CONNECTIONS,
+                                max_connections_per_host=CONNECTIONS)
+    things = [AsyncThings(root, i) for i in range(NUMBER)]
+    for thing in things:
+        thing.transport = transport
+    try:
+        responses = loop.run_until_complete(
+            asyncio.gather(*[x.get() for x in things]))
+        loop.run_until_complete(transport.close())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    for response in responses:
+        response.raise_for_status()
+
+
+def requests_per_second(func, *args):
+    start = timeit.default_timer()
+    func(*args)
+    return NUMBER / (timeit.default_timer() - start)
+
+
+def main():
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(queue,))
+    process.start()
+    try:
+        url = queue.get()
+        threads = requests_per_second(threaded, url)
+        coroutines = requests_per_second(asynchronous, url)
+        queue.put(True)
+        connections = queue.get()
+    finally:
+        process.join()
+    print("GET requests per second with a 5 ms response time: "
+          "{} threads {:.0f}, asyncio ({} connections) {:.0f} ({:.1f}x); "
+          "{} connections in all".format(
+              THREADS, threads, CONNECTIONS, coroutines, coroutines / threads,
+              connections))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark `pyneric.future` startup and `~pyneric.future.ensure_text` calls.
+
+The import time of `pyneric.future` is compared with that of the
+python-future modules that it imported unconditionally before its Python 3
+fast path, and :func:`~pyneric.future.ensure_text` is compared with its
+python-future based implementation (reproduced here).
+
+Run from the project root::
+
+    PYTHONPATH=src python benchmarks/bench_future.py
+
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import sys
+import timeit
+
+from bench_import import run_time
+
+from pyneric.future import *
+
+
+def legacy_ensure_text(value, encoding=sys.getdefaultencoding(),
+                       errors='strict', coerce=False):
+    if isinstance(value, future.native_bytes):
+        value = value.decode(encoding, errors)
+    elif not isinstance(value, future.text_type):
+        if not coerce:
+            raise TypeError("{!r} is not a string type.".format(type(value)))
+        value = future.text_type(value)
+    return future.native(value)
+
+
+def main():
+    for name, code in (
+            ("pyneric.future", 'import pyneric.future'),
+            ("previous imports", 'import future.utils, future.builtins, '
+                                 'past.builtins'),
+            ("future.utils only", 'import future.utils')):
+        print("{:<24} {:8.2f} ms".format(name, run_time(code, 10)))
+    for value in ('text', b'bytes', 1):
+        legacy = min(timeit.repeat(
+            lambda: legacy_ensure_text(value, coerce=True), number=100000))
+        current = min(timeit.repeat(
+            lambda: ensure_text(value, coerce=True), number=100000))
+        print("ensure_text({!r:<8})    legacy {:6.1f} ns  current {:6.1f} ns"
+              .format(value, legacy * 10000, current * 10000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark the cold-start import time of the `pyneric` package.
+
+Each scenario is timed within new interpreters (so nothing is imported
+beforehand), and the best time is reported.  The "eager" scenario imports
+every module that the package exposes, which is what importing the package
+used to cost.  (``-X importtime`` is not used because it does not account for
+modules imported via `importlib`.)
+
+Run from the project root::
+
+    PYTHONPATH=src python benchmarks/bench_import.py [--budget MS]
+
+With ``--budget``, the exit status is nonzero when the time to import pyneric
+and access `~pyneric.util.tryf` exceeds the given number of milliseconds,
+which makes this usable as a guard for short-lived processes.
+
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+SCENARIOS = (
+    ('import pyneric', 'import pyneric'),
+    ('pyneric.tryf', 'import pyneric; pyneric.tryf'),
+    ('pyneric.RestResource', 'import pyneric; pyneric.RestResource'),
+    ('eager (all modules)',
+     'import pyneric.util, pyneric.meta, pyneric.rest_requests'),
+)
+
+
+TIMER = """
+import timeit
+start = timeit.default_timer()
+{}
+print(timeit.default_timer() - start)
+"""
+
+
+def run_time(code, repeat):
+    """Return the best time (ms) of running *code* in a new interpreter."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    command = [sys.executable, '-c', TIMER.format(code)]
+    return min(float(subprocess.check_output(command, env=env))
+               for _ in range(repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--budget', type=float, metavar='MS',
+                        help="maximum time for importing pyneric.tryf")
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    results = {}
+    for name, code in SCENARIOS:
+        results[name] = run_time(code, args.repeat)
+        print("{:<24} {:8.2f} ms".format(name, results[name]))
+    if args.budget is not None and results['pyneric.tryf'] > args.budget:
+        sys.exit("pyneric.tryf import time exceeds the budget ({} ms)."
+                 .format(args.budget))
+
+
+if __name__ == '__main__':
+    main()
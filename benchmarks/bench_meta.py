@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks for `pyneric.meta`.
+
+Metadata reads are compared with plain attribute reads and with the generic
+(uncompiled) access that is used when a `~pyneric.meta.MetadataBehaviour`
+customizes :meth:`~pyneric.meta.MetadataBehaviour.get_metadata`, which is how
+all metadata was accessed before per-class accessors were generated.
+
+The cost of defining many classes (of a simple metaclass and of
+`~pyneric.rest_requests.RestResource`) is also reported for increasing
+numbers of classes; the cost per class should remain constant.  Resource
+classes are also defined with validation deferred (see
+`~pyneric.meta.DEFER_VALIDATION`), which is how a module of many generated
+resource classes can be imported quickly.
+
+Run from the project root::
+
+    PYTHONPATH=src python benchmarks/bench_meta.py
+
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from pyneric.future import *
+
+import timeit
+
+from pyneric import meta
+from pyneric.meta import Metaclass, MetadataBehaviour
+from pyneric.rest_requests import RestResource
+
+
+NUMBER = 200000
+
+
+class GenericMetadataBehaviour(MetadataBehaviour):
+
+    def get_metadata(self, cls, attr=None):
+        return super(GenericMetadataBehaviour, self).get_metadata(cls, attr)
+
+
+class CompiledMeta(Metaclass):
+    __metadata__ = dict(x=None)
+    __propagate__ = ('x',)
+
+
+class GenericMeta(Metaclass):
+    __metadata_behaviour__ = GenericMetadataBehaviour()
+    __metadata__ = dict(x=None)
+    __propagate__ = ('x',)
+
+
+class Compiled(future.with_metaclass(CompiledMeta, object)):
+    x = 1
+
+
+class Generic(future.with_metaclass(GenericMeta, object)):
+    x = 1
+
+
+class Plain(object):
+    x = 1
+
+
+class Resource(RestResource):
+    url_path = 'resources'
+
+
+def time_ns(statement, namespace):
+    timer = timeit.Timer(statement, globals=namespace)
+    return min(timer.repeat(number=NUMBER, repeat=5)) / NUMBER * 1e9
+
+
+def main():
+    namespace = dict(Compiled=Compiled, compiled=Compiled(), Generic=Generic,
+                     generic=Generic(), Plain=Plain, plain=Plain(),
+                     Resource=Resource,
+                     resource=Resource('http://host.net/v1'))
+    rows = (
+        ("class attribute", 'Plain.x', 'Generic.x', 'Compiled.x'),
+        ("instance attribute", 'plain.x', 'generic.x', 'compiled.x'),
+        ("_get_metadata('x')", 'Plain.x', "Generic._get_metadata('x')",
+         "Compiled._get_metadata('x')"),
+        ("Resource.url_path", 'Plain.x', None, 'Resource.url_path'),
+        ("resource.url_path", 'plain.x', None, 'resource.url_path'),
+    )
+    print("{:<20} {:>10} {:>10} {:>10}  (ns per read)"
+          .format("", "plain", "generic", "compiled"))
+    for name, plain, generic, compiled in rows:
+        print("{:<20} {:>10.1f} {:>10} {:>10.1f}".format(
+            name, time_ns(plain, namespace),
+            "-" if generic is None else
+            "{:.1f}".format(time_ns(generic, namespace)),
+            time_ns(compiled, namespace)))
+    print()
+    print("{:<20} {:>10} {:>10} {:>10}  (µs per class)"
+          .format("defining classes", "metaclass", "resource", "deferred"))
+    for count in (1000, 10000):
+        print("{:<20} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+            count, define_classes(Compiled, count),
+            define_classes(Resource, count),
+            define_classes(Resource, count, defer=True)))
+
+
+def define_classes(base, count, defer=False):
+    """Return the time (µs) per class to define *count* subclasses."""
+    metaclass = type(base)
+    names = [future.native_str('C{}'.format(i)) for i in range(count)]
+    meta.DEFER_VALIDATION = defer
+    try:
+        start = timeit.default_timer()
+        for name in names:
+            metaclass(name, (base,), dict(x=name, url_path=name))
+        return (timeit.default_timer() - start) / count * 1e6
+    finally:
+        meta.DEFER_VALIDATION = False
+
+
+if __name__ == '__main__':
+    main()
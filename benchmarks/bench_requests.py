@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark HTTP requests made by REST resources.
+
+Requests are made to a local stand-in server (see ``tests/stand_in_http.py``)
+with the functions of `requests`, as resources previously did (a new session,
+and therefore connection, per request), and through a
+`~pyneric.requests.SessionPool`, as resources now do.
+
+Members of a collection are then fetched from a server that takes 2 ms to
+respond, one at a time and with
+:meth:`~pyneric.rest_requests.RestCollection.fetch_many`.
+
+The members of a collection listed in 20 pages are iterated over with
+:meth:`~pyneric.rest_requests.RestCollection.iter_members` from a server that
+takes 10 ms to respond, processing each page for 10 ms, without and with
+read-ahead.
+
+A resource is then requested repeatedly from a server that takes 2 ms to
+respond with a response fresh for a minute, without and with a
+`~pyneric.requests.ResponseCache`.
+
+Then 32 threads each request a resource 20 times from a server that takes
+10 ms to respond, without and with a `~pyneric.requests.SingleFlight`.
+
+Finally, 8 threads each request a resource 50 times from a server whose quota
+is 200 requests per second (responding 429 beyond it), without and with a
+`~pyneric.rate_limit.RateLimiter` of 90% of that rate, and the mean waits of
+interactive and batch requests sharing the limiter are compared.
+
+Finally, without making requests, the overhead of chains of 1, 5, and 20
+handlers given with ``_handlers`` (as previously chained, slicing the chain
+at each handler, and as now chained) is compared with that of a handler whose
+pipeline has as many `~pyneric.requests.Middleware`.
+
+Run from the project root::
+
+    PYTHONPATH=src python benchmarks/bench_requests.py
+
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from pyneric.future import *
+
+import functools
+import json
+import os
+import sys
+import time
+import timeit
+
+import requests
+
+from pyneric.rate_limit import BATCH, INTERACTIVE, RateLimiter
+from pyneric.requests import (Middleware, RequestHandler, ResponseCache,
+                              SessionPool, SingleFlight)
+from pyneric.rest_requests import RestCollection
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+from stand_in_http import StandInServer, echo  # noqa: E402
+
+
+NUMBER = 500
+
+PAGES = 20
+
+
+class Things(RestCollection):
+    url_path = 'things'
+
+
+def requests_per_second(get):
+    start = timeit.default_timer()
+    for _ in range(NUMBER):
+        get().raise_for_status()
+    return NUMBER / (timeit.default_timer() - start)
+
+
+def fresh_echo(request):
+    time.sleep(0.002)
+    status, headers, body = echo(request)
+    headers['Cache-Control'] = 'max-age=60'
+    return status, headers, body
+
+
+def slow_echo(request):
+    time.sleep(0.002)
+    return echo(request)
+
+
+def fetches_per_second(fetch, root):
+    start = timeit.default_timer()
+    fetch(root)
+    return NUMBER / (timeit.default_timer() - start)
+
+
+def fetch_serially(root):
+    for id in range(NUMBER):
+        Things(root, id).get().raise_for_status()
+
+
+def fetch_concurrently(root):
+    for result in Things.fetch_many(root, range(NUMBER),
+                                    raise_for_status=True):
+        if result.error is not None:
+            raise result.error
+
+
+def paged_echo(request):
+    """Respond with 10 members per page, linking to the next of 20 pages."""
+    time.sleep(0.01)
+    page = int(request.path.partition('page=')[2] or 0)
+    headers = {'Content-Type': 'application/json'}
+    if page < PAGES - 1:
+        headers['Link'] = '<?page={}>; rel="next"'.format(page + 1)
+    body = json.dumps(list(range(page * 10, page * 10 + 10)))
+    return 200, headers, body.encode('utf-8')
+
+
+def process_members(root, read_ahead):
+    start = timeit.default_timer()
+    for member in Things(root).iter_members(read_ahead=read_ahead):
+        if member % 10 == 9:
+            time.sleep(0.01)  # Process the page.
+    return timeit.default_timer() - start
+
+
+HOT_THREADS = 32
+
+
+def hot_echo(request):
+    time.sleep(0.01)
+    return echo(request)
+
+
+def request_hot_resource(thing):
+    """Return the number of requests per second made by the threads."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def request(_):
+        for _ in range(20):
+            thing.get().raise_for_status()
+    start = timeit.default_timer()
+    with ThreadPoolExecutor(HOT_THREADS) as executor:
+        list(executor.map(request, range(HOT_THREADS)))
+    return HOT_THREADS * 20 / (timeit.default_timer() - start)
+
+
+QUOTA = 200
+
+QUOTA_THREADS = 8
+
+
+def quota_echo():
+    """Return a responder allowing only `QUOTA` requests per second (with
+    bursts of a tenth of that)."""
+    quota = RateLimiter(QUOTA, burst=QUOTA // 10)
+
+    def respond(request):
+        if not quota.acquire(timeout=0):
+            return 429, {'Retry-After': '1'}, b''
+        return echo(request)
+    return respond
+
+
+def request_quota_resource(thing, priorities=(INTERACTIVE,)):
+    """Return the number of 429 responses received by the threads and the
+    mean seconds taken by their requests keyed by priority.
+
+    The threads are assigned the priorities in turn.
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def request(index):
+        priority = priorities[index % len(priorities)]
+        start = timeit.default_timer()
+        throttled = sum(thing.get(priority=priority).status_code == 429
+                        for _ in range(50))
+        return priority, throttled, timeit.default_timer() - start
+    with ThreadPoolExecutor(QUOTA_THREADS) as executor:
+        results = list(executor.map(request, range(QUOTA_THREADS)))
+    seconds = {}
+    for priority, _, elapsed in results:
+        seconds.setdefault(priority, []).append(elapsed / 50)
+    return (sum(x[1] for x in results),
+            {k: sum(v) / len(v) for k, v in seconds.items()})
+
+
+CHAIN_NUMBER = 20000
+
+
+class Terminal(object):
+
+    """A stand-in for `requests` ending a chain without making requests."""
+
+    @staticmethod
+    def request(**kwargs):
+        return kwargs
+
+
+class SlicingHandler(RequestHandler):
+
+    """A handler passing on ``_handlers`` as `RequestHandler` previously did.
+    """
+
+    def request(self, method, url, **kwargs):
+        kwargs.update(method=method, url=url)
+        kwargs = self._alter_kwargs(kwargs)
+        handler = requests
+        handlers = kwargs.pop('_handlers', ())
+        if handlers:
+            handler = handlers[0]
+            kwargs = dict(kwargs, _handlers=handlers[1:])
+        send = handler.request
+        priority = kwargs.pop('priority', None)
+        limiter = self.rate_limiter
+        if limiter is not None:
+            send = functools.partial(limiter.request, send, priority=priority)
+        policy = self.retry_policy
+        if policy is not None:
+            send = functools.partial(policy.request, send)
+        cache = self.response_cache
+        if cache is not None:
+            send = functools.partial(cache.request, send)
+        flight = self.single_flight
+        if flight is not None:
+            return flight.request(send, **kwargs)
+        return send(**kwargs)
+
+
+class Passthrough(Middleware):
+
+    def before(self, kwargs):
+        return kwargs
+
+    def after(self, kwargs, response):
+        return response
+
+
+def chain_calls_per_second(handler, **kwargs):
+    timer = timeit.Timer(lambda: handler.get('http://a/', **kwargs))
+    return CHAIN_NUMBER / min(timer.repeat(3, CHAIN_NUMBER))
+
+
+def main():
+    with StandInServer() as server, SessionPool() as pool:
+        thing = Things(server.url, 1)
+        thing.session_pool = pool
+        unpooled = requests_per_second(
+            functools.partial(requests.get, url=thing.url))
+        connections = server.connections
+        pooled = requests_per_second(thing.get)
+        print("GET requests per second: new session each {:.0f} "
+              "({} connections), pooled {:.0f} ({} connection(s)) ({:.1f}x)"
+              .format(unpooled, connections, pooled,
+                      server.connections - connections, pooled / unpooled))
+
+    with StandInServer(slow_echo) as server:
+        serial = fetches_per_second(fetch_serially, server.url)
+        concurrent = fetches_per_second(fetch_concurrently, server.url)
+        print("fetching members with a 2 ms response time (per second): "
+              "serially {:.0f}, fetch_many {:.0f} ({:.1f}x)".format(
+                  serial, concurrent, concurrent / serial))
+
+    with StandInServer(paged_echo) as server:
+        timings = [process_members(server.url, x) for x in (0, 1, 2)]
+        print("iterating over {} pages (ms): read_ahead=0 {:.0f}, "
+              "read_ahead=1 {:.0f}, read_ahead=2 {:.0f}".format(
+                  PAGES, *(1000 * x for x in timings)))
+
+    with StandInServer(fresh_echo) as server, SessionPool() as pool:
+        thing = Things(server.url, 1)
+        thing.session_pool = pool
+        uncached = requests_per_second(thing.get)
+        thing.response_cache = ResponseCache()
+        requests_before = len(server.requests)
+        cached = requests_per_second(thing.get)
+        print("repeated GET requests per second with a 2 ms response time: "
+              "uncached {:.0f}, cached {:.0f} ({} request(s) sent) ({:.1f}x)"
+              .format(uncached, cached,
+                      len(server.requests) - requests_before,
+                      cached / uncached))
+
+    with StandInServer(hot_echo) as server, \
+            SessionPool(max_connections_per_host=HOT_THREADS) as pool:
+        thing = Things(server.url, 1)
+        thing.session_pool = pool
+        separate = request_hot_resource(thing)
+        requests_before = len(server.requests)
+        thing.single_flight = SingleFlight()
+        coalesced = request_hot_resource(thing)
+        print("{} threads requesting a resource with a 10 ms response time "
+              "(per second): separately {:.0f}, single-flight {:.0f} "
+              "({} requests sent) ({:.1f}x)".format(
+                  HOT_THREADS, separate, coalesced,
+                  len(server.requests) - requests_before,
+                  coalesced / separate))
+
+    with StandInServer(quota_echo()) as server, \
+            SessionPool(max_connections_per_host=QUOTA_THREADS) as pool:
+        thing = Things(server.url, 1)
+        thing.session_pool = pool
+        unlimited = request_quota_resource(thing)[0]
+        time.sleep(1)  # Let the server's quota recover.
+        # The requests are spaced evenly at 90% of the quota to absorb
+        # the jitter of their arrival at the server.
+        thing.rate_limiter = RateLimiter(0.9 * QUOTA, burst=1)
+        limited, _ = request_quota_resource(thing)
+        print("{} threads making {} requests to a server with a quota of {} "
+              "per second: 429 responses unlimited {}, rate-limited {}"
+              .format(QUOTA_THREADS, QUOTA_THREADS * 50, QUOTA, unlimited,
+                      limited))
+        _, seconds = request_quota_resource(thing, (INTERACTIVE, BATCH))
+        print("mean time per request (ms) sharing the rate limiter: "
+              "interactive {:.1f}, batch {:.1f}".format(
+                  1000 * seconds[INTERACTIVE], 1000 * seconds[BATCH]))
+
+    for length in (1, 5, 20):
+        sliced = chain_calls_per_second(
+            SlicingHandler(),
+            _handlers=(SlicingHandler(),) * (length - 1) + (Terminal,))
+        chained = chain_calls_per_second(
+            RequestHandler(),
+            _handlers=(RequestHandler(),) * (length - 1) + (Terminal,))
+        handler = RequestHandler()
+        handler.middleware = tuple(Passthrough() for _ in range(length))
+        piped = chain_calls_per_second(handler, _handlers=(Terminal,))
+        print("{} handler(s) (calls per second): previously chained {:.0f}, "
+              "chained {:.0f} ({:.1f}x), pipeline {:.0f} ({:.1f}x)".format(
+                  length, sliced, chained, chained / sliced, piped,
+                  piped / sliced))
+
+
+if __name__ == '__main__':
+    main()
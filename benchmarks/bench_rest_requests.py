@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks for `pyneric.rest_requests`.
+
+The URL of a member nested three collections deep is built by instantiating
+the chain of containers and with
+:meth:`~pyneric.rest_requests.RestResource.url_for`.
+
+Member URLs nested three collections deep are parsed with
+:meth:`~pyneric.rest_requests.RestResource.from_url` and with the previous
+(exception-driven) implementation, which is reproduced here.
+
+A nested resource is instantiated, and its bound
+:meth:`~pyneric.rest_requests.RestResource.get` method and a missing attribute
+are looked up.
+
+URLs are classified among 300 resource classes by trying
+:meth:`~pyneric.rest_requests.RestResource.from_url` of each class in turn
+and with a `~pyneric.rest_requests.RestRouter`.
+
+A graph of 100000 references to 1000 distinct nested resources is built
+without and with interning (see
+:attr:`~pyneric.rest_requests.RestResource.interned`), measuring the time
+taken and the memory retained by the graph.
+
+The URLs of 1000000 members of a collection are generated by instantiating
+each member and with
+:meth:`~pyneric.rest_requests.RestCollection.member_urls` (written to an
+in-memory file), from a `range` of integer ids, an `array.array` of them, and
+a list of text ids (of a collection of text ids).
+
+Run from the project root::
+
+    PYTHONPATH=src python benchmarks/bench_rest_requests.py
+
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from pyneric.future import *
+
+import array
+import io
+import timeit
+import tracemalloc
+from urllib.parse import quote, urlunsplit
+
+from pyneric import rest_requests
+from pyneric.rest_requests import RestCollection, RestRouter
+
+
+NUMBER = 20000
+
+ROOT = 'https://api.example.com/v1'
+
+
+class Accounts(RestCollection):
+    url_path = 'accounts'
+
+
+class Projects(RestCollection):
+    url_path = 'projects'
+    container_class = Accounts
+
+
+class Tasks(RestCollection):
+    url_path = 'tasks'
+    container_class = Projects
+    id_type = int
+
+
+def object_chain():
+    return Tasks(Projects(Accounts(ROOT, 'acme'), 'web site'), 42).url
+
+
+def template():
+    return Tasks.url_for(ROOT, 'acme', 'web site', 42)
+
+
+class Detail(rest_requests.RestResource):
+    url_path = 'detail'
+    container_class = Tasks
+
+
+def legacy_from_url(cls, url):
+    try:
+        return legacy_parse(cls, url)
+    except Exception as exc:
+        raise ValueError(
+            "The URL {!r} is invalid for {}.  {}"
+            .format(url, cls.__name__, exc))
+
+
+def legacy_parse(cls, url):
+    if not issubclass(cls, RestCollection):
+        return legacy_parse_resource(cls, url)
+    try:
+        result = legacy_parse_resource(cls, url)
+    except ValueError:
+        result = None
+    url_split = rest_requests._url_split(rest_requests._ensure_text(url))
+    url_split[2], id = url_split[2].rsplit('/', 1)
+    try:
+        id = cls.validate_id(rest_requests._unquote(id))
+    except ValueError:
+        if result:
+            return result
+        raise
+    collection_url = urlunsplit(url_split)
+    try:
+        member_result = legacy_parse_resource(cls, collection_url, id=id)
+    except ValueError:
+        if result:
+            return result
+        raise
+    if result:
+        raise ValueError(
+            "The URL {!r} is ambiguous for {} as to whether "
+            "it is for the collection or one of its members."
+            .format(url, cls.__name__))
+    return member_result
+
+
+def legacy_parse_resource(cls, url, **kwargs):
+    original_url, url = url, rest_requests._ensure_text(url)
+    url_split = rest_requests._url_split(url)
+    segments = [quote(rest_requests._unquote(x))
+                for x in url_split[2].split('/')]
+    resource_segments = (quote(rest_requests._ensure_text(cls.url_path))
+                         .rstrip('/').split('/'))
+    size = len(resource_segments)
+    if segments[-size:] != resource_segments:
+        multiple = size != 1
+        raise ValueError(
+            "The last {}segment{} of the URL {!r} {} invalid for {}."
+            .format("{} ".format(size) if multiple else "",
+                    "s" if multiple else "", original_url,
+                    "are" if multiple else "is", cls.__name__))
+    url_split[2] = '/'.join(segments[:-size])
+    container = urlunsplit(url_split)
+    if cls.container_class:
+        container = legacy_from_url(cls.container_class, container)
+    return cls(container, **kwargs)
+
+
+class InternedAccounts(Accounts):
+    url_path = 'accounts'
+    interned = True
+
+
+class InternedProjects(Projects):
+    url_path = 'projects'
+    container_class = InternedAccounts
+    interned = True
+
+
+class InternedTasks(Tasks):
+    url_path = 'tasks'
+    container_class = InternedProjects
+    interned = True
+
+
+def build_graph(accounts, projects, tasks, references=100000):
+    """Return a list of references to 1000 distinct nested tasks."""
+    return [tasks(projects(accounts(ROOT, 'acme'), i % 1000 // 100),
+                  i % 1000)
+            for i in range(references)]
+
+
+def measure_graph(*classes):
+    """Return the time (ms) to build a graph and the memory (MB) retained."""
+    start = timeit.default_timer()
+    graph = build_graph(*classes)
+    elapsed = timeit.default_timer() - start
+    assert len(set(graph)) == 1000
+    del graph
+    tracemalloc.start()
+    graph = build_graph(*classes)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del graph
+    return elapsed * 1000, size / 2 ** 20
+
+
+MEMBERS = 1000000
+
+
+class Members(RestCollection):
+    url_path = 'members'
+    id_type = int
+
+
+class Names(RestCollection):
+    url_path = 'names'
+
+
+def member_urls_per_second(func, ids):
+    start = timeit.default_timer()
+    func(ids)
+    return MEMBERS / (timeit.default_timer() - start)
+
+
+def instantiate_members(ids):
+    for id in ids:
+        Members(ROOT, id).url
+
+
+def write_member_urls(ids):
+    Members.member_urls(ROOT, ids, io.StringIO())
+
+
+def write_member_names(ids):
+    Names.member_urls(ROOT, ids, io.StringIO())
+
+
+def define_routed_classes(count=100):
+    """Return *count* collections and two resources nested under each."""
+    classes = []
+    for i in range(count):
+        name = 'things{}'.format(i)
+        collection = type(RestCollection)(
+            future.native_str(name.title()), (RestCollection,),
+            dict(url_path=name))
+        for suffix, is_collection in (('detail', False), ('count', True)):
+            classes.append(type(collection)(
+                future.native_str(name.title() + suffix.title()),
+                (collection,), dict(url_path=suffix,
+                                    container_class=collection,
+                                    container_is_collection=is_collection)))
+        classes.append(collection)
+    return classes
+
+
+def classify(classes, url):
+    for cls in classes:
+        try:
+            cls.from_url(url)
+        except ValueError:
+            continue
+        return cls
+
+
+def time_us(func, number=NUMBER):
+    timer = timeit.Timer(func)
+    return min(timer.repeat(number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    assert object_chain() == template()
+    chain, compiled = time_us(object_chain), time_us(template)
+    print("nested member URL (µs): object chain {:.2f}, url_for {:.2f} "
+          "({:.1f}x)".format(chain, compiled, chain / compiled))
+
+    url = template()
+    assert legacy_from_url(Tasks, url).url == Tasks.from_url(url).url == url
+    legacy = time_us(lambda: legacy_from_url(Tasks, url), 2000)
+    current = time_us(lambda: Tasks.from_url(url), 2000)
+    print("parsing nested member URL (µs): legacy {:.1f}, from_url {:.1f} "
+          "({:.1f}x)".format(legacy, current, legacy / current))
+
+    task = Tasks.from_url(url)
+    detail = Detail(task)
+    print("resource attributes (µs): instantiation {:.2f}, get {:.2f}, "
+          "missing {:.2f}".format(
+              time_us(lambda: Detail(task)), time_us(lambda: detail.get),
+              time_us(lambda: hasattr(detail, 'missing'))))
+
+    build_graph(InternedAccounts, InternedProjects, InternedTasks, 10)
+    plain = measure_graph(Accounts, Projects, Tasks)
+    interned = measure_graph(InternedAccounts, InternedProjects,
+                             InternedTasks)
+    print("graph of 100000 references to 1000 resources: time (ms) "
+          "{:.0f} vs interned {:.0f}, memory (MB) {:.1f} vs interned {:.1f}"
+          .format(plain[0], interned[0], plain[1], interned[1]))
+
+    assert (list(Members.member_urls(ROOT, range(100))) ==
+            [Members(ROOT, x).url for x in range(100)])
+    instantiated = member_urls_per_second(instantiate_members, range(MEMBERS))
+    names = [str(x) for x in range(MEMBERS)]
+    print("member URLs per second (thousands): instantiated {:.0f}, "
+          "member_urls of range {:.0f}, array {:.0f}, text ids {:.0f}".format(
+              instantiated / 1000,
+              member_urls_per_second(write_member_urls, range(MEMBERS)) / 1000,
+              member_urls_per_second(
+                  write_member_urls, array.array('q', range(MEMBERS))) / 1000,
+              member_urls_per_second(write_member_names, names) / 1000))
+
+    classes = define_routed_classes()
+    router = RestRouter(ROOT, classes)
+    urls = [ROOT + '/things50/7/detail', ROOT + '/things99/count',
+            ROOT + '/things3/9']
+    for url in urls:
+        assert classify(classes, url) is router.resolve(url).resource_class
+    trying = time_us(lambda: [classify(classes, x) for x in urls], 20)
+    routing = time_us(lambda: router.resolve_many(urls), 2000)
+    print("classifying 3 URLs among {} classes (µs): from_url {:.0f}, "
+          "router {:.1f} ({:.0f}x)".format(len(classes), trying, routing,
+                                           trying / routing))
+
+
+if __name__ == '__main__':
+    main()
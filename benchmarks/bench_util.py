@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark the case conversion functions of `pyneric.util`.
+
+The current functions are compared with the previous (uncompiled and
+unmemoized) implementations, which are reproduced here verbatim, using a
+workload resembling the keys of API payloads: a limited vocabulary of keys
+that recur many times.
+
+Run from the project root::
+
+    PYTHONPATH=src python benchmarks/bench_util.py
+
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from pyneric.future import *
+
+import re
+import timeit
+
+from pyneric import util
+
+
+def legacy_pascalize(value, validate=True):
+    result_type = type(value)
+    if validate:
+        util.valid_python_identifier(value, exception=True)
+    else:
+        value = ensure_text(value)
+    result = re.sub('(?:^|_)(.)', lambda x: x.group(0)[-1].upper(), value)
+    if type(result) is not result_type:
+        result = result_type(result)
+    return result
+
+
+def legacy_underscore(value, validate=True, multicap=True):
+    result_type = type(value)
+    if validate:
+        util.valid_python_identifier(value, exception=True)
+    else:
+        value = ensure_text(value)
+    patterns = ['[A-Z]']
+    if multicap:
+        patterns.insert(0, '[A-Z]+(?=($|[A-Z][a-z]))')
+    pattern = '(' + '|'.join(patterns) + ')'
+    result = re.sub(pattern, lambda x: "_" + x.groups()[0].lower(), value)[1:]
+    if type(result) is not result_type:
+        result = result_type(result)
+    return result
+
+
+KEYS = ['Field{}Name'.format(i) for i in range(200)] + [
+    'IdentifierWITHMultipleUppers', 'UPPERSAtStart', 'UppersAtEND', 'Id']
+PAYLOAD = KEYS * 50
+SNAKE_PAYLOAD = [legacy_underscore(x) for x in PAYLOAD]
+
+
+def report(name, legacy, current, number=5):
+    legacy_time = min(timeit.repeat(legacy, number=1, repeat=number))
+    current_time = min(timeit.repeat(current, number=1, repeat=number))
+    print("{:<24} legacy {:8.2f} ms  current {:8.2f} ms  speedup {:6.1f}x"
+          .format(name, legacy_time * 1000, current_time * 1000,
+                  legacy_time / current_time))
+
+
+def main():
+    assert [util.underscore(x) for x in PAYLOAD] == SNAKE_PAYLOAD
+    assert util.underscore_many(PAYLOAD, multicap=False) == [
+        legacy_underscore(x, multicap=False) for x in PAYLOAD]
+    assert util.pascalize_many(SNAKE_PAYLOAD) == [
+        legacy_pascalize(x) for x in SNAKE_PAYLOAD]
+    print("{} keys ({} distinct)".format(len(PAYLOAD), len(KEYS)))
+    report("underscore",
+           lambda: [legacy_underscore(x) for x in PAYLOAD],
+           lambda: [util.underscore(x) for x in PAYLOAD])
+    report("underscore_many",
+           lambda: [legacy_underscore(x) for x in PAYLOAD],
+           lambda: util.underscore_many(PAYLOAD))
+    report("pascalize",
+           lambda: [legacy_pascalize(x) for x in SNAKE_PAYLOAD],
+           lambda: [util.pascalize(x) for x in SNAKE_PAYLOAD])
+    report("pascalize_many",
+           lambda: [legacy_pascalize(x) for x in SNAKE_PAYLOAD],
+           lambda: util.pascalize_many(SNAKE_PAYLOAD))
+
+
+if __name__ == '__main__':
+    main()
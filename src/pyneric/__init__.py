@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """The `pyneric` package contains Python helpers and utility functions.
 
-For convenience, many of the library's components are imported by the
+For convenience, many of the library's components are exposed by the
 pyneric package's __init__ module so that they may be accessed directly under
 pyneric, such as:
 
@@ -9,18 +9,63 @@ pyneric, such as:
 * `~pyneric.rest_requests.RestResource`
 * `~pyneric.util.tryf`
 
+These are the public attributes (those in *__all__*) of the modules named in
+`EXPORTING_MODULES`.  With Python 3.7+, such a module is not imported until
+one of its attributes is first accessed from this package, so importing
+pyneric (for example, to use only `~pyneric.util.tryf`) stays inexpensive.
+
 Components (in modules/subpackages) that require extra dependencies should not
-be imported here.  For example `pyneric.fsnotify` depends on `pyinotify`, so
+be exposed here.  For example `pyneric.fsnotify` depends on `pyinotify`, so
 `~pyneric.fsnotify.FileSystemNotifier` must be imported from that module. If it
-was imported here, then the library would need to unconditionally require
+was exposed here, then the library would need to unconditionally require
 `pyinotify`, which is not desired.
 
 """
 
 # flake8: noqa
 
+import sys
+
 from ._version import __version__, __version_info__
-# from .fsnotify import *  # has extra dependencies
-from .meta import *
-from .rest_requests import *
-from .util import *
+
+EXPORTING_MODULES = ('util', 'meta', 'rest_requests')
+"""The modules whose public attributes are exposed by this package.
+
+They are searched in this order (least expensive to import first) for a
+requested attribute.
+
+"""
+
+if sys.version_info < (3, 7):  # no module __getattr__ (PEP 562)
+    # from .fsnotify import *  # has extra dependencies
+    from .meta import *
+    from .rest_requests import *
+    from .util import *
+else:
+    import importlib
+
+    def __getattr__(name):
+        if name == '__all__':
+            value = []
+            for module_name in EXPORTING_MODULES:
+                value.extend(_import(module_name).__all__)
+        elif name in EXPORTING_MODULES:
+            return _import(name)
+        else:
+            for module_name in EXPORTING_MODULES:
+                module = _import(module_name)
+                if name in module.__all__:
+                    value = getattr(module, name)
+                    break
+            else:
+                raise AttributeError(
+                    "module {!r} has no attribute {!r}"
+                    .format(__name__, name))
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(__getattr__('__all__')))
+
+    def _import(module_name):
+        return importlib.import_module('.' + module_name, __name__)
@@ -0,0 +1,746 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous HTTP requests with `asyncio`.
+
+This module requires Python 3.5+, so it is not imported by the `pyneric`
+package.  Unlike `pyneric.requests`, it does not depend on
+`requests:requests`; its default transport, `StreamTransport`, is built on
+`asyncio` streams.
+
+"""
+
+# Support Python 2 & 3 (for consistency; this module requires Python 3.5+).
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from pyneric.future import *
+
+import asyncio
+from collections import OrderedDict
+import copy
+import functools
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
+import json as json_module
+import re
+import ssl
+import string
+from urllib.parse import quote, urlencode, urljoin, urlsplit
+import weakref
+
+from pyneric._version import __version__
+from pyneric.http import v1_1 as http
+from pyneric import util
+
+
+MAX_REDIRECTS = 30
+"""The maximum number of redirects followed for a request."""
+
+_REDIRECT_STATUS_CODES = frozenset((301, 302, 303, 307, 308))
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+_IDEMPOTENT_METHOD_TOKENS = frozenset(
+    x.token for x in http.METHODS if x.idempotent)
+
+_CREDENTIAL_HEADERS = ('Authorization', 'Cookie', 'Proxy-Authorization')
+"""Request header fields not sent again after a redirect to another origin"""
+
+_USER_AGENT = 'pyneric/{}'.format(__version__)
+
+_UNRESERVED_CHARACTERS = frozenset(
+    string.ascii_letters + string.digits + '-._~')
+
+_SAFE_TARGET_CHARACTERS = "!#$%&'()*+,/:;=?@[]~"
+"""Characters not quoted in a request target (as by `requests:requests`)"""
+
+_HEADER_NAME = re.compile(r'[^:\s][^:\r\n]*\Z')
+"""Matches valid header field names (as checked by `http.client`)"""
+
+SUPPORTED_METHODS = http.REQUEST_METHODS
+"""The HTTP methods exposed as methods of `AsyncRequestHandler`"""
+
+
+class Headers(MutableMapping):
+
+    """A mapping of HTTP header fields with case-insensitive names.
+
+    The names are kept as they were last set, but they may be looked up in
+    any case.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._fields = OrderedDict()  # (name, value) keyed by lower name
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, name):
+        return self._fields[name.lower()][1]
+
+    def __setitem__(self, name, value):
+        self._fields[name.lower()] = name, value
+
+    def __delitem__(self, name):
+        del self._fields[name.lower()]
+
+    def __iter__(self):
+        return (name for name, value in self._fields.values())
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, dict(self.items()))
+
+    def copy(self):
+        """Return a copy of these headers."""
+        return type(self)(self._fields.values())
+
+
+class HTTPError(IOError):
+
+    """An error status of a response.
+
+    This is raised by :meth:`AsyncResponse.raise_for_status`; the response is
+    the `response` attribute.
+
+    """
+
+    def __init__(self, message, response):
+        super().__init__(message)
+        self.response = response
+
+
+class AsyncResponse(object):
+
+    """The response to a request made by an asynchronous transport.
+
+    Its attributes correspond to those of the same name in
+    `~requests:requests.Response`; the content is always read completely.
+
+    """
+
+    def __init__(self, method, url, status_code, reason, headers, content):
+        self.method = method
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    def __repr__(self):
+        return '<{} [{}]>'.format(type(self).__name__, self.status_code)
+
+    @property
+    def ok(self):
+        """Whether the status code is less than 400."""
+        return self.status_code < 400
+
+    @property
+    def encoding(self):
+        """The charset of the Content-Type header, or `None`."""
+        for parameter in self.headers.get('Content-Type', '').split(';')[1:]:
+            name, _, value = parameter.partition('=')
+            if name.strip().lower() == 'charset':
+                return value.strip().strip('"')
+        return None
+
+    @property
+    def text(self):
+        """The content decoded with :attr:`encoding` (or UTF-8)."""
+        return self.content.decode(self.encoding or 'utf-8', 'replace')
+
+    def json(self, **kwargs):
+        """Return the content decoded as JSON.
+
+        :param kwargs: keyword arguments of :func:`json.loads`
+
+        """
+        return json_module.loads(self.text, **kwargs)
+
+    def raise_for_status(self):
+        """Raise :class:`HTTPError` if the status code is not :attr:`ok`."""
+        if not self.ok:
+            raise HTTPError(
+                "{} {} for URL {}".format(self.status_code, self.reason,
+                                          self.url),
+                response=self)
+
+
+class AsyncTransport(object):
+
+    """Base class for transports of asynchronous HTTP requests.
+
+    A transport may be used as an asynchronous context manager, which closes
+    it on exit.
+
+    """
+
+    async def request(self, method, url, **kwargs):
+        """Make an HTTP request.
+
+        :param str method: The HTTP method (token) of the request.
+        :param str url: The URL of the request.
+        :param kwargs: The keyword arguments supported by the transport.
+        :returns: the response
+        :rtype: dependent on implementation; `AsyncResponse` by default
+
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """Release any resources (such as connections) of the transport."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class _ConnectionDropped(IOError):
+
+    """The connection was closed before the response began."""
+
+
+class StreamTransport(AsyncTransport):
+
+    """A transport of HTTP/1.1 requests over `asyncio` streams.
+
+    Connections are kept alive and reused for requests to the same scheme,
+    host, and port.
+
+    :param int max_connections: The maximum number of requests in progress
+        (and therefore connections in use) at once; further requests wait.
+    :param int max_connections_per_host: The maximum number of idle
+        connections kept alive for each scheme, host, and port.
+    :param timeout: The default number of seconds allowed for a request
+        (including waiting to be made), or `None` for no limit.
+    :type timeout: float or None
+    :param ssl_context: The `ssl.SSLContext` of HTTPS connections; by
+        default, one from :func:`ssl.create_default_context`.
+
+    A transport must only be used with one event loop.
+
+    """
+
+    def __init__(self, max_connections=100, max_connections_per_host=10,
+                 timeout=None, ssl_context=None):
+        if max_connections < 1:
+            raise ValueError("max_connections must be positive.")
+        if max_connections_per_host < 1:
+            raise ValueError("max_connections_per_host must be positive.")
+        self._max_connections = max_connections
+        self._max_connections_per_host = max_connections_per_host
+        self._timeout = timeout
+        self._ssl_context = ssl_context
+        self._idle = {}  # lists of (reader, writer) keyed by origin
+        self._semaphore = None  # created in the event loop when first used
+
+    @property
+    def max_connections(self):
+        """The maximum number of requests in progress at once."""
+        return self._max_connections
+
+    @property
+    def max_connections_per_host(self):
+        """The maximum number of idle connections kept alive per host."""
+        return self._max_connections_per_host
+
+    @property
+    def timeout(self):
+        """The default number of seconds allowed for a request."""
+        return self._timeout
+
+    @property
+    def idle_connections(self):
+        """The number of idle connections kept alive."""
+        return sum(len(x) for x in self._idle.values())
+
+    async def close(self):
+        """Close the idle connections."""
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for reader, writer in connections:
+                writer.close()
+
+    async def request(self, method, url, params=None, data=None, json=None,
+                      headers=None, allow_redirects=None, timeout=None):
+        """Make an HTTP request.
+
+        :param str method: The HTTP method (token) of the request.
+        :param str url: The URL of the request.
+        :param params: Query parameters appended to the URL.
+        :type params: dict or sequence of pairs
+        :param data: The body of the request; a dict (or sequence of pairs)
+            is form-encoded and text is encoded as UTF-8.
+        :param json: An object sent JSON-encoded as the body instead.
+        :param dict headers: Header fields of the request.
+        :param bool allow_redirects: Whether redirects are followed; by
+            default, they are unless the method is HEAD.
+        :param timeout: The number of seconds allowed for the request if
+            not :attr:`timeout`.
+        :type timeout: float or None
+        :returns: the response
+        :rtype: `AsyncResponse`
+        :raises ValueError: if the URL is not an absolute HTTP(S) URL
+        :raises asyncio.TimeoutError: if the timeout is exceeded
+        :raises IOError: if the connection or the response fails
+
+        """
+        if allow_redirects is None:
+            allow_redirects = method != http.HEAD.token
+        if timeout is None:
+            timeout = self._timeout
+        coroutine = self._request(method, url, params, data, json, headers,
+                                  allow_redirects)
+        if timeout is None:
+            return await coroutine
+        return await asyncio.wait_for(coroutine, timeout)
+
+    async def _request(self, method, url, params, data, json, headers,
+                       allow_redirects):
+        headers = Headers(headers or ())
+        if params:
+            url += ('&' if urlsplit(url).query else '?') + urlencode(params)
+        if json is not None:
+            data = json_module.dumps(json)
+            headers.setdefault('Content-Type', 'application/json')
+        elif isinstance(data, (dict, list, tuple)):
+            data = urlencode(data)
+            headers.setdefault('Content-Type',
+                               'application/x-www-form-urlencoded')
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self._send(method, url, headers, data)
+            status_code = response.status_code
+            if not (allow_redirects and
+                    status_code in _REDIRECT_STATUS_CODES and
+                    'Location' in response.headers):
+                return response
+            location = urljoin(url, response.headers['Location'])
+            if _origin(location) != _origin(url):
+                for name in _CREDENTIAL_HEADERS:
+                    headers.pop(name, None)
+            url = location
+            if (status_code == 303 and method != http.HEAD.token or
+                    status_code in (301, 302) and
+                    method == http.POST.token):
+                method, data = http.GET.token, None
+                headers.pop('Content-Type', None)
+        raise IOError("Exceeded {} redirects.".format(MAX_REDIRECTS))
+
+    async def _send(self, method, url, headers, data):
+        parts = urlsplit(url)
+        origin = _origin(url, parts)
+        if origin is None:
+            raise ValueError("{!r} is not an absolute HTTP(S) URL."
+                             .format(url))
+        message = self._format_request(method, parts, headers, data)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_connections)
+        async with self._semaphore:
+            while True:
+                reader, writer, reused = await self._connect(origin)
+                try:
+                    writer.write(message)
+                    await writer.drain()
+                    response, keep_alive = await self._read_response(
+                        reader, method, url)
+                except (_ConnectionDropped, ConnectionResetError,
+                        BrokenPipeError):
+                    writer.close()
+                    if reused and method.upper() in _IDEMPOTENT_METHOD_TOKENS:
+                        # The server closed the idle connection; retry.
+                        # Other requests might have been processed, so
+                        # they are not sent again.
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                if keep_alive:
+                    self._release(origin, reader, writer)
+                else:
+                    writer.close()
+                return response
+
+    @staticmethod
+    def _format_request(method, parts, headers, data):
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        headers = headers.copy()
+        headers.setdefault('Host', parts.netloc.rpartition('@')[2])
+        headers.setdefault('User-Agent', _USER_AGENT)
+        headers.setdefault('Accept', '*/*')
+        headers.setdefault('Accept-Encoding', 'identity')
+        if data is not None or method in (http.POST.token, http.PUT.token,
+                                          http.patch.PATCH.token):
+            headers['Content-Length'] = str(len(data or b''))
+        lines = ['{} {} HTTP/1.1'.format(method, _requote(target))]
+        for name, value in headers.items():
+            value = str(value)
+            if not _HEADER_NAME.match(name):
+                raise ValueError("Invalid header name {!r}".format(name))
+            if '\r' in value or '\n' in value:
+                raise ValueError("Invalid header value {!r}".format(value))
+            lines.append('{}: {}'.format(name, value))
+        lines.extend(('', ''))
+        return '\r\n'.join(lines).encode('latin-1') + (data or b'')
+
+    async def _connect(self, origin):
+        connections = self._idle.get(origin)
+        while connections:
+            reader, writer = connections.pop()
+            if reader.at_eof() or writer.transport.is_closing():
+                writer.close()
+                continue
+            return reader, writer, True
+        scheme, host, port = origin
+        context = None
+        if scheme == 'https':
+            context = self._ssl_context
+            if context is None:
+                context = self._ssl_context = ssl.create_default_context()
+        reader, writer = await asyncio.open_connection(host, port,
+                                                       ssl=context)
+        return reader, writer, False
+
+    def _release(self, origin, reader, writer):
+        connections = self._idle.setdefault(origin, [])
+        if len(connections) < self._max_connections_per_host:
+            connections.append((reader, writer))
+        else:
+            writer.close()
+
+    async def _read_response(self, reader, method, url):
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise _ConnectionDropped(
+                    "The connection was closed without a response.")
+            try:
+                version, status, reason = (
+                    line.decode('latin-1').rstrip('\r\n').split(' ', 2) +
+                    [''])[:3]
+                status_code = int(status)
+            except ValueError:
+                raise IOError("Invalid HTTP status line: {!r}".format(line))
+            headers = Headers()
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                name, value = name.strip(), value.strip()
+                if name in headers:
+                    value = headers[name] + ', ' + value
+                headers[name] = value
+            if not 100 <= status_code < 200:
+                break  # not an interim response
+        connection = _tokens(headers.get('Connection', ''))
+        if version == 'HTTP/1.0':
+            keep_alive = 'keep-alive' in connection
+        else:
+            keep_alive = 'close' not in connection
+        if method == http.HEAD.token or status_code in (204, 304):
+            content = b''
+        elif 'chunked' in _tokens(headers.get('Transfer-Encoding', '')):
+            content = await self._read_chunked(reader)
+        elif 'Content-Length' in headers:
+            content = await reader.readexactly(
+                int(headers['Content-Length']))
+        else:
+            content = await reader.read()
+            keep_alive = False
+        response = AsyncResponse(method, url, status_code, reason, headers,
+                                 content)
+        return response, keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            line = await reader.readline()
+            try:
+                size = int(line.split(b';', 1)[0].strip(), 16)
+            except ValueError:
+                raise IOError("Invalid HTTP chunk size: {!r}".format(line))
+            if not size:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        while await reader.readline() not in (b'\r\n', b'\n', b''):
+            pass  # Skip the trailer section.
+        return b''.join(chunks)
+
+
+def _origin(url, parts=None):
+    """Return the (scheme, host, port) of an HTTP(S) URL, or `None`."""
+    if parts is None:
+        parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    return scheme, parts.hostname, parts.port or _DEFAULT_PORTS[scheme]
+
+
+def _requote(target):
+    """Return the request target (path and query) percent-quoted.
+
+    Like `requests.utils.requote_uri`, characters that are not allowed are
+    quoted, and escapes of unreserved characters are unquoted; if the target
+    has an invalid escape, a percent sign is quoted too.
+
+    """
+    parts = target.split('%')
+    for index in range(1, len(parts)):
+        part = parts[index]
+        code = part[:2]
+        if len(code) == 2 and code.isalnum():
+            try:
+                character = chr(int(code, 16))
+            except ValueError:
+                return quote(target, safe=_SAFE_TARGET_CHARACTERS.replace(
+                    '%', ''))
+            if character in _UNRESERVED_CHARACTERS:
+                parts[index] = character + part[2:]
+                continue
+        parts[index] = '%' + part
+    return quote(''.join(parts), safe=_SAFE_TARGET_CHARACTERS)
+
+
+def _tokens(value):
+    return set(x.strip().lower() for x in value.split(','))
+
+
+_default_transports = weakref.WeakKeyDictionary()
+
+
+def get_default_transport():
+    """Return the `StreamTransport` used by default with the event loop.
+
+    It is created (with default arguments) for the current event loop when
+    this is first called with the loop.
+
+    """
+    loop = asyncio.get_event_loop()
+    transport = _default_transports.get(loop)
+    if transport is None:
+        transport = _default_transports[loop] = StreamTransport()
+    return transport
+
+
+class AsyncSingleFlight(object):
+
+    """A coalescer of concurrent identical requests (from coroutines).
+
+    :param methods: The `~pyneric.http.v1_1.core.Method` objects of requests
+        that are coalesced, which must be safe; by default, GET and HEAD.
+
+    This is like `pyneric.requests.SingleFlight` for the coroutines of an
+    event loop: while a request is in progress, an identical request (with
+    the same method, URL, and other keyword arguments) awaits it and gets a
+    copy of its response (with a true `coalesced` attribute) or raises its
+    exception instead of being made.  The request is made in a task of its
+    own, so it continues for the others if the coroutine that started it is
+    cancelled.
+
+    The numbers of requests made and of those coalesced are counted in the
+    :attr:`made` and :attr:`coalesced` attributes.
+
+    """
+
+    def __init__(self, methods=(http.GET, http.HEAD)):
+        for method in methods:
+            if not method.safe:
+                raise ValueError("{} is not a safe method."
+                                 .format(method.token))
+        self._methods = frozenset(x.token for x in methods)
+        self._flights = {}  # task keyed by request
+        self.made = self.coalesced = 0
+
+    def __len__(self):
+        """Return the number of coalescing requests in progress."""
+        return len(self._flights)
+
+    async def request(self, send, method, url, **kwargs):
+        """Make a request, or await an identical one in progress.
+
+        :param send: The coroutine function making a request, which is called
+            like :meth:`AsyncTransport.request`.
+        :param str method: The HTTP method (token) of the request.
+        :param str url: The URL of the request.
+        :param kwargs: The other keyword arguments of the request.
+        :returns: the response, which has a `coalesced` attribute (see above)
+
+        """
+        method = method.upper()
+        key = None
+        if method in self._methods:
+            try:
+                key = method, url, util._hashable(kwargs)
+            except TypeError:
+                pass
+        if key is None:
+            self.made += 1
+            response = await send(method, url, **kwargs)
+            response.coalesced = False
+            return response
+        task = self._flights.get(key)
+        leading = task is None or task.done()
+        if leading:
+            task = self._flights[key] = asyncio.ensure_future(
+                send(method, url, **kwargs))
+            task.add_done_callback(functools.partial(self._land, key))
+            self.made += 1
+        else:
+            self.coalesced += 1
+        try:
+            response = await asyncio.shield(task)
+        except Exception as exc:
+            if leading or not task.done() or task.cancelled():
+                raise
+            raise util._copy_exception(exc)
+        if leading:
+            response.coalesced = False
+            return response
+        response = copy.copy(response)
+        response.coalesced = True
+        return response
+
+    def _land(self, key, task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if no coroutine awaits it
+
+
+async def acquire(limiter, method='GET', priority=None):
+    """Wait until a request may be made according to a rate limiter.
+
+    :param limiter: The `~pyneric.rate_limit.RateLimiter`, which may also be
+        used by threads.
+    :param str method: The HTTP method (token) of the request.
+    :param priority: The priority lane of the request; by default,
+        `~pyneric.rate_limit.INTERACTIVE`.
+    :type priority: int or None
+
+    This is the asynchronous counterpart of
+    :meth:`pyneric.rate_limit.RateLimiter.acquire`; the event loop is not
+    blocked while waiting, and the request is withdrawn if this is
+    cancelled.
+
+    """
+    ticket = limiter._enqueue(method, priority)
+    try:
+        while True:
+            delay = limiter._try_acquire(ticket)
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+    except BaseException:
+        limiter._withdraw(ticket)
+        raise
+
+
+async def _rate_limited(limiter, send, priority, method, url, **kwargs):
+    """Make a request with *send* once the rate limiter allows it."""
+    await acquire(limiter, method, priority)
+    response = await send(method, url, **kwargs)
+    limiter.observe(response)
+    return response
+
+
+class AsyncRequestHandler(object):
+
+    """Base class for handlers of asynchronous request calls.
+
+    This is the asynchronous counterpart of
+    `pyneric.requests.RequestHandler`: its :meth:`request` coroutine (and
+    those named as the lower-case tokens of `SUPPORTED_METHODS`, such as
+    :meth:`get`) make requests through the :attr:`transport` instead of
+    `requests:requests.request`.
+
+    """
+
+    transport = None
+    """The `AsyncTransport` through which requests are made, or `None` to use
+    the default for the current event loop (see `get_default_transport`)."""
+
+    single_flight = None
+    """The `AsyncSingleFlight` of requests, or `None` not to coalesce
+    requests."""
+
+    rate_limiter = None
+    """The `~pyneric.rate_limit.RateLimiter` of requests, or `None`.
+
+    A `priority` keyword argument of :meth:`request` is the priority lane of
+    the request (see `acquire`).
+
+    """
+
+    def _alter_kwargs(self, kwargs):
+        """Allow altering of the request keyword arguments.
+
+        :param dict kwargs: :meth:`request` keyword arguments
+        :returns: :meth:`request` keyword arguments
+        :rtype: dict
+
+        Override this in a subclass to alter the keyword arguments
+        passed to :meth:`request` if it has not been overridden to skip
+        the calling of this method.
+
+        """
+        return kwargs
+
+    async def request(self, method, url, **kwargs):
+        """Make an HTTP request through the :attr:`transport`.
+
+        :param string method: request call argument
+        :param string url: request call argument
+        :param kwargs: request call keyword arguments (see
+            :meth:`StreamTransport.request`)
+        :returns: result of the request
+        :rtype: dependent on implementation; `AsyncResponse` by default
+
+        This can be overridden in a subclass, but the most common use
+        case is to extend it.
+
+        The keyword arguments are altered by :meth:`_alter_kwargs`.  Given a
+        `_handlers` keyword argument (a sequence of other handlers), the
+        request is made with the first handler's :meth:`request`, which is
+        given the rest.  The request is made through the
+        :attr:`single_flight` and the :attr:`rate_limiter`, if any.
+
+        """
+        kwargs.update(method=method, url=url)
+        kwargs = self._alter_kwargs(kwargs)
+        handler = util._pop_handler(kwargs)
+        if handler is None:
+            handler = self.transport or get_default_transport()
+        send = handler.request
+        priority = kwargs.pop('priority', None)
+        limiter = self.rate_limiter
+        if limiter is not None:
+            send = functools.partial(_rate_limited, limiter, send, priority)
+        flight = self.single_flight
+        if flight is not None:
+            send = functools.partial(flight.request, send)
+        return await send(kwargs.pop('method'), kwargs.pop('url'), **kwargs)
+
+
+for _method in SUPPORTED_METHODS:
+    # A closure is needed to refer to the correct method.
+    def _get_method_func(method):
+        async def _method_func(self, url, **kwargs):
+            kwargs.setdefault('allow_redirects', method.safe)
+            return await self.request(method.token, url, **kwargs)
+        return _method_func
+    _method_func = _get_method_func(_method)
+    _method_func.__name__ = future.native_str(_method.token.lower())
+    _method_func.__doc__ = ("Call :meth:`request` with method '{}'."
+                            .format(_method.token))
+    setattr(AsyncRequestHandler, _method.token.lower(), _method_func)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""The `pyneric.async_rest_requests` module contains asynchronous REST
+resource classes.
+
+This module requires Python 3.5+, so it is not imported by the `pyneric`
+package.  Its resources construct and parse URLs exactly like those of
+`pyneric.rest_requests`, but their request methods are coroutines that make
+requests through an asynchronous transport (see `pyneric.async_requests`).
+
+"""
+
+# Support Python 2 & 3 (for consistency; this module requires Python 3.5+).
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from pyneric.future import *
+
+import functools
+
+from pyneric.async_requests import _rate_limited, get_default_transport
+from pyneric.http import v1_1 as http
+from pyneric import rest_requests
+from pyneric import util
+
+
+__all__ = []
+
+
+@util.add_to_all
+class AsyncRestResource(rest_requests.RestResource):
+
+    """A REST resource whose requests are made asynchronously.
+
+    This is like `~pyneric.rest_requests.RestResource` (with the same
+    metadata, URL construction, and :meth:`from_url`), except that its request
+    methods (:meth:`request`, :meth:`get`, etc.) are coroutines made through
+    its :attr:`transport`, such as::
+
+        response = await Resource(root).get(params=dict(q='value'))
+
+    The synchronous :attr:`response_cache` and :attr:`retry_policy` are not
+    supported: setting either raises `TypeError`, as does a request when
+    either is inherited from a synchronous container.
+
+    """
+
+    async def request(self, method, **kwargs):
+        """Make a request for this resource through its :attr:`transport`.
+
+        :param str method: The HTTP method (token) of the request.
+        :param kwargs: The keyword arguments of the transport's `request`
+            coroutine (see
+            :meth:`pyneric.async_requests.StreamTransport.request`); the URL
+            is this resource's :attr:`url` unless `url` is given, and a
+            `priority` may also be given for the :attr:`rate_limiter` (see
+            :func:`pyneric.async_requests.acquire`).
+        :returns: the response
+        :rtype: `~pyneric.async_requests.AsyncResponse` by default
+
+        Like this coroutine, there is one for each HTTP method supported by
+        `~pyneric.rest_requests.RestResource` (named as its lower-case token,
+        such as :meth:`get`), which takes only the keyword arguments.
+
+        The request is made through the :attr:`single_flight` and the
+        :attr:`rate_limiter`, if any.
+
+        :raises TypeError: if this resource has a :attr:`response_cache` or
+            a :attr:`retry_policy` (inherited from a synchronous container),
+            which are not supported asynchronously
+
+        """
+        for attr in ('response_cache', 'retry_policy'):
+            if getattr(self, attr) is not None:
+                raise TypeError("{} does not support a {}."
+                                .format(type(self).__name__, attr))
+        url = kwargs.pop('url', self._url)
+        priority = kwargs.pop('priority', None)
+        send = self.transport.request
+        limiter = self.rate_limiter
+        if limiter is not None:
+            send = functools.partial(_rate_limited, limiter, send, priority)
+        flight = self.single_flight
+        if flight is not None:
+            return await flight.request(send, method, url, **kwargs)
+        return await send(method, url, **kwargs)
+
+    def _request_function(self, priority=None):
+        raise TypeError("{} makes requests asynchronously."
+                        .format(type(self).__name__))
+
+    _get_function = _request_function
+
+    _transport = None
+
+    @property
+    def transport(self):
+        """The `~pyneric.async_requests.AsyncTransport` of requests.
+
+        Unless this has been set, it is the transport of the :attr:`container`
+        if that is an asynchronous resource; otherwise, it is the default for
+        the current event loop (see
+        :func:`pyneric.async_requests.get_default_transport`).
+
+        """
+        transport = self._transport
+        if transport is not None:
+            return transport
+        if isinstance(self._container, AsyncRestResource):
+            return self._container.transport
+        return get_default_transport()
+
+    @transport.setter
+    def transport(self, value):
+        self._transport = value
+
+    @rest_requests.RestResource.response_cache.setter
+    def response_cache(self, value):
+        self._set_unsupported('response_cache', value)
+
+    @rest_requests.RestResource.retry_policy.setter
+    def retry_policy(self, value):
+        self._set_unsupported('retry_policy', value)
+
+    def _set_unsupported(self, attr, value):
+        if value is not None:
+            raise TypeError("{} does not support a {}."
+                            .format(type(self).__name__, attr))
+
+    @property
+    def single_flight(self):
+        """The `~pyneric.async_requests.AsyncSingleFlight` of requests, if any.
+
+        Unless this has been set, it is the single-flight coalescer of the
+        :attr:`container` if that is an asynchronous resource; otherwise, it
+        is `None`, so concurrent identical requests are each made.
+
+        """
+        flight = self._single_flight
+        if flight is None and isinstance(self._container, AsyncRestResource):
+            return self._container.single_flight
+        return flight
+
+    @single_flight.setter
+    def single_flight(self, value):
+        self._single_flight = value
+
+
+for _method in http.REQUEST_METHODS:
+    # A closure is needed to refer to the correct method.
+    def _get_method_func(method):
+        token = method.token
+
+        async def _method_func(self, **kwargs):
+            return await self.request(token, **kwargs)
+        _method_func.__name__ = future.native_str(token.lower())
+        _method_func.__doc__ = (
+            "Make a {} request for this resource (see :meth:`request`)."
+            .format(token))
+        return _method_func
+    setattr(AsyncRestResource, _method.token.lower(),
+            _get_method_func(_method))
+
+
+@util.add_to_all
+class AsyncRestCollection(AsyncRestResource, rest_requests.RestCollection):
+
+    """A REST collection whose requests are made asynchronously.
+
+    This is like `~pyneric.rest_requests.RestCollection` with the request
+    methods of `AsyncRestResource`.  Its :meth:`fetch_many` and
+    :meth:`iter_members`, which make their requests synchronously, raise
+    `TypeError`.
+
+    """
+
+    @classmethod
+    def fetch_many(cls, container, ids, *args, **kwargs):
+        """Raise `TypeError` (not supported asynchronously)."""
+        raise TypeError("{} does not support fetch_many.".format(cls.__name__))
+
+    def iter_members(self, *args, **kwargs):
+        """Raise `TypeError` (not supported asynchronously)."""
+        raise TypeError("{} does not support iter_members."
+                        .format(type(self).__name__))
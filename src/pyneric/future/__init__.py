@@ -3,6 +3,10 @@
 
 This is equivalent to future.builtins with additions and customizations.
 
+With Python 3, the builtins are native, so the python-future builtins shims
+(`future.builtins` and `past.builtins`) are not imported at all; the exported
+names are defined directly instead.
+
 """
 # flake8: noqa
 
@@ -11,19 +15,24 @@ from __future__ import (absolute_import, division, print_function,
 
 import sys
 
-from future.builtins import *
-from future.builtins import __all__ as _all
-
-
-_all = set(_all)
+_all = set()
 
 _all.add('future')
 from future import utils as future
 
+if future.PY2:
+    from future.builtins import *
+    from future.builtins import __all__ as _builtins_all
+    _all |= set(_builtins_all)
+
 # PY2 note: Remove the basestring import and replace 'basestring' with 'str' in
 # code when removing Python 2 support.
 _all.add('basestring')
-from past.builtins import basestring
+if future.PY2:
+    from past.builtins import basestring
+else:
+    basestring = (bytes, str)
+    """The string types (for `isinstance` and `issubclass` checks)."""
 
 if future.PY2:
     # Purposely allow Python 2.6 to use this package, rather than:
@@ -70,4 +79,24 @@ def ensure_text(value, encoding=sys.getdefaultencoding(), errors='strict',
     return future.native(value)
 
 
+if not future.PY2:
+    _ensure_text_doc = ensure_text.__doc__
+
+    def ensure_text(value, encoding=sys.getdefaultencoding(), errors='strict',
+                    coerce=False):
+        if type(value) is str:
+            return value
+        if isinstance(value, bytes):
+            return value.decode(encoding, errors)
+        if not isinstance(value, str):
+            if not coerce:
+                raise TypeError(
+                    "{!r} is not a string type.".format(type(value)))
+            value = str(value)
+        return value
+
+    ensure_text.__doc__ = _ensure_text_doc
+    del _ensure_text_doc
+
+
 __all__ = list(future.native_str(x) for x in _all)
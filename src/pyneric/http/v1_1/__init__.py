@@ -7,3 +7,20 @@ in this module.
 
 from .core import *
 from . import patch  # noqa
+
+
+REQUEST_METHODS = (
+    GET,
+    OPTIONS,
+    HEAD,
+    POST,
+    PUT,
+    patch.PATCH,
+    DELETE,
+)
+"""The HTTP methods supported by `requests:requests` as functions.
+
+These are exposed as methods of the request handlers of `pyneric.requests`
+and `pyneric.async_requests` and of REST resources.
+
+"""
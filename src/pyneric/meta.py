@@ -9,6 +9,9 @@ from pyneric.future import *
 import collections
 from copy import copy
 import inspect
+import os
+import threading
+import weakref
 
 from pyneric import util
 
@@ -19,6 +22,192 @@ METADATA_BEHAVIOUR_ATTRIBUTE = '__metadata_behaviour__'
 """The `Metaclass` class attribute storing the `MetadataBehaviour` instance."""
 
 
+def _env_flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+DEFER_VALIDATION = _env_flag('PYNERIC_DEFER_VALIDATION')
+"""Whether metadata validation is deferred by default.
+
+This applies to a `MetadataBehaviour` whose `defer_validation` is `None`.  It
+is true when the ``PYNERIC_DEFER_VALIDATION`` environment variable is set to
+"1", "true", "yes", or "on" when this module is imported.
+
+"""
+
+STRICT_VALIDATION = _env_flag('PYNERIC_STRICT_VALIDATION')
+"""Whether metadata validation is never deferred (such as for tests).
+
+When this is true, metadata is always validated when a class is defined,
+regardless of `DEFER_VALIDATION` and
+:attr:`MetadataBehaviour.defer_validation`.  It is initially true when the
+``PYNERIC_STRICT_VALIDATION`` environment variable is set like
+``PYNERIC_DEFER_VALIDATION`` (see `DEFER_VALIDATION`).
+
+"""
+
+
+_behavioural_data_cache = weakref.WeakKeyDictionary()
+"""Resolved behavioural data (read-only) keyed by `Metaclass`"""
+
+
+def _behavioural_data(cls):
+    """Return the behavioural data of a `Metaclass` (cached; do not alter)."""
+    try:
+        return _behavioural_data_cache[cls]
+    except KeyError:
+        result = _behavioural_data_cache[cls] = cls.behavioural_data
+        return result
+
+
+_interned = weakref.WeakKeyDictionary()
+"""Weak references to interned `FrozenMetadata` values keyed by themselves
+
+An interned value is released when no metadata uses it.
+
+"""
+
+
+def _intern(value):
+    try:
+        ref = _interned.get(value)
+        interned = None if ref is None else ref()
+        if interned is None:
+            _interned[value] = weakref.ref(value)
+            interned = value
+    except TypeError:  # unhashable or not weakly referenceable
+        return value
+    return interned
+
+
+class _FrozenDict(collections.Mapping):
+
+    """An immutable (and therefore hashable) mapping."""
+
+    __slots__ = ('_dict', '_hash', '__weakref__')
+
+    def __init__(self, *args, **kwargs):
+        self._dict = dict(*args, **kwargs)
+        self._hash = None
+
+    def __getitem__(self, key):
+        return self._dict[key]
+
+    def __iter__(self):
+        return iter(self._dict)
+
+    def __len__(self):
+        return len(self._dict)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._dict.items()))
+        return self._hash
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self._dict)
+
+
+def _make_frozen_metadata(cls, kwargs):
+    return cls(**kwargs)
+
+
+@util.add_to_all
+class FrozenMetadata(object):
+
+    """Compact, immutable storage of metadata.
+
+    This may be used as the *storage_class* of a `MetadataBehaviour` in place
+    of the default `dict` to reduce the memory used by each class built with a
+    `Metaclass`, which matters when there are very many such classes.
+
+    Instantiating this class returns an instance of a generated subclass with
+    ``__slots__`` for exactly the given metadata attribute names; the subclass
+    is generated only once for each set of names (so effectively once per
+    metaclass).  The values of the attributes named in :attr:`interned` (which
+    are the internally-managed metadata attributes of the default behaviour)
+    are stored as shared immutable (`frozenset` or read-only mapping) values,
+    so classes with the same propagated attributes or base overrides share one
+    copy of them.
+
+    Metadata values are accessible as attributes, and :meth:`_asdict` returns
+    them as a `dict`.  Setting or deleting attributes raises `AttributeError`.
+
+    """
+
+    __slots__ = ()
+
+    interned = ('__propagate__', '__base_overrides__')
+    """The attributes whose values are stored as shared immutable values.
+
+    Override this in a subclass if a `MetadataBehaviour` with other
+    *propagate_attr* or *base_override_attr* values is used.
+
+    """
+
+    _record_classes = weakref.WeakValueDictionary()
+    """Generated subclasses keyed by base class and attribute names
+
+    A subclass is released (and generated again when needed) when it has no
+    instances.
+
+    """
+
+    def __new__(cls, **kwargs):
+        names = tuple(sorted(kwargs))
+        try:
+            record_class = FrozenMetadata._record_classes[cls, names]
+        except KeyError:
+            record_class = type(cls)(
+                future.native_str(cls.__name__), (cls,),
+                dict(__slots__=tuple(future.native_str(x) for x in names),
+                     __module__=cls.__module__))
+            FrozenMetadata._record_classes[cls, names] = record_class
+        self = object.__new__(record_class)
+        for name, value in kwargs.items():
+            if name in cls.interned:
+                if isinstance(value, collections.Mapping):
+                    value = _intern(_FrozenDict(value))
+                elif isinstance(value, collections.Iterable):
+                    value = _intern(frozenset(value))
+            object.__setattr__(self, name, value)
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable.".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is immutable.".format(type(self).__name__))
+
+    def __copy__(self):
+        return self
+
+    def __reduce__(self):
+        return _make_frozen_metadata, (type(self).__bases__[0],
+                                       self._asdict())
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenMetadata):
+            return NotImplemented
+        return self._asdict() == other._asdict()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({})'.format(
+            type(self).__name__,
+            ', '.join('{}={!r}'.format(k, v)
+                      for k, v in sorted(self._asdict().items())))
+
+    def _asdict(self):
+        """Return a new `dict` of the metadata values keyed by name."""
+        return dict((x, getattr(self, x)) for x in type(self).__slots__)
+
+
 @util.add_to_all
 class MetadataBehaviour(object):
 
@@ -39,7 +228,8 @@ class MetadataBehaviour(object):
                  storage_attr='__metadata__',
                  storage_class=dict,
                  metadata_getter='_get_metadata',
-                 validate_transforms=False):
+                 validate_transforms=False,
+                 defer_validation=None):
         # Validate arguments so that issues are caught early.
         attr_dict = dict(metadata_attr=metadata_attr,
                          propagate_attr=propagate_attr,
@@ -66,6 +256,13 @@ class MetadataBehaviour(object):
         self._storage_class = storage_class
         self._metadata_getter = metadata_getter
         self._validate_transforms = validate_transforms
+        self._defer_validation = defer_validation
+        self._storage_is_mapping = issubclass(storage_class,
+                                              collections.Mapping)
+        # Per-metaclass resolutions reused for each class definition
+        self._validators = weakref.WeakKeyDictionary()
+        self._instance_properties = weakref.WeakKeyDictionary()
+        self._getter_method = None
 
     @property
     def metadata_attr(self):
@@ -127,7 +324,9 @@ class MetadataBehaviour(object):
         The class specified must be able to accept user metadata arguments via
         its constructor and provide access to metadata values.  If this is not
         a `~collections.Mapping`, then the metadata values must be accessible
-        as attributes.
+        as attributes, and all of them must be returned (as a `dict`) by an
+        ``_asdict`` method if the instances have no *__dict__* attribute.
+        `FrozenMetadata` is a compact alternative to the default `dict`.
 
         This value is required because the metadata must be stored and accessed
         somehow.
@@ -144,18 +343,50 @@ class MetadataBehaviour(object):
         """
         return self._metadata_getter
 
+    @property
+    def defer_validation(self):
+        """Whether to defer validation of a class's metadata.
+
+        When validation is deferred, the metadata of a class is validated
+        when it is first accessed or the class is first instantiated, and
+        the exceptions that validation raises are raised at that point (and
+        on each subsequent attempt until it succeeds) instead of when the
+        class is defined.  This makes defining many classes faster when not
+        all of them are used.
+
+        If this is `None`, then the module's `DEFER_VALIDATION` value (at the
+        time each class is defined) determines it.  The module's
+        `STRICT_VALIDATION` value overrides this if true.
+
+        """
+        return self._defer_validation
+
     @property
     def storage_is_mapping(self):
         """Return whether the `storage_class` is a `~collections.Mapping`."""
-        return issubclass(self._storage_class, collections.Mapping)
+        return self._storage_is_mapping
 
-    def define_property_if_not_descriptor(self, dict, attr):
+    def define_property_if_not_descriptor(self, dict, attr, fget=None):
         """Define a property in `dict` if it is not already a data descriptor.
 
         :param dict dict: The mapping in which to define the property.
         :param str attr: The key in the mapping to which to set the property.
+        :param fget: The getter of the property; if `None`, the getter
+                     determines on each access whether it is retrieving the
+                     metadata of a class or a propagated value for an instance.
+        :type fget: function or None
 
         """
+        if fget is None:
+            fget = (lambda self, attr=attr, behaviour=self:
+                    getattr(self, behaviour._metadata_getter)(attr)
+                    if isinstance(type(self), _Metametaclass) else
+                    getattr(type(self), attr))
+        self._set_property_if_not_descriptor(
+            dict, attr, _MetadataProperty(fget, behaviour=self))
+
+    @staticmethod
+    def _set_property_if_not_descriptor(dict, attr, prop):
         try:
             value = dict[attr]
         except KeyError:
@@ -163,10 +394,86 @@ class MetadataBehaviour(object):
         else:
             if inspect.isdatadescriptor(value):
                 return
-        dict[attr] = property(lambda self, attr=attr, behaviour=self:
-                              getattr(self, behaviour._metadata_getter)(attr)
-                              if isinstance(type(self), _Metametaclass) else
-                              getattr(type(self), attr))
+        dict[attr] = prop
+
+    def _compiles_access(self):
+        # Metadata access can only be compiled when it is not customized.
+        return type(self).get_metadata == MetadataBehaviour.get_metadata
+
+    def _class_fget(self, attr):
+        """Return a getter of a metadata value for a class."""
+        if not self._compiles_access():
+            return None
+        storage_attr = self._storage_attr
+        if not self._storage_is_mapping:
+            return lambda cls: getattr(getattr(cls, storage_attr), attr)
+
+        def fget(cls):
+            try:
+                return getattr(cls, storage_attr)[attr]
+            except KeyError:
+                util.raise_attribute_error(cls, attr)
+        return fget
+
+    def _instance_fget(self, cls, attr):
+        """Return a getter of a propagated metadata value for an instance.
+
+        :param class cls: The metaclass of the instance's class.
+
+        """
+        for class_ in cls.__mro__:
+            if attr in class_.__dict__:
+                descriptor = class_.__dict__[attr]
+                break
+        else:
+            descriptor = None
+        if (not self._compiles_access() or
+            not isinstance(descriptor, _MetadataProperty) or
+            descriptor.behaviour is not self):
+            # The class attribute is not simply the stored metadata value.
+            return lambda self: getattr(type(self), attr)
+        storage_attr = self._storage_attr
+        if not self._storage_is_mapping:
+            return lambda self: getattr(getattr(type(self), storage_attr),
+                                        attr)
+
+        def fget(self):
+            try:
+                return getattr(type(self), storage_attr)[attr]
+            except KeyError:
+                util.raise_attribute_error(self, attr)
+        return fget
+
+    def _metadata_getter_method(self):
+        """Return the class method retrieving metadata values."""
+        if self._getter_method is None:
+            self._getter_method = self._make_metadata_getter_method()
+        return self._getter_method
+
+    def _make_metadata_getter_method(self):
+        if not self._compiles_access():
+            return classmethod(
+                lambda c, attr=None:
+                getattr(c, METADATA_BEHAVIOUR_ATTRIBUTE).get_metadata(c, attr))
+        storage_attr = self._storage_attr
+        if not self._storage_is_mapping:
+            def get_metadata(cls, attr=None):
+                metadata = getattr(cls, storage_attr)
+                if not attr:
+                    return copy(metadata)
+                return getattr(metadata, attr)
+            return classmethod(get_metadata)
+
+        def get_metadata(cls, attr=None):
+            metadata = getattr(cls, storage_attr)
+            if not attr:
+                return copy(metadata)
+            try:
+                return metadata[attr]
+            except KeyError:
+                pass
+            util.raise_attribute_error(cls, attr)
+        return classmethod(get_metadata)
 
     def _get_local_metadata(self, dict, base_attrs=()):
         result = {}
@@ -196,8 +503,9 @@ class MetadataBehaviour(object):
 
         """
         metadata = getattr(cls, self._storage_attr)
-        if not issubclass(self._storage_class, collections.Mapping):
-            metadata = metadata.__dict__
+        if not self._storage_is_mapping:
+            asdict = getattr(metadata, '_asdict', None)
+            metadata = asdict() if asdict else metadata.__dict__
         metadata = metadata.copy()
         propagate = (set(metadata.pop(self._propagate_attr, ()))
                      if self._propagate_attr else None)
@@ -220,8 +528,7 @@ class MetadataBehaviour(object):
         propagate = set(dict.pop(self._propagate_attr, ()))
         base_overrides = dict.pop(self._base_override_attr, {}).copy()
         if isinstance(cls, _Metametaclass):
-            behaviour = getattr(cls, METADATA_BEHAVIOUR_ATTRIBUTE)
-            m, p, b = behaviour.get_behavioural_data(cls)
+            m, p, b = _behavioural_data(cls)
             result.update(m)
             if p:
                 propagate |= p
@@ -232,7 +539,7 @@ class MetadataBehaviour(object):
             metabases = [x for x in bases if isinstance(x, _Metametaclass)]
             if metabases:
                 for base in reversed(metabases):
-                    m, p, b = base.behavioural_data
+                    m, p, b = _behavioural_data(base)
                     result.update(m)
                     if p:
                         propagate |= p
@@ -262,7 +569,7 @@ class MetadataBehaviour(object):
         metadata = getattr(cls, self._storage_attr)
         if not attr:
             return copy(metadata)
-        if not self.storage_is_mapping:
+        if not self._storage_is_mapping:
             return getattr(metadata, attr)
         try:
             return metadata[attr]
@@ -276,26 +583,215 @@ class MetadataBehaviour(object):
         This sets values in `dict` that must be set during class creation to
         manage the metadata properly.
 
+        The validators and properties are resolved once per metaclass (when
+        its first class is created) and reused.
+
         """
         metadata = self.get_class_metadata(cls, bases, dict)
-        if self._validate_prefix:
-            for attr, value in metadata.items():
+        deferred = self._validate_prefix and self._defers_validation()
+        if self._validate_prefix and not deferred:
+            self._validate(cls, metadata)
+        if self._propagate_attr:
+            properties = self._resolution(self._instance_properties, cls)
+            for attr in metadata[self._propagate_attr]:
                 try:
-                    validate = getattr(cls, self._validate_prefix + attr)
+                    prop = properties[attr]
+                except KeyError:
+                    prop = properties[attr] = _MetadataProperty(
+                        self._instance_fget(cls, attr), behaviour=self)
+                self._set_property_if_not_descriptor(dict, attr, prop)
+        dict[self._storage_attr] = (_DeferredStorage(self, cls, metadata)
+                                    if deferred else
+                                    self._storage_class(**metadata))
+        dict[self._metadata_getter] = self._metadata_getter_method()
+
+    def _defers_validation(self):
+        if STRICT_VALIDATION:
+            return False
+        if self._defer_validation is None:
+            return DEFER_VALIDATION
+        return self._defer_validation
+
+    def _validate(self, cls, metadata):
+        """Validate (and possibly transform) metadata in place.
+
+        :param class cls: The metaclass of the class having the metadata.
+
+        """
+        validators = self._resolution(self._validators, cls)
+        for attr, value in metadata.items():
+            try:
+                validate = validators[attr]
+            except KeyError:
+                validate = validators[attr] = self._get_validator(cls, attr)
+            if validate is None:
+                continue
+            new_value = validate(value)
+            if self._validate_transforms and new_value is not value:
+                metadata[attr] = new_value
+
+    @staticmethod
+    def _resolution(cache, cls):
+        try:
+            return cache[cls]
+        except KeyError:
+            result = cache[cls] = {}
+            return result
+
+    def _get_validator(self, cls, attr):
+        validate = getattr(cls, self._validate_prefix + attr, None)
+        return validate if callable(validate) else None
+
+
+class _MetadataProperty(property):
+
+    """A property defined by a `MetadataBehaviour` to access metadata."""
+
+    def __init__(self, fget, behaviour):
+        super().__init__(fget)
+        self.behaviour = behaviour
+
+
+class _DeferredStorage(object):
+
+    """The metadata storage of a class until its metadata is validated.
+
+    This is a descriptor stored in the class's storage attribute.  When it is
+    accessed, the metadata is validated and the class's storage attribute is
+    replaced by the real storage (which is returned).
+
+    """
+
+    __slots__ = ('behaviour', 'metaclass', 'metadata')
+
+    def __init__(self, behaviour, metaclass, metadata):
+        self.behaviour = behaviour
+        self.metaclass = metaclass
+        self.metadata = metadata
+
+    def __get__(self, instance, owner):
+        storage_attr = self.behaviour.storage_attr
+        for cls in owner.__mro__:
+            if vars(cls).get(storage_attr) is self:
+                break
+        else:  # pragma: no cover
+            raise RuntimeError("deferred metadata storage not found")
+        metadata = self.metadata.copy()
+        self.behaviour._validate(self.metaclass, metadata)
+        storage = self.behaviour.storage_class(**metadata)
+        setattr(cls, storage_attr, storage)
+        cls._Metaclass__pending = False
+        return storage
+
+    def get_unvalidated(self, attr):
+        """Return a metadata value as defined (before validation)."""
+        try:
+            return self.metadata[attr]
+        except KeyError:
+            raise AttributeError(attr)
+
+
+class _MetadataRegistry(object):
+
+    """The classes of a `Metaclass` indexed by some of their metadata.
+
+    Classes are only weakly referenced (and so are metadata values that
+    support weak references), so registration never keeps a class alive.
+
+    """
+
+    def __init__(self, attrs):
+        self.attrs = tuple(attrs)
+        self.classes = weakref.WeakSet()
+        # Per attribute: (weakly keyed index, strongly keyed index, classes
+        # whose value is unhashable); index values are sets of classes.
+        self.indexes = dict(
+            (attr, (weakref.WeakKeyDictionary(), {}, weakref.WeakSet()))
+            for attr in self.attrs)
+        self.lock = threading.Lock()
+
+    def add(self, cls, get_metadata):
+        with self.lock:
+            self.classes.add(cls)
+            for attr in self.attrs:
+                try:
+                    value = get_metadata(attr)
                 except AttributeError:
                     continue
-                if not callable(validate):
+                weak_index, strong_index, unhashable = self.indexes[attr]
+                try:
+                    hash(value)
+                except TypeError:
+                    unhashable.add(cls)
                     continue
-                new_value = validate(value)
-                if self._validate_transforms and new_value is not value:
-                    metadata[attr] = new_value
-        if self._propagate_attr:
-            for attr in metadata[self._propagate_attr]:
-                self.define_property_if_not_descriptor(dict, attr)
-        dict[self._storage_attr] = self._storage_class(**metadata)
-        dict[self._metadata_getter] = classmethod(
-            lambda c, attr=None:
-            getattr(c, METADATA_BEHAVIOUR_ATTRIBUTE).get_metadata(c, attr))
+                try:
+                    weakref.ref(value)
+                except TypeError:
+                    index = strong_index
+                else:
+                    index = weak_index
+                index.setdefault(value, weakref.WeakSet()).add(cls)
+
+    def find(self, attr, value):
+        """Return the set of classes whose *attr* metadata equals *value*."""
+        weak_index, strong_index, unhashable = self.indexes[attr]
+        with self.lock:
+            result = set()
+            try:
+                hash(value)
+            except TypeError:
+                pass
+            else:
+                for index in (weak_index, strong_index):
+                    try:
+                        classes = index[value]
+                    except (KeyError, TypeError):  # TypeError: no weakref
+                        continue
+                    result.update(classes)
+                    if not classes and index is strong_index:
+                        del index[value]
+            candidates = list(unhashable)
+        result.update(c for c in candidates
+                      if _metadata_matches(c, attr, value))
+        return result
+
+
+_registries = weakref.WeakKeyDictionary()
+"""`_MetadataRegistry` instances keyed by the metaclass that owns them"""
+
+_registries_by_metaclass = weakref.WeakKeyDictionary()
+"""Registries to which a `Metaclass`'s classes are added, keyed by it"""
+
+
+def _get_registries(mcs):
+    """Return the registries of the metaclasses of *mcs*'s MRO."""
+    try:
+        return _registries_by_metaclass[mcs]
+    except KeyError:
+        pass
+    registries = []
+    for klass in mcs.__mro__:
+        attrs = vars(klass).get('__indexed_metadata__')
+        if attrs is None:
+            continue
+        if isinstance(attrs, basestring):
+            raise TypeError(
+                "invalid __indexed_metadata__ attribute (string): {!r}"
+                .format(attrs))
+        registry = _registries.get(klass)
+        if registry is None:
+            registry = _registries[klass] = _MetadataRegistry(attrs)
+        registries.append(registry)
+    result = _registries_by_metaclass[mcs] = tuple(registries)
+    return result
+
+
+def _metadata_matches(cls, attr, value):
+    behaviour = getattr(type(cls), METADATA_BEHAVIOUR_ATTRIBUTE)
+    try:
+        return getattr(cls, behaviour.metadata_getter)(attr) == value
+    except AttributeError:
+        return False
 
 
 class _Metametaclass(type):
@@ -305,11 +801,10 @@ class _Metametaclass(type):
                                                   dict, bases)
         metadata = behaviour.get_class_metadata(cls, bases, dict)
         for attr in metadata:
-            behaviour.define_property_if_not_descriptor(dict, attr)
+            behaviour.define_property_if_not_descriptor(
+                dict, attr, behaviour._class_fget(attr))
         dict[behaviour.storage_attr] = behaviour.storage_class(**metadata)
-        dict[behaviour.metadata_getter] = classmethod(
-            lambda c, attr=None:
-            getattr(c, METADATA_BEHAVIOUR_ATTRIBUTE).get_metadata(c, attr))
+        dict[behaviour.metadata_getter] = behaviour._metadata_getter_method()
         new_class = super().__new__(cls, name, bases, dict)
         return new_class
 
@@ -349,7 +844,100 @@ class Metaclass(future.with_metaclass(_Metametaclass, type)):
     __metadata_behaviour__ = MetadataBehaviour()
     """See :class:`MetadataBehaviour`."""
 
+    __indexed_metadata__ = None
+    """The names of metadata attributes by which to index the classes.
+
+    When this is not None in a metaclass definition, the classes created by
+    that metaclass (or a metaclass derived from it) are registered so that
+    they can be queried with :meth:`registered_classes` and
+    :meth:`find_classes`, and lookups on the named metadata attributes are
+    indexed.  An empty iterable registers the classes without indexing any
+    metadata.  Classes are weakly referenced by the registry.
+
+    """
+
     def __new__(cls, name, bases, dict):
         behaviour = getattr(cls, METADATA_BEHAVIOUR_ATTRIBUTE)
         behaviour.prepare_new(cls, bases, dict)
-        return super(Metaclass, cls).__new__(cls, name, bases, dict)
+        new_class = super(Metaclass, cls).__new__(cls, name, bases, dict)
+        storage = vars(new_class).get(behaviour.storage_attr)
+        deferred = isinstance(storage, _DeferredStorage)
+        if deferred or new_class.__pending:
+            # Set the flag on the class itself, so a pending base class does
+            # not make it look pending.
+            new_class.__pending = deferred
+        registries = _get_registries(cls)
+        if registries:
+            if deferred and not behaviour._validate_transforms:
+                # Index the metadata without causing validation.
+                get_metadata = storage.get_unvalidated
+            else:
+                get_metadata = getattr(new_class, behaviour.metadata_getter)
+            for registry in registries:
+                registry.add(new_class, get_metadata)
+        return new_class
+
+    __pending = False
+    # Whether the class's metadata validation is deferred and has not yet
+    # occurred (set on the class; this is the default).
+
+    def __call__(cls, *args, **kwargs):
+        if cls.__pending:
+            # Validate the class's pending metadata before instantiating it.
+            behaviour = getattr(type(cls), METADATA_BEHAVIOUR_ATTRIBUTE)
+            getattr(cls, behaviour.storage_attr)
+        return super(Metaclass, cls).__call__(*args, **kwargs)
+
+    @classmethod
+    def registered_classes(mcs):
+        """Return the set of existing classes created by this metaclass.
+
+        :raises TypeError: if this metaclass does not register its classes
+            (see :attr:`__indexed_metadata__`)
+
+        """
+        registry = mcs._get_registry()
+        with registry.lock:
+            classes = list(registry.classes)
+        return set(c for c in classes if isinstance(c, mcs))
+
+    @classmethod
+    def find_classes(mcs, **criteria):
+        """Return the set of this metaclass's classes matching the criteria.
+
+        Each keyword argument is a metadata attribute name and the value that
+        a class's metadata must equal for it to be included in the result.
+        Indexed attributes (see :attr:`__indexed_metadata__`) are looked up
+        first; any other criteria are then checked on the remaining
+        candidates.
+
+        :raises TypeError: if this metaclass does not register its classes
+
+        """
+        registry = mcs._get_registry()
+        candidates = None
+        others = []
+        for attr, value in criteria.items():
+            if attr not in registry.indexes:
+                others.append((attr, value))
+                continue
+            found = registry.find(attr, value)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return set()
+        if candidates is None:
+            with registry.lock:
+                candidates = list(registry.classes)
+        return set(c for c in candidates
+                   if isinstance(c, mcs) and
+                   all(_metadata_matches(c, attr, value)
+                       for attr, value in others))
+
+    @classmethod
+    def _get_registry(mcs):
+        registries = _get_registries(mcs)
+        if not registries:
+            raise TypeError(
+                "{!r} does not register its classes (__indexed_metadata__ is "
+                "None)".format(mcs))
+        return registries[0]
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""The `pyneric.rate_limit` module contains a scheduler of rate-limited
+requests.
+
+A `RateLimiter` holds token buckets (request budgets) and grants permission
+to make requests to threads (:meth:`RateLimiter.acquire`) and to coroutines
+(:func:`pyneric.async_requests.acquire`) in the order of their priority lanes.
+It does not depend on any HTTP library, so the same limiter may be shared by
+both kinds of callers.
+
+"""
+
+# Support Python 2 & 3.
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from pyneric.future import *  # noqa
+
+from email.utils import mktime_tz, parsedate_tz
+import heapq
+import itertools
+import threading
+import time
+
+from pyneric import util
+
+
+__all__ = ['BATCH', 'INTERACTIVE']
+
+_monotonic = getattr(time, 'monotonic', time.time)
+
+INTERACTIVE = 0
+"""The priority of interactive requests (the default)"""
+
+BATCH = 10
+"""The priority of batch requests, which interactive requests overtake"""
+
+_THROTTLING_STATUS_CODES = frozenset((429, 503))
+"""Status codes of responses whose Retry-After header pauses requests"""
+
+
+def _retry_after_seconds(value, now=None):
+    """Return the number of seconds of a Retry-After value, or `None`.
+
+    The value is either a number of seconds or an HTTP-date.
+
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    parsed = parsedate_tz(value)
+    if not parsed:
+        return None
+    return max(mktime_tz(parsed) - (time.time() if now is None else now), 0)
+
+
+class _Bucket(object):
+
+    """A token bucket: a budget of requests replenished at a constant rate."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'queue')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = self.tokens = capacity
+        self.updated = now
+        self.queue = []  # heap of waiting `_Ticket`s
+
+    def refill(self, now):
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class _Ticket(object):
+
+    """A request waiting in a priority lane of a bucket."""
+
+    __slots__ = ('order', 'bucket', 'enqueued', 'waiting')
+
+    def __init__(self, order, bucket, enqueued):
+        self.order = order  # (priority, sequence number)
+        self.bucket = bucket
+        self.enqueued = enqueued
+        self.waiting = True
+
+    def __lt__(self, other):
+        return self.order < other.order
+
+
+@util.add_to_all
+class RateLimiter(object):
+
+    """A token-bucket rate limiter and priority scheduler of requests.
+
+    :param rate: The number of requests per second allowed for the methods
+        without a budget of their own, or `None` not to limit them.
+    :type rate: float or None
+    :param burst: The number of those requests that may be made at once
+        after none have been made for a while; by default, the rate (at least
+        1).  A burst of 1 spaces the requests evenly, like a leaky bucket.
+    :type burst: int or None
+    :param method_rates: The separate budgets of some methods: a mapping of
+        `~pyneric.http.v1_1.core.Method` objects (or tokens) to a rate or a
+        (rate, burst) pair.
+    :type method_rates: dict or None
+    :param clock: A function returning the current time in seconds; a
+        monotonic clock by default.
+    :raises ValueError: if a rate or burst is not positive
+
+    Each request waits until a token of its method's budget is available and
+    no request of a lower priority number (see `INTERACTIVE` and `BATCH`)
+    nor an earlier request of the same priority is waiting for the budget.
+    All requests wait while paused by a Retry-After header observed with
+    :meth:`observe`.
+
+    The number of requests waiting is the :attr:`queue_depth` (see also
+    :attr:`queue_depths`), and the numbers of requests granted and of
+    responses that paused requests are counted in the :attr:`granted` and
+    :attr:`throttled` attributes.  The seconds waited by the granted
+    requests are summarized by the :attr:`total_wait`, :attr:`max_wait`, and
+    :attr:`mean_wait` attributes.
+
+    """
+
+    def __init__(self, rate=None, burst=None, method_rates=None,
+                 clock=_monotonic):
+        self._clock = clock
+        now = clock()
+        self._default_bucket = (None if rate is None else
+                                self._bucket(rate, burst, now))
+        self._buckets = {}  # `_Bucket` keyed by method token
+        for method, value in (method_rates or {}).items():
+            token = getattr(method, 'token', method).upper()
+            rate, burst = (value if isinstance(value, tuple) else
+                           (value, None))
+            self._buckets[token] = self._bucket(rate, burst, now)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition(threading.Lock())
+        self._paused_until = None
+        self.granted = self.throttled = 0
+        self.total_wait = self.max_wait = 0
+
+    @staticmethod
+    def _bucket(rate, burst, now):
+        if not rate > 0:
+            raise ValueError("A rate must be positive: {!r}".format(rate))
+        if burst is None:
+            burst = max(rate, 1)
+        elif burst < 1:
+            raise ValueError("A burst must be at least 1: {!r}"
+                             .format(burst))
+        return _Bucket(rate, burst, now)
+
+    @property
+    def queue_depth(self):
+        """The number of requests waiting."""
+        return sum(self.queue_depths.values())
+
+    @property
+    def queue_depths(self):
+        """The numbers of requests waiting keyed by priority."""
+        depths = {}
+        with self._condition:
+            for bucket in self._all_buckets():
+                for ticket in bucket.queue:
+                    if ticket.waiting:
+                        priority = ticket.order[0]
+                        depths[priority] = depths.get(priority, 0) + 1
+        return depths
+
+    @property
+    def mean_wait(self):
+        """The mean number of seconds waited by the requests granted."""
+        return self.total_wait / self.granted if self.granted else 0
+
+    def acquire(self, method='GET', priority=INTERACTIVE, timeout=None):
+        """Wait (blocking the thread) until a request may be made.
+
+        :param str method: The HTTP method (token) of the request.
+        :param int priority: The priority lane of the request; lower numbers
+            are served first.
+        :param timeout: The maximum number of seconds to wait, or `None` to
+            wait as long as necessary.
+        :type timeout: float or None
+        :returns: whether the request may be made (false if timed out)
+
+        """
+        ticket = self._enqueue(method, priority)
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._condition:
+            while True:
+                delay = self._poll(ticket)
+                if delay is None:
+                    return True
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self._cancel(ticket)
+                        return False
+                    delay = min(delay, remaining)
+                self._condition.wait(delay)
+
+    def request(self, send, method, url, priority=INTERACTIVE, **kwargs):
+        """Make a request once it may be made, and observe its response.
+
+        :param send: The function making a request, which is called with
+            keyword arguments like `requests:requests.request`.
+        :param str method: The HTTP method (token) of the request.
+        :param str url: The URL of the request.
+        :param int priority: The priority lane of the request (see
+            :meth:`acquire`).
+        :param kwargs: The other keyword arguments of the request.
+        :returns: the response
+
+        """
+        self.acquire(method, priority)
+        response = send(method=method, url=url, **kwargs)
+        self.observe(response)
+        return response
+
+    def observe(self, response):
+        """Pause requests as long as the response says to retry after.
+
+        :param response: A response, with `status_code` and `headers`
+            attributes; its Retry-After header (if any) is only honored with
+            status 429 (Too Many Requests) or 503 (Service Unavailable).
+        :returns: the number of seconds paused, or `None`
+
+        """
+        if response.status_code not in _THROTTLING_STATUS_CODES:
+            return None
+        seconds = _retry_after_seconds(response.headers.get('Retry-After'))
+        if seconds is not None:
+            self.pause(seconds)
+            with self._condition:
+                self.throttled += 1
+        return seconds
+
+    def pause(self, seconds):
+        """Make all requests wait for at least the number of seconds."""
+        with self._condition:
+            until = self._clock() + seconds
+            if self._paused_until is None or until > self._paused_until:
+                self._paused_until = until
+
+    def _all_buckets(self):
+        buckets = list(self._buckets.values())
+        if self._default_bucket is not None:
+            buckets.append(self._default_bucket)
+        return buckets
+
+    def _enqueue(self, method, priority):
+        """Return a `_Ticket` of a request waiting for permission."""
+        if priority is None:
+            priority = INTERACTIVE
+        bucket = self._buckets.get(method.upper(), self._default_bucket)
+        with self._condition:
+            ticket = _Ticket((priority, next(self._sequence)), bucket,
+                             self._clock())
+            if bucket is not None:
+                heapq.heappush(bucket.queue, ticket)
+        return ticket
+
+    def _poll(self, ticket):
+        """Grant the request if possible (with the lock held).
+
+        :returns: `None` if the request was granted; otherwise, the number of
+            seconds after which it should be polled again (unless notified)
+
+        """
+        now = self._clock()
+        if self._paused_until is not None:
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._paused_until = None
+        bucket = ticket.bucket
+        if bucket is not None:
+            queue = bucket.queue
+            while not queue[0].waiting:
+                heapq.heappop(queue)
+            bucket.refill(now)
+            if queue[0] is not ticket or bucket.tokens < 1:
+                ahead = sum(1 for x in queue if x.waiting and x < ticket)
+                return (ahead + 1 - bucket.tokens) / bucket.rate
+            bucket.tokens -= 1
+            heapq.heappop(queue)
+        ticket.waiting = False
+        wait = now - ticket.enqueued
+        self.granted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self._condition.notify_all()  # The next request may be granted.
+        return None
+
+    def _cancel(self, ticket):
+        """Withdraw a waiting request (with the lock held)."""
+        if ticket.waiting:
+            ticket.waiting = False
+            self._condition.notify_all()
+
+    def _try_acquire(self, ticket):
+        """Grant the request if possible (see `_poll`) without waiting."""
+        with self._condition:
+            return self._poll(ticket)
+
+    def _withdraw(self, ticket):
+        with self._condition:
+            self._cancel(ticket)
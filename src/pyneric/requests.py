@@ -6,29 +6,124 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from pyneric.future import *
 
+from collections import OrderedDict, namedtuple
+try:
+    from collections.abc import Iterator, Mapping
+except ImportError:  # Python 2
+    from collections import Iterator, Mapping
+import copy
+import functools
+from email.utils import mktime_tz, parsedate_tz
+try:
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:  # Python 2
+    from cookielib import DefaultCookiePolicy
+import random
+import re
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
 
 from pyneric.http import v1_1 as http
+from pyneric.rate_limit import _retry_after_seconds
+from pyneric import util
 
 
-SUPPORTED_METHODS = (
-    http.GET,
-    http.OPTIONS,
-    http.HEAD,
-    http.POST,
-    http.PUT,
-    http.patch.PATCH,
-    http.DELETE,
-)
+SUPPORTED_METHODS = http.REQUEST_METHODS
 """The HTTP methods supported by `requests:requests` as functions.
 
-These are also exposed as methods in :class:`RequestHandler`."""
+These are also exposed as methods in :class:`RequestHandler` and
+:class:`SessionPool`."""
+
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class Middleware(object):
+
+    """Base class for middleware of the requests of a `RequestHandler`.
+
+    A middleware's :meth:`before` hook is called before a request is made
+    and its :meth:`after` hook after the response is received.  Hooks that
+    are not overridden are skipped when the pipeline is compiled (see
+    :attr:`RequestHandler.middleware`).
+
+    """
+
+    def before(self, kwargs):
+        """Alter the keyword arguments of a request before it is made.
+
+        :param dict kwargs: `requests:requests.request` keyword arguments
+        :returns: `requests:requests.request` keyword arguments
+        :rtype: dict
+
+        """
+        return kwargs
+
+    def after(self, kwargs, response):
+        """Alter (or replace) the response of a request.
+
+        :param dict kwargs: the keyword arguments of the request made
+        :param response: the response
+        :returns: the response
+
+        This is not called if making the request raised an exception.
+
+        """
+        return response
+
+
+def _compile_pipeline(middleware):
+    """Return the hooks of the middleware to call for each request.
+
+    The result is the tuple of the :meth:`Middleware.before` hooks in order
+    and the tuple of the :meth:`Middleware.after` hooks in reverse order,
+    without those that are not overridden.
+
+    """
+    befores = []
+    afters = []
+    for item in middleware:
+        cls = type(item)
+        if getattr(cls, 'before', None) is not Middleware.before:
+            befores.append(item.before)
+        if getattr(cls, 'after', None) is not Middleware.after:
+            afters.append(item.after)
+    return tuple(befores), tuple(reversed(afters))
 
 
 class RequestHandler(object):
 
     """Base class for handlers of request calls."""
 
+    middleware = ()
+    """The `Middleware` through which requests are made, in order.
+
+    The :meth:`~Middleware.before` hooks are called in order (after
+    :meth:`_alter_kwargs`) and the :meth:`~Middleware.after` hooks in reverse
+    order.  The pipeline is compiled when first used and again when this is
+    assigned another sequence, so it should not be modified in place.
+
+    """
+
+    response_cache = None
+    """The `ResponseCache` of requests, or `None` not to cache responses."""
+
+    single_flight = None
+    """The `SingleFlight` of requests, or `None` not to coalesce requests."""
+
+    rate_limiter = None
+    """The `~pyneric.rate_limit.RateLimiter` of requests, or `None`.
+
+    A `priority` keyword argument of :meth:`request` is the priority lane of
+    the request (see :meth:`pyneric.rate_limit.RateLimiter.acquire`).
+
+    """
+
+    retry_policy = None
+    """The `RetryPolicy` of requests, or `None` not to retry requests."""
+
     def _alter_kwargs(self, kwargs):
         """Allow altering of the request keyword arguments.
 
@@ -56,15 +151,52 @@ class RequestHandler(object):
         This can be overridden in a subclass, but the most common use
         case is to extend it.
 
+        The keyword arguments are altered by :meth:`_alter_kwargs` and then
+        by the :attr:`middleware`.  Given a `_handlers` keyword argument (a
+        sequence of other handlers), the request is made with the first
+        handler's :meth:`request`, which is given the rest.  Handlers at the
+        start of the sequence that would only pass the request on
+        (instances of this class without middleware or layers) are left out.
+
         """
         kwargs.update(method=method, url=url)
         kwargs = self._alter_kwargs(kwargs)
-        handler = requests
-        handlers = kwargs.pop('_handlers', ())
-        if handlers:
-            handler = handlers[0]
-            kwargs = dict(kwargs, _handlers=handlers[1:])
-        return handler.request(**kwargs)
+        befores = afters = ()
+        if self.middleware:
+            befores, afters = self._pipeline()
+        for before in befores:
+            kwargs = before(kwargs)
+        # The after hooks are given the rest of the chain as it was given.
+        handler = (util._pop_handler if afters else _pop_handler)(kwargs)
+        if handler is None:
+            handler = requests
+        send = handler.request
+        priority = kwargs.pop('priority', None)
+        limiter = self.rate_limiter
+        if limiter is not None:
+            send = functools.partial(limiter.request, send, priority=priority)
+        policy = self.retry_policy
+        if policy is not None:
+            send = functools.partial(policy.request, send)
+        cache = self.response_cache
+        if cache is not None:
+            send = functools.partial(cache.request, send)
+        flight = self.single_flight
+        if flight is not None:
+            send = functools.partial(flight.request, send)
+        response = send(**kwargs)
+        for after in afters:
+            response = after(kwargs, response)
+        return response
+
+    def _pipeline(self):
+        """Return the compiled hooks of the :attr:`middleware`."""
+        middleware = self.middleware
+        compiled = self.__dict__.get('_compiled_pipeline')
+        if compiled is None or compiled[0] is not middleware:
+            compiled = (middleware, _compile_pipeline(middleware))
+            self._compiled_pipeline = compiled
+        return compiled[1]
 
 
 for _method in SUPPORTED_METHODS:
@@ -79,3 +211,926 @@ for _method in SUPPORTED_METHODS:
     _method_func.__doc__ = ("Call :meth:`request` with method '{}'."
                             .format(_method.token))
     setattr(RequestHandler, _method.token.lower(), _method_func)
+
+
+_LAYER_ATTRS = frozenset(
+    ('rate_limiter', 'retry_policy', 'response_cache', 'single_flight'))
+
+
+def _pop_handler(kwargs):
+    """Return the first of the `_handlers` keyword argument, or `None`.
+
+    This is `pyneric.util._pop_handler`, except that the handlers given in a
+    sequence (rather than a chain already resolved by another handler) are
+    resolved once, leaving out those at the start that would only pass the
+    request on: instances of `RequestHandler` (not of a subclass) with no
+    middleware or layers.
+
+    """
+    handlers = kwargs.get('_handlers')
+    if not handlers or type(handlers) is util._HandlerChain:
+        return util._pop_handler(kwargs)
+    handlers = tuple(handlers)
+    start = 0
+    for handler in handlers:
+        if type(handler) is not RequestHandler or not _passes_on(handler):
+            break
+        start += 1
+    if start == len(handlers):
+        del kwargs['_handlers']
+        return None
+    chain = util._EMPTY_HANDLER_CHAIN
+    for handler in handlers[:start:-1]:
+        chain = util._HandlerChain(handler, chain)
+    kwargs['_handlers'] = chain
+    return handlers[start]
+
+
+def _passes_on(handler):
+    """Return whether the `RequestHandler` only passes requests on."""
+    attrs = vars(handler)
+    return not attrs or all(
+        value is None if name in _LAYER_ATTRS else
+        not value if name == 'middleware' else
+        name == '_compiled_pipeline'
+        for name, value in attrs.items())
+
+
+def _host_key(url):
+    """Return the (lower-case) scheme and host of the URL."""
+    scheme, separator, rest = url.partition('://')
+    host = re.split('[/?#]', rest, 1)[0]
+    return (scheme.lower(), host.lower()) if separator else ('', '')
+
+
+class _RejectCookiesPolicy(DefaultCookiePolicy):
+
+    """A cookie policy that never stores cookies from responses."""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+class SessionPool(object):
+
+    """A pool of `requests:requests.Session` objects keyed by scheme and host.
+
+    Requests made through the pool reuse the session (and therefore the
+    kept-alive connections) for the scheme and host of the URL, unlike the
+    functions of `requests:requests`, which create a session per request.
+
+    :param int pool_size: The maximum number of sessions (schemes and hosts)
+        kept; the least recently used session is closed when it is exceeded.
+    :param int max_connections_per_host: The maximum number of connections
+        kept alive by each session (see
+        `~requests:requests.adapters.HTTPAdapter`).
+    :param idle_timeout: The number of seconds after which an unused session
+        is closed (when the pool is next used), or `None` to keep sessions
+        until they are evicted or the pool is closed.
+    :type idle_timeout: float or None
+    :param bool keep_cookies: Whether cookies set by responses are sent with
+        subsequent requests (to the same scheme and host); by default, they
+        are not, as with the functions of `requests:requests`.
+    :param clock: A function returning the current time in seconds, used for
+        `idle_timeout`; a monotonic clock by default.
+
+    A pool may be used as a context manager, which closes it on exit.
+
+    A session used by a request made through the pool is not closed (when it
+    is evicted, idle, or the pool is closed) until the request completes.
+
+    """
+
+    def __init__(self, pool_size=10, max_connections_per_host=10,
+                 idle_timeout=None, keep_cookies=False, clock=_monotonic):
+        if pool_size < 1:
+            raise ValueError("pool_size must be positive.")
+        if max_connections_per_host < 1:
+            raise ValueError("max_connections_per_host must be positive.")
+        self._pool_size = pool_size
+        self._max_connections_per_host = max_connections_per_host
+        self._idle_timeout = idle_timeout
+        self._keep_cookies = keep_cookies
+        self._clock = clock
+        self._sessions = OrderedDict()  # (session, last use) keyed by host
+        self._in_use = {}  # The number of requests using each session
+        self._retired = set()  # Sessions to close when no longer in use
+        self._lock = threading.Lock()
+
+    @property
+    def pool_size(self):
+        """The maximum number of sessions kept."""
+        return self._pool_size
+
+    @property
+    def max_connections_per_host(self):
+        """The maximum number of connections kept alive per host."""
+        return self._max_connections_per_host
+
+    @property
+    def idle_timeout(self):
+        """The number of seconds after which an unused session is closed."""
+        return self._idle_timeout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def close(self):
+        """Close all sessions in the pool."""
+        with self._lock:
+            sessions = self._retire(x[0] for x in self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def session_for(self, url):
+        """Return the session for the scheme and host of the URL.
+
+        The pool may close the session (when it is evicted or idle) while it
+        is used, unless it is used through the pool.
+
+        """
+        return self._session_for(url, acquire=False)
+
+    def _session_for(self, url, acquire):
+        key = _host_key(url)
+        now = self._clock()
+        removed = []
+        with self._lock:
+            sessions = self._sessions
+            if self._idle_timeout is not None:
+                expired = now - self._idle_timeout
+                # The least recently used sessions are first.
+                for other_key, (session, last_use) in list(sessions.items()):
+                    if last_use > expired:
+                        break
+                    del sessions[other_key]
+                    removed.append(session)
+            try:
+                session = sessions.pop(key)[0]
+            except KeyError:
+                session = self._create_session()
+                while len(sessions) >= self._pool_size:
+                    removed.append(sessions.popitem(last=False)[1][0])
+            sessions[key] = session, now
+            if acquire:
+                self._in_use[session] = self._in_use.get(session, 0) + 1
+            closing = self._retire(removed)
+        for other_session in closing:
+            other_session.close()
+        return session
+
+    def _retire(self, sessions):
+        """Return the sessions removed from the pool that are not in use.
+
+        The others are closed by `_release` when they are no longer used.
+        This is called with the lock held.
+
+        """
+        closing = []
+        for session in sessions:
+            if session in self._in_use:
+                self._retired.add(session)
+            else:
+                closing.append(session)
+        return closing
+
+    def _release(self, session):
+        """Release a session acquired by `_session_for`."""
+        with self._lock:
+            count = self._in_use.pop(session) - 1
+            if count:
+                self._in_use[session] = count
+                return
+            if session not in self._retired:
+                return
+            self._retired.remove(session)
+        session.close()
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=self._max_connections_per_host)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self._keep_cookies:
+            session.cookies.set_policy(_RejectCookiesPolicy())
+        return session
+
+    def request(self, method, url, **kwargs):
+        """Make a request like `requests:requests.request` with a session."""
+        session = self._session_for(url, acquire=True)
+        try:
+            return session.request(method, url, **kwargs)
+        finally:
+            self._release(session)
+
+
+for _method in SUPPORTED_METHODS:
+    def _get_method_func(method):
+        name = method.token.lower()
+
+        def _method_func(self, url, **kwargs):
+            # Use the session's method for its default keyword arguments.
+            session = self._session_for(url, acquire=True)
+            try:
+                return getattr(session, name)(url, **kwargs)
+            finally:
+                self._release(session)
+        _method_func.__name__ = future.native_str(name)
+        _method_func.__doc__ = (
+            "Make a {} request like `requests:requests.{}` with a session."
+            .format(method.token, name))
+        return _method_func
+    setattr(SessionPool, _method.token.lower(), _get_method_func(_method))
+
+_default_session_pool = None
+_default_session_pool_lock = threading.Lock()
+
+
+def get_default_session_pool():
+    """Return the `SessionPool` used when no other is specified.
+
+    It is created (with default arguments) when this is first called.
+
+    """
+    global _default_session_pool
+    with _default_session_pool_lock:
+        if _default_session_pool is None:
+            _default_session_pool = SessionPool()
+        return _default_session_pool
+
+
+_CACHEABLE_STATUS_CODES = frozenset(
+    (200, 203, 204, 206, 300, 301, 404, 405, 410, 414, 501))
+"""Status codes of responses cacheable without explicit freshness
+
+See
+`Section 6.1 of RFC 7231 <http://tools.ietf.org/html/rfc7231#section-6.1>`_.
+
+"""
+
+
+def _cache_directives(headers):
+    """Return the Cache-Control directives of the headers as a dict."""
+    directives = {}
+    for directive in headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.partition('=')
+        name = name.strip().lower()
+        if name:
+            directives[name] = value.strip().strip('"')
+    return directives
+
+
+def _delta_seconds(directives, name):
+    try:
+        return max(int(directives[name]), 0)
+    except (KeyError, ValueError):
+        return None
+
+
+def _http_date(value):
+    """Return the HTTP-date (string) as seconds since the epoch, or `None`."""
+    parsed = value and parsedate_tz(value)
+    return mktime_tz(parsed) if parsed else None
+
+
+_SAFE_METHOD_TOKENS = frozenset(x.token for x in http.METHODS if x.safe)
+
+_MAX_VARIANTS = 16
+"""The maximum number of responses stored per URL (varying by headers)"""
+
+
+class _CachedUrl(object):
+
+    __slots__ = ('vary', 'variants')
+
+    def __init__(self, vary):
+        self.vary = vary  # lower-case names of the Vary header
+        self.variants = OrderedDict()  # entries keyed by Vary values
+
+
+class _CacheEntry(object):
+
+    __slots__ = ('response', 'stored', 'age', 'lifetime', 'no_cache')
+
+    def __init__(self, response, stored, age, lifetime, no_cache):
+        self.response = response
+        self.stored = stored  # time (of the cache's clock) when stored
+        self.age = age  # age (seconds) when stored
+        self.lifetime = lifetime  # freshness lifetime (seconds)
+        self.no_cache = no_cache  # whether it must always be revalidated
+
+
+class ResponseCache(object):
+
+    """An HTTP cache of `~requests:requests.Response` objects (RFC 7234).
+
+    :param int maxsize: The maximum number of URLs whose responses are
+        stored; the responses for the least recently used URL are discarded
+        when it is exceeded.
+    :param bool shared: Whether this is a shared cache, which does not store
+        responses with the "private" Cache-Control directive or (unless
+        allowed explicitly) responses to requests with an Authorization
+        header, and which prefers the "s-maxage" directive to "max-age".
+    :param methods: The `~pyneric.http.v1_1.core.Method` objects of requests
+        whose responses may be stored, which must be cacheable; by default,
+        GET only.  A response to POST or to
+        `~pyneric.http.v1_1.patch.CACHEABLE_PATCH` (PATCH) is only stored if
+        it has explicit freshness information and a Content-Location header
+        matching the request URL, and then only to respond to subsequent GET
+        (and HEAD) requests.
+    :param clock: A function returning the current time in seconds, used for
+        the ages of responses; a monotonic clock by default.
+
+    Responses are stored by URL and the values of the request headers named
+    by their Vary header.  A stored response is used while it is fresh
+    according to its Cache-Control (max-age, s-maxage, or no-cache) or
+    Expires headers; when it is stale, it is revalidated with a conditional
+    request if it has an ETag or Last-Modified header.  A HEAD request may be
+    responded to with the headers of a stored GET response.  A successful
+    response to an unsafe method invalidates the responses stored for its
+    URL.  Streamed requests and requests with the "no-store" Cache-Control
+    directive bypass the cache.
+
+    The numbers of requests responded to from the cache without a request,
+    with a revalidated response, and with a new response are counted in the
+    :attr:`hits`, :attr:`revalidations`, and :attr:`misses` attributes.
+
+    When a request made through the cache is made through it again (such as
+    by nested `RequestHandler` objects sharing it), only the outermost use
+    responds from the cache, stores, and counts.
+
+    """
+
+    def __init__(self, maxsize=256, shared=True, methods=(http.GET,),
+                 clock=_monotonic):
+        for method in methods:
+            if not method.cacheable:
+                raise ValueError("{} is not a cacheable method."
+                                 .format(method.token))
+        self._urls = util.LRUCache(maxsize)  # `_CachedUrl` keyed by URL
+        self._shared = shared
+        self._methods = frozenset(x.token for x in methods)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._local = threading.local()  # whether this is used by a thread
+        self.hits = self.revalidations = self.misses = 0
+
+    @property
+    def maxsize(self):
+        """The maximum number of URLs whose responses are stored."""
+        return self._urls.maxsize
+
+    @property
+    def shared(self):
+        """Whether this is a shared cache."""
+        return self._shared
+
+    def __len__(self):
+        """Return the number of URLs whose responses are stored."""
+        return len(self._urls)
+
+    def clear(self):
+        """Remove all stored responses and reset the counts."""
+        with self._lock:
+            self._urls.clear()
+            self.hits = self.revalidations = self.misses = 0
+
+    def invalidate(self, url):
+        """Remove the responses stored for the URL."""
+        self._urls.pop(url)
+
+    def request(self, send, method, url, **kwargs):
+        """Make a request, or respond to it from the cache.
+
+        :param send: The function making a request, which is called with
+            keyword arguments like `requests:requests.request`.
+        :param str method: The HTTP method (token) of the request.
+        :param str url: The URL of the request.
+        :param kwargs: The other keyword arguments of the request.
+        :returns: the `~requests:requests.Response`, which has a `from_cache`
+            attribute that is true if it was stored (even if revalidated)
+
+        Responses are stored by the URL including any query parameters
+        (`params`).
+
+        """
+        local = self._local
+        if getattr(local, 'active', False):
+            return send(method=method, url=url, **kwargs)
+        local.active = True
+        try:
+            return self._request(send, method, url, kwargs)
+        finally:
+            local.active = False
+
+    def _request(self, send, method, url, kwargs):
+        method = method.upper()
+        headers = requests.structures.CaseInsensitiveDict(
+            kwargs.get('headers') or {})
+        request_directives = _cache_directives(headers)
+        if kwargs.get('stream') or 'no-store' in request_directives:
+            return self._send(send, method, url, kwargs)
+        if kwargs.get('params'):
+            prepared = requests.PreparedRequest()
+            prepared.prepare_url(url, kwargs.pop('params'))
+            url = prepared.url
+        if method not in (http.GET.token, http.HEAD.token):
+            response = self._send(send, method, url, kwargs)
+            if (method not in _SAFE_METHOD_TOKENS and
+                    response.status_code < 400):
+                self.invalidate(url)
+                for name in ('Location', 'Content-Location'):
+                    if name in response.headers:
+                        self.invalidate(requests.compat.urljoin(
+                            url, response.headers[name]))
+            if method in self._methods:
+                self._store_unsafe(url, headers, response)
+            return response
+        cached_url = self._urls.get(url)
+        entry = None
+        if cached_url is not None:
+            values = self._vary_values(cached_url.vary, headers)
+            entry = cached_url.variants.get(values)
+        if entry is not None:
+            if not (entry.no_cache or 'no-cache' in request_directives or
+                    headers.get('Pragma') == 'no-cache' or
+                    self._is_stale(entry, request_directives)):
+                with self._lock:
+                    self.hits += 1
+                return self._cached(entry, method)
+            validators = self._validators(entry.response)
+            if validators:
+                kwargs['headers'] = dict(kwargs.get('headers') or {},
+                                         **validators)
+        response = self._send(send, method, url, kwargs)
+        if entry is not None and response.status_code == 304:
+            entry = self._revalidate(url, cached_url.vary, headers, entry,
+                                     response)
+            with self._lock:
+                self.revalidations += 1
+            return self._cached(entry, method)
+        with self._lock:
+            self.misses += 1
+        if method == http.GET.token and http.GET.token in self._methods:
+            self._store(url, headers, response)
+        return response
+
+    @staticmethod
+    def _send(send, method, url, kwargs):
+        response = send(method=method, url=url, **kwargs)
+        response.from_cache = False
+        return response
+
+    @staticmethod
+    def _cached(entry, method):
+        response = copy.copy(entry.response)
+        response.from_cache = True
+        if method == http.HEAD.token:
+            response._content = b''
+        return response
+
+    @staticmethod
+    def _vary_values(names, headers):
+        return tuple(headers.get(x) for x in names)
+
+    def _is_stale(self, entry, request_directives):
+        age = entry.age + self._clock() - entry.stored
+        max_age = _delta_seconds(request_directives, 'max-age')
+        if max_age is not None and age > max_age:
+            return True
+        return age >= entry.lifetime
+
+    @staticmethod
+    def _validators(response):
+        validators = {}
+        etag = response.headers.get('ETag')
+        if etag:
+            validators['If-None-Match'] = etag
+        last_modified = response.headers.get('Last-Modified')
+        if last_modified:
+            validators['If-Modified-Since'] = last_modified
+        return validators
+
+    def _freshness(self, response):
+        """Return whether the response may be stored and its freshness.
+
+        The freshness is the tuple of the response's age, freshness lifetime,
+        and whether it must always be revalidated.
+
+        """
+        headers = response.headers
+        directives = _cache_directives(headers)
+        if 'no-store' in directives or (self._shared and
+                                        'private' in directives):
+            return False, None
+        lifetime = None
+        if self._shared:
+            lifetime = _delta_seconds(directives, 's-maxage')
+        if lifetime is None:
+            lifetime = _delta_seconds(directives, 'max-age')
+        if lifetime is None and 'Expires' in headers:
+            date = _http_date(headers.get('Date')) or time.time()
+            expires = _http_date(headers['Expires'])
+            lifetime = max(expires - date, 0) if expires else 0
+        explicit = lifetime is not None
+        if (not explicit and 'public' not in directives and
+                response.status_code not in _CACHEABLE_STATUS_CODES):
+            return False, None
+        request_headers = response.request.headers if response.request \
+            else {}
+        if (self._shared and 'Authorization' in request_headers and not
+                ('public' in directives or 's-maxage' in directives or
+                 'must-revalidate' in directives)):
+            return False, None
+        no_cache = 'no-cache' in directives
+        if not (explicit or self._validators(response)):
+            return False, None
+        try:
+            age = max(int(headers.get('Age', 0)), 0)
+        except ValueError:
+            age = 0
+        return explicit, (age, lifetime or 0, no_cache)
+
+    def _store(self, url, headers, response, require_explicit=False):
+        if response.status_code == 206:
+            return  # Partial content is not combined.
+        vary = response.headers.get('Vary', '')
+        names = tuple(sorted(set(
+            x.strip().lower() for x in vary.split(',') if x.strip())))
+        if '*' in names:
+            self.invalidate(url)
+            return
+        explicit, freshness = self._freshness(response)
+        if freshness is None or require_explicit and not explicit:
+            self.invalidate(url)
+            return
+        self._add(url, names, headers,
+                  _CacheEntry(response, self._clock(), *freshness))
+
+    def _add(self, url, names, headers, entry):
+        values = self._vary_values(names, headers)
+        with self._lock:
+            cached_url = self._urls.get(url)
+            if cached_url is None or cached_url.vary != names:
+                cached_url = _CachedUrl(names)
+            variants = cached_url.variants
+            variants.pop(values, None)
+            variants[values] = entry
+            if len(variants) > _MAX_VARIANTS:
+                variants.popitem(last=False)
+            self._urls[url] = cached_url
+
+    def _store_unsafe(self, url, headers, response):
+        location = response.headers.get('Content-Location')
+        if (location and response.status_code < 300 and
+                requests.compat.urljoin(url, location) == url):
+            self._store(url, headers, response, require_explicit=True)
+
+    def _revalidate(self, url, names, headers, entry, response):
+        """Update the stored response with the headers of a 304 response."""
+        stored = copy.copy(entry.response)
+        stored.headers = requests.structures.CaseInsensitiveDict(
+            stored.headers)
+        for name in ('Age', 'Cache-Control', 'Date', 'ETag', 'Expires',
+                     'Last-Modified'):
+            if name in response.headers:
+                stored.headers[name] = response.headers[name]
+        stored.request = response.request
+        explicit, freshness = self._freshness(stored)
+        if freshness is None:
+            self.invalidate(url)
+            return _CacheEntry(stored, self._clock(), 0, 0, True)
+        entry = _CacheEntry(stored, self._clock(), *freshness)
+        self._add(url, names, headers, entry)
+        return entry
+
+
+class _Flight(object):
+
+    """A request made by a `SingleFlight` for the callers waiting for it."""
+
+    __slots__ = ('done', 'response', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = self.error = None
+
+
+class SingleFlight(object):
+
+    """A coalescer of concurrent identical requests (from multiple threads).
+
+    :param methods: The `~pyneric.http.v1_1.core.Method` objects of requests
+        that are coalesced, which must be safe; by default, GET and HEAD.
+
+    While a request is in progress, an identical request (with the same
+    method, URL, and other keyword arguments) waits for it and gets a copy of
+    its response (or raises its exception) instead of being made, so only one
+    of them reaches the network.  A copy has a true `coalesced` attribute
+    (which is false for the response of the request made).  Requests whose
+    keyword arguments are unhashable, streamed requests, and requests with
+    other methods are made as usual.
+
+    The numbers of requests made and of those coalesced are counted in the
+    :attr:`made` and :attr:`coalesced` attributes.
+
+    """
+
+    def __init__(self, methods=(http.GET, http.HEAD)):
+        for method in methods:
+            if not method.safe:
+                raise ValueError("{} is not a safe method."
+                                 .format(method.token))
+        self._methods = frozenset(x.token for x in methods)
+        self._flights = {}  # `_Flight` keyed by request
+        self._lock = threading.Lock()
+        self.made = self.coalesced = 0
+
+    def __len__(self):
+        """Return the number of coalescing requests in progress."""
+        return len(self._flights)
+
+    def request(self, send, method, url, **kwargs):
+        """Make a request, or wait for an identical one in progress.
+
+        :param send: The function making a request, which is called with
+            keyword arguments like `requests:requests.request`.
+        :param str method: The HTTP method (token) of the request.
+        :param str url: The URL of the request.
+        :param kwargs: The other keyword arguments of the request.
+        :returns: the `~requests:requests.Response`, which has a `coalesced`
+            attribute (see above)
+
+        """
+        method = method.upper()
+        key = None
+        if method in self._methods and not kwargs.get('stream'):
+            try:
+                key = method, url, util._hashable(kwargs)
+            except TypeError:
+                pass
+        if key is None:
+            with self._lock:
+                self.made += 1
+            response = send(method=method, url=url, **kwargs)
+            response.coalesced = False
+            return response
+        with self._lock:
+            flight = self._flights.get(key)
+            leading = flight is None
+            if leading:
+                flight = self._flights[key] = _Flight()
+                self.made += 1
+            else:
+                self.coalesced += 1
+        if leading:
+            try:
+                flight.response = send(method=method, url=url, **kwargs)
+                flight.response.coalesced = False
+            except BaseException as exc:
+                flight.error = exc
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+            return flight.response
+        flight.done.wait()
+        if flight.error is not None:
+            raise util._copy_exception(flight.error)
+        response = copy.copy(flight.response)
+        response.coalesced = True
+        return response
+
+
+_IDEMPOTENT_METHOD_TOKENS = frozenset(
+    x.token for x in http.METHODS if x.idempotent)
+
+RetryAttempt = namedtuple(
+    'RetryAttempt', 'method url number latency response error retrying')
+"""The outcome of an attempt of a request, given to the `on_attempt` hook of
+a `RetryPolicy`.
+
+It has the method (token) and URL of the request, the number of the attempt
+(1 for the first), its latency (seconds), its response (or `None`), the
+exception raised instead (or `None`), and whether the request is retried
+(unless the deadline of the policy passes while waiting to retry it).
+
+"""
+
+
+def _is_replayable(kwargs):
+    """Return whether the body of a request can be sent again.
+
+    :param dict kwargs: The keyword arguments of the request (like
+        `requests:requests.request`).
+
+    """
+    data, files = kwargs.get('data'), kwargs.get('files')
+    bodies = [data]
+    if files:
+        for value in (files.values() if isinstance(files, Mapping) else
+                      (x[1] for x in files)):
+            # A value may be a tuple of file name, file, and so on.
+            bodies.append(value[1] if isinstance(value, tuple) else value)
+    return not any(hasattr(x, 'read') or isinstance(x, Iterator)
+                   for x in bodies)
+
+
+class RetryPolicy(object):
+
+    """A policy of retrying requests that failed transiently.
+
+    :param int max_attempts: The maximum number of attempts of a request,
+        including the first.
+    :param float backoff: The base number of seconds waited before a retry:
+        the *n*-th retry waits a random time of up to
+        ``backoff * 2 ** (n - 1)`` seconds ("full jitter").
+    :param float max_backoff: The maximum number of seconds waited before a
+        retry, unless a Retry-After header of the response says to wait
+        longer.
+    :param max_retry_after: The maximum number of seconds of a Retry-After
+        header that is waited; a request is not retried when its response
+        says to wait longer.  `None` waits as long as any Retry-After header
+        says.
+    :type max_retry_after: float or None
+    :param status_codes: The status codes of responses that are retried; by
+        default, 429, 502, 503, and 504.
+    :param errors: The exception classes of failed attempts that are
+        retried; by default, connection errors (such as a reset connection)
+        and timeouts.
+    :param float budget: The number of retry tokens of each host (scheme and
+        host); each failed attempt spends one, and each successful one earns
+        `budget_ratio` of one (up to the budget).  Requests are only retried
+        while more than half of the tokens are left, so a failing host is
+        not flooded with retries.
+    :param float budget_ratio: The fraction of a retry token earned by a
+        successful attempt.
+    :param deadline: The maximum number of seconds taken by all attempts of
+        a request, or `None`; a request is not retried after that, and the
+        `timeout` of each attempt is limited to the time left.
+    :type deadline: float or None
+    :param str idempotency_header: The name of the request header (an
+        idempotency key) with which requests of non-idempotent methods are
+        also retried.
+    :param on_attempt: A function called with a `RetryAttempt` after each
+        attempt of a request, such as to record its latency, or `None`.
+    :param clock: A function returning the current time in seconds; a
+        monotonic clock by default.
+    :param sleep: A function waiting for a number of seconds.
+
+    Only requests of idempotent methods (see
+    `~pyneric.http.v1_1.core.Method`) or with the idempotency header are
+    retried, since a failed attempt may still have been processed by the
+    server.  Requests whose body cannot be sent again (`data` or `files`
+    given as an iterator or a file) are not retried either.
+
+    The numbers of attempts made, of retries among them, and of requests not
+    retried because of the budget, the deadline, or `max_retry_after` are
+    counted in the :attr:`attempts`, :attr:`retries`, and :attr:`denied`
+    attributes.
+
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.1, max_backoff=10,
+                 max_retry_after=60, status_codes=(429, 502, 503, 504),
+                 errors=(requests.ConnectionError, requests.Timeout),
+                 budget=10, budget_ratio=0.1, deadline=None,
+                 idempotency_header='Idempotency-Key', on_attempt=None,
+                 clock=_monotonic, sleep=time.sleep):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be positive.")
+        if budget < 1:
+            raise ValueError("budget must be at least 1.")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.status_codes = frozenset(status_codes)
+        self.errors = tuple(errors)
+        self.budget = budget
+        self.budget_ratio = budget_ratio
+        self.deadline = deadline
+        self.idempotency_header = idempotency_header
+        self.on_attempt = on_attempt
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = {}  # retry tokens keyed by (scheme, host)
+        self._lock = threading.Lock()
+        self.attempts = self.retries = self.denied = 0
+
+    def tokens(self, url):
+        """Return the number of retry tokens left for the host of the URL."""
+        return self._tokens.get(_host_key(url), self.budget)
+
+    def is_retryable(self, method, headers=None):
+        """Return whether requests of the method (token) may be retried.
+
+        :param str method: The HTTP method (token) of the request.
+        :param headers: The headers of the request, if any.
+        :type headers: dict or None
+
+        """
+        if method.upper() in _IDEMPOTENT_METHOD_TOKENS:
+            return True
+        name = self.idempotency_header.lower()
+        return any(x.lower() == name for x in headers or ())
+
+    def delay(self, retry, response=None):
+        """Return the number of seconds to wait before a retry.
+
+        :param int retry: The number of the retry (1 for the first).
+        :param response: The response of the failed attempt, if any, whose
+            Retry-After header is honored (even beyond `max_retry_after`).
+
+        """
+        delay = random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** (retry - 1)))
+        if response is not None:
+            seconds = _retry_after_seconds(
+                response.headers.get('Retry-After'))
+            if seconds is not None:
+                delay = max(delay, seconds)
+        return delay
+
+    def request(self, send, method, url, **kwargs):
+        """Make a request, retrying it as allowed by this policy.
+
+        :param send: The function making a request, which is called with
+            keyword arguments like `requests:requests.request`.
+        :param str method: The HTTP method (token) of the request.
+        :param str url: The URL of the request.
+        :param kwargs: The other keyword arguments of the request.
+        :returns: the `~requests:requests.Response` of the last attempt
+        :raises: the exception of the last attempt, if it failed with one
+
+        """
+        retryable = (self.is_retryable(method, kwargs.get('headers')) and
+                     _is_replayable(kwargs))
+        host = _host_key(url)
+        left = self.deadline
+        end = None if left is None else self._clock() + left
+        timeout = kwargs.get('timeout')
+        number = 0
+        while True:
+            number += 1
+            if left is not None and not isinstance(timeout, tuple):
+                kwargs['timeout'] = left if timeout is None else \
+                    min(timeout, left)
+            attempt_start = self._clock()
+            response = error = None
+            try:
+                response = send(method=method, url=url, **kwargs)
+            except self.errors as exc:
+                error = exc
+            now = self._clock()
+            failed = error is not None or \
+                response.status_code in self.status_codes
+            retrying = False
+            delay = 0
+            with self._lock:
+                self.attempts += 1
+                tokens = self._tokens.get(host, self.budget)
+                if failed:
+                    tokens = max(tokens - 1, 0)
+                else:
+                    tokens = min(tokens + self.budget_ratio, self.budget)
+                self._tokens[host] = tokens
+                if failed and retryable and number < self.max_attempts:
+                    delay = self.delay(number, response)
+                    if (tokens <= self.budget / 2 or
+                            end is not None and now + delay >= end or
+                            self.max_retry_after is not None and
+                            delay > self.max_retry_after):
+                        self.denied += 1
+                    else:
+                        retrying = True
+                        self.retries += 1
+            if self.on_attempt is not None:
+                self.on_attempt(RetryAttempt(method, url, number,
+                                             now - attempt_start, response,
+                                             error, retrying))
+            if retrying:
+                self._sleep(delay)
+                if end is not None:
+                    left = end - self._clock()
+                    if left <= 0:
+                        # The deadline passed while waiting.
+                        with self._lock:
+                            self.retries -= 1
+                            self.denied += 1
+                        retrying = False
+            if not retrying:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
@@ -8,10 +8,19 @@ from pyneric.future import *
 from future.standard_library import install_aliases
 install_aliases()
 
-import inspect
+from collections import deque, namedtuple
 import functools
+import inspect
+import itertools
+import math
+import queue
+import re
+import threading
+import time
+import weakref
 from urllib.parse import quote, unquote, urljoin, urlsplit, urlunsplit
 
+from pyneric.http import v1_1 as http
 from pyneric.meta import Metaclass
 from pyneric import util
 from pyneric.util import tryf
@@ -25,6 +34,8 @@ _ENCODING = 'UTF-8'
 SEPARATOR = '/'
 """URL path separator"""
 
+_monotonic = getattr(time, 'monotonic', time.time)
+
 
 def _ensure_text(value, coerce=True):
     return ensure_text(value, _ENCODING, coerce=coerce)
@@ -45,6 +56,49 @@ def _url_join(base, path, safe=''):
     return urljoin(base, path)
 
 
+_FAST_JOIN_BASE = re.compile(r'https?://[^/?#]')
+"""Matches the URLs to which quoted path segments may be simply appended"""
+
+
+def _url_join_quoted(base, path, quoted, simple, safe=''):
+    """Return the same URL as `_url_join`, given the quoted `path`.
+
+    The quoted path is simply appended to `base` when that is equivalent:
+    `base` must be an HTTP(S) URL produced by `_url_join` (and therefore
+    normalized), and the path must be `simple` (have no empty or dot
+    segments).
+
+    """
+    if not (simple and _FAST_JOIN_BASE.match(base)):
+        return _url_join(base, path, safe=safe)
+    if not base.endswith(SEPARATOR):
+        return base + SEPARATOR + quoted
+    if quoted.endswith(SEPARATOR):
+        return base + quoted
+    return base + quoted + SEPARATOR
+
+
+_UNQUOTED_SEGMENT = re.compile(r'[A-Za-z0-9_.-]+\Z')
+"""Matches the path segments that URL-quoting leaves unchanged"""
+
+
+def _quote_segment(segment):
+    if _UNQUOTED_SEGMENT.match(segment):
+        return segment
+    return quote(segment, safe='')
+
+
+def _is_simple_path(quoted):
+    return all(x not in ('', '.', '..')
+               for x in quoted.rstrip(SEPARATOR).split(SEPARATOR))
+
+
+def _member_url(collection_url, id):
+    path = _ensure_text(id)
+    return _url_join_quoted(collection_url, path, _quote_segment(path),
+                            path not in ('.', '..'))
+
+
 def _url_split(url):
     result = list(urlsplit(url))
     result[2] = result[2].rstrip(SEPARATOR)
@@ -52,12 +106,53 @@ def _url_split(url):
     return result
 
 
+def _url_unsplit(url_split, segments):
+    return urlunsplit(url_split[:2] + [SEPARATOR.join(segments), '', ''])
+
+
+def _normalize_segment(segment):
+    """Return the path segment URL-quoted in the form the library uses.
+
+    :raises UnicodeDecodeError: if the segment is not valid when unquoted
+
+    """
+    if _UNQUOTED_SEGMENT.match(segment):
+        return segment
+    return quote(_unquote(segment), safe='')
+
+
+def _strip_trailing_empty(segments):
+    """Return the segments of a path without trailing separators."""
+    end = len(segments)
+    while end > 1 and not segments[end - 1]:
+        end -= 1
+    return segments[:end]
+
+
+class _ParseFailure(object):
+
+    """The result of failing to parse a URL as a resource.
+
+    The message is only formatted when needed (by the given function).
+
+    """
+
+    __slots__ = ('_message',)
+
+    def __init__(self, message):
+        self._message = message
+
+    def __str__(self):
+        return self._message()
+
+
 class _RestMetaclass(Metaclass):
 
     __metadata__ = dict(url_path=None, container_class=None,
                         container_is_collection=False,
                         reference_attribute=None)
     __propagate__ = tuple(__metadata__) + ('is_abstract',)
+    __indexed_metadata__ = ('container_class',)
 
     @staticmethod
     def validate_url_path(value):
@@ -107,6 +202,129 @@ class _RestMetaclass(Metaclass):
         """Return whether this resource class is abstract (no url_path)."""
         return cls.url_path is None
 
+    def __call__(cls, *args, **kwargs):
+        if not cls.interned:
+            return super(_RestMetaclass, cls).__call__(*args, **kwargs)
+        key = cls, cls._intern_key(*args, **kwargs)
+        try:
+            instance = _interned.get(key)
+        except TypeError:  # unhashable argument
+            return super(_RestMetaclass, cls).__call__(*args, **kwargs)
+        if instance is None:
+            instance = super(_RestMetaclass, cls).__call__(*args, **kwargs)
+            with _interned_lock:
+                instance = _interned.setdefault(key, instance)
+        return instance
+
+
+_interned = weakref.WeakValueDictionary()
+"""The instances of interned resource classes keyed by class and arguments
+
+The arguments are as normalized by the `_intern_key` method of the class.
+
+"""
+
+_interned_lock = threading.Lock()
+
+
+class _UrlTemplate(object):
+
+    """The URL of a resource class compiled from its container classes.
+
+    Each level (from the outermost container to the resource class) is a
+    tuple of the resource class, its url_path (as text and URL-quoted),
+    whether the quoted path is simple (see `_url_join_quoted`), whether the
+    level consumes an id, and whether that id is required (not `None`).
+
+    """
+
+    def __init__(self, cls):
+        classes = []
+        while cls is not None:
+            if cls.is_abstract:
+                raise TypeError(
+                    "{!r} is an abstract RestResource and cannot be "
+                    "instantiated.".format(cls))
+            classes.append(cls)
+            cls = cls.container_class
+        classes.reverse()
+        levels = []
+        for cls, next_cls in zip(classes, classes[1:] + [None]):
+            path, quoted, simple = _get_quoted_path(cls)
+            takes_id = required = False
+            if issubclass(cls, RestCollection):
+                if next_cls is None:
+                    takes_id = True
+                elif not next_cls.container_is_collection:
+                    takes_id = True
+                    required = next_cls.container_is_collection is not None
+            levels.append((cls, path, quoted, simple, takes_id, required))
+        self.levels = tuple(levels)
+        self.root_urls = util.LRUCache(maxsize=64)
+        self.max_ids = sum(1 for x in levels if x[4])
+        self.min_ids = self.max_ids - levels[-1][4]
+
+    def render(self, root, ids):
+        """Return the URL for the given container URL and ids."""
+        if not self.min_ids <= len(ids) <= self.max_ids:
+            raise TypeError(
+                "{} takes {} id{} ({} given)".format(
+                    self.levels[-1][0].__name__,
+                    (self.min_ids if self.min_ids == self.max_ids else
+                     "{} or {}".format(self.min_ids, self.max_ids)),
+                    "" if self.max_ids == 1 else "s", len(ids)))
+        if not isinstance(root, basestring):
+            raise ValueError(
+                "Container {!r} is invalid for resource type {!r}.  It must "
+                "be a string (URL).".format(root, self.levels[0][0]))
+        ids = iter(ids)
+        url = None
+        for cls, path, quoted, simple, takes_id, required in self.levels:
+            if url is None:
+                url = self.root_urls.get(root)
+                if url is None:
+                    url = self.root_urls[root] = _url_join(root, path,
+                                                           safe=SEPARATOR)
+            else:
+                url = _url_join_quoted(url, path, quoted, simple,
+                                       safe=SEPARATOR)
+            if not takes_id:
+                continue
+            id = cls.validate_id(next(ids, None))
+            if id is None:
+                if required:
+                    raise ValueError(
+                        "A member id is required for {!r}.".format(cls))
+                continue
+            path = _ensure_text(id)
+            url = _url_join_quoted(url, path, _quote_segment(path),
+                                   path not in ('.', '..'))
+        return url
+
+
+def _get_quoted_path(cls):
+    """Return the url_path of a resource class as text and URL-quoted.
+
+    Whether the quoted path is simple (see `_url_join_quoted`) is also
+    returned (as the third item).
+
+    """
+    try:
+        return vars(cls)['_quoted_path']
+    except KeyError:
+        path = _ensure_text(cls.url_path)
+        quoted = quote(path, safe=SEPARATOR)
+        result = cls._quoted_path = path, quoted, _is_simple_path(quoted)
+        return result
+
+
+def _get_url_template(cls):
+    try:
+        return vars(cls)['_url_template']
+    except KeyError:
+        template = cls._url_template = _UrlTemplate(cls)
+        return template
+
 
 @util.add_to_all
 class RestResource(future.with_metaclass(_RestMetaclass, object)):
@@ -179,6 +397,29 @@ class RestResource(future.with_metaclass(_RestMetaclass, object)):
 
     """
 
+    interned = False
+    """Whether instances of this resource are interned (shared).
+
+    If this is true, constructing a resource with the same arguments (the
+    container, which is compared by equality, and the validated id of a
+    collection member) as an existing instance of the same class returns
+    that instance rather than a new one, so graphs of resources referring to
+    the same URLs repeatedly do not hold duplicate objects.  Instances are
+    only weakly referenced for this, so they are still discarded when no
+    longer used.
+
+    Since an interned instance is shared, state set on it (such as the
+    :attr:`session_pool`) is shared as well; it is also the instance first
+    constructed, so its :attr:`container` may be another (equal) object than
+    the one given.
+
+    """
+
+    @classmethod
+    def _intern_key(cls, container):
+        """Return the key of the constructor arguments for interning."""
+        return container
+
     def __init__(self, container):
         def invalid_for_type(reason=None):
             message = ("Container {!r} is invalid for resource type {!r}."
@@ -204,62 +445,296 @@ class RestResource(future.with_metaclass(_RestMetaclass, object)):
                 while hasattr(self, attr):
                     attr += '_'
             setattr(self, attr, container)
-            container = container.url
+            # The container's URL was made by _url_join, so the (quoted)
+            # path may be simply appended to it.
+            path, quoted, simple = _get_quoted_path(type(self))
+            self._url = _url_join_quoted(container.url, path, quoted, simple,
+                                         safe=SEPARATOR)
         elif not isinstance(container, basestring):
             invalid_for_type("It must be a string (URL).")
-        self._url = _url_join(container, self.url_path, safe=SEPARATOR)
+        else:
+            self._url = _url_join(container, self.url_path, safe=SEPARATOR)
+
+    @classmethod
+    def url_for(cls, root, *ids):
+        """Return the URL of a resource of this class without instantiating it.
+
+        :param str root: The URL under which the outermost container (the
+            first resource in the :attr:`container_class` chain) resides.
+        :param ids: The member ids of the `RestCollection` containers in the
+            chain (outermost first) that are required because a resource
+            exists under each member (see :attr:`container_is_collection`;
+            when that is `None`, an id is still expected, but it may be
+            `None`), followed by the id of the member of this class if it is
+            a collection and the URL of a member is desired.
+        :returns: the same URL as the :attr:`url` of the equivalent instance
+        :raises TypeError: if the number of ids is incorrect
+        :raises ValueError: if an id or `root` is invalid
+
+        The URL template is compiled from the container chain on the first
+        call and reused.
+
+        """
+        return _get_url_template(cls).render(root, ids)
 
     @classmethod
     def from_url(cls, url):
         """Construct an instance of this resource based on the given URL."""
         try:
-            return cls._from_url(url)
+            result = cls._parse_url(url)
         except Exception as exc:
+            result = _ParseFailure(lambda exc=exc: str(exc))
+        if isinstance(result, _ParseFailure):
             raise ValueError(
                 "The URL {!r} is invalid for {}.  {}"
-                .format(url, cls.__name__, exc))
+                .format(url, cls.__name__, result))
+        return result
 
     @classmethod
     def _from_url(cls, url, **kwargs):
-        container = cls._get_container_from_url(url)
-        if cls.container_class:
-            container = cls.container_class.from_url(container)
-        return cls(container, **kwargs)
+        result = cls._parse_url(url, **kwargs)
+        if isinstance(result, _ParseFailure):
+            raise ValueError(str(result))
+        return result
+
+    @classmethod
+    def _parse_url(cls, url, **kwargs):
+        """Return an instance of this resource or a `_ParseFailure`.
+
+        The URL is split and its path segments are normalized once; the
+        containers are then parsed from the segments without raising (or
+        formatting the message of) an exception for each interpretation of
+        the URL that fails.  Messages refer to the URL as given.
+
+        """
+        try:
+            url_split = _url_split(_ensure_text(url))
+            segments = [_normalize_segment(x)
+                        for x in url_split[2].split(SEPARATOR)]
+        except ValueError as exc:  # including UnicodeDecodeError
+            return _ParseFailure(lambda exc=exc: str(exc))
+        return cls._parse_segments(url_split, segments, kwargs, url)
 
     @classmethod
-    def _get_container_from_url(cls, url):
-        original_url, url = url, _ensure_text(url)
-        url_split = _url_split(url)
-        segments = [quote(_unquote(x)) for x in url_split[2].split(SEPARATOR)]
-        resource_segments = (quote(_ensure_text(cls.url_path))
-                             .rstrip(SEPARATOR).split(SEPARATOR))
+    def _parse_segments(cls, url_split, segments, kwargs, url=None):
+        # The URL named in messages is built from the segments unless given.
+        if len(segments) > 1 and not segments[-1]:
+            segments = _strip_trailing_empty(segments)
+        try:
+            resource_segments = vars(cls)['_url_segments']
+        except KeyError:
+            resource_segments = cls._url_segments = (
+                None if cls.is_abstract else
+                quote(_ensure_text(cls.url_path))
+                .rstrip(SEPARATOR).split(SEPARATOR))
+        if resource_segments is None:
+            return _ParseFailure(
+                lambda: "{!r} is an abstract RestResource and cannot be "
+                        "instantiated.".format(cls))
         size = len(resource_segments)
         if segments[-size:] != resource_segments:
-            multiple = size != 1
-            raise ValueError(
-                "The last {}segment{} of the URL {!r} {} invalid for {}."
-                .format("{} ".format(size) if multiple else "",
-                        "s" if multiple else "", original_url,
-                        "are" if multiple else "is", cls.__name__))
-        url_split[2] = SEPARATOR.join(segments[:-size])
-        return urlunsplit(url_split)
-
-    def __getattr__(self, item):
-        try:
-            import requests
-        except ImportError:  # pragma: no cover
-            pass
+            def message():
+                multiple = size != 1
+                return ("The last {}segment{} of the URL {!r} {} invalid for "
+                        "{}.".format("{} ".format(size) if multiple else "",
+                                     "s" if multiple else "",
+                                     _url_unsplit(url_split, segments)
+                                     if url is None else url,
+                                     "are" if multiple else "is",
+                                     cls.__name__))
+            return _ParseFailure(message)
+        container_segments = segments[:-size]
+        container_class = cls.container_class
+        if container_class:
+            container = container_class._parse_segments(
+                url_split, container_segments, {})
+            if isinstance(container, _ParseFailure):
+                failure = container
+                return _ParseFailure(
+                    lambda: "The URL {!r} is invalid for {}.  {}".format(
+                        _url_unsplit(url_split, container_segments),
+                        container_class.__name__, failure))
         else:
-            try:
-                func = getattr(requests, item)
-            except AttributeError:
-                pass
-            else:
-                if (inspect.isfunction(func) and
-                    'url' in (inspect.getargspec(func).args if future.PY2 else
-                              inspect.signature(func).parameters)):
-                    return functools.partial(func, url=self.url)
-        util.raise_attribute_error(self, item)
+            container = _url_unsplit(url_split, container_segments)
+        try:
+            return cls(container, **kwargs)
+        except (TypeError, ValueError) as exc:
+            return _ParseFailure(lambda exc=exc: str(exc))
+
+    def request(self, method, **kwargs):
+        """Make a request for this resource through its :attr:`session_pool`.
+
+        :param str method: The HTTP method (token) of the request.
+        :param kwargs: The keyword arguments of
+            :meth:`pyneric.requests.SessionPool.request`; the URL is this
+            resource's :attr:`url` unless `url` is given, and a `priority`
+            (see :meth:`pyneric.rate_limit.RateLimiter.acquire`) may also be
+            given for the :attr:`rate_limiter`.
+        :returns: the `~requests:requests.Response`
+
+        Like this method, there is a method for each HTTP method supported by
+        `requests:requests` (named as its lower-case token, such as
+        :meth:`get`), which takes only the keyword arguments.
+
+        The request is made through the :attr:`response_cache`, the
+        :attr:`single_flight`, the :attr:`retry_policy`, and the
+        :attr:`rate_limiter`, if any.
+
+        """
+        url = kwargs.pop('url', self._url)
+        priority = kwargs.pop('priority', None)
+        return self._request_function(priority)(method, url, **kwargs)
+
+    _session_pool = None
+
+    @property
+    def session_pool(self):
+        """The `~pyneric.requests.SessionPool` through which requests are made.
+
+        Unless this has been set, it is the session pool of the
+        :attr:`container` if that is a resource; otherwise, it is the default
+        (see :func:`pyneric.requests.get_default_session_pool`).
+
+        """
+        pool = self._session_pool
+        if pool is not None:
+            return pool
+        if isinstance(self._container, RestResource):
+            return self._container.session_pool
+        from pyneric.requests import get_default_session_pool
+        return get_default_session_pool()
+
+    @session_pool.setter
+    def session_pool(self, value):
+        self._session_pool = value
+
+    def _request_function(self, priority=None):
+        """Return a function making requests like
+        :meth:`pyneric.requests.SessionPool.request`.
+
+        The requests are made through the :attr:`session_pool`, the
+        :attr:`response_cache`, the :attr:`single_flight`, the
+        :attr:`retry_policy`, and the :attr:`rate_limiter` (with the
+        priority), if any.
+
+        """
+        send = self.session_pool.request
+        limiter = self.rate_limiter
+        if limiter is not None:
+            send = functools.partial(limiter.request, send, priority=priority)
+        policy = self.retry_policy
+        if policy is not None:
+            send = functools.partial(policy.request, send)
+        cache = self.response_cache
+        if cache is not None:
+            send = functools.partial(cache.request, send)
+        flight = self.single_flight
+        if flight is not None:
+            send = functools.partial(flight.request, send)
+        return send
+
+    def _get_function(self, priority=None):
+        """Return a function making GET requests like
+        :meth:`pyneric.requests.SessionPool.get` (see `_request_function`).
+        """
+        if not self._is_layered():
+            return self.session_pool.get
+        return functools.partial(self._request_function(priority),
+                                 http.GET.token)
+
+    def _is_layered(self):
+        """Return whether requests are made through anything but the
+        :attr:`session_pool` (see `_request_function`)."""
+        return (self.response_cache is not None or
+                self.single_flight is not None or
+                self.retry_policy is not None or
+                self.rate_limiter is not None)
+
+    _response_cache = None
+
+    @property
+    def response_cache(self):
+        """The `~pyneric.requests.ResponseCache` of requests, if any.
+
+        Unless this has been set, it is the response cache of the
+        :attr:`container` if that is a resource; otherwise, it is `None`, so
+        responses are not cached.
+
+        """
+        cache = self._response_cache
+        if cache is None and isinstance(self._container, RestResource):
+            return self._container.response_cache
+        return cache
+
+    @response_cache.setter
+    def response_cache(self, value):
+        self._response_cache = value
+
+    _single_flight = None
+
+    @property
+    def single_flight(self):
+        """The `~pyneric.requests.SingleFlight` of requests, if any.
+
+        Unless this has been set, it is the single-flight coalescer of the
+        :attr:`container` if that is a resource; otherwise, it is `None`, so
+        concurrent identical requests are each made.
+
+        """
+        flight = self._single_flight
+        if flight is None and isinstance(self._container, RestResource):
+            return self._container.single_flight
+        return flight
+
+    @single_flight.setter
+    def single_flight(self, value):
+        self._single_flight = value
+
+    _rate_limiter = None
+
+    @property
+    def rate_limiter(self):
+        """The `~pyneric.rate_limit.RateLimiter` of requests, if any.
+
+        Unless this has been set, it is the rate limiter of the
+        :attr:`container` if that is a resource; otherwise, it is the one set
+        for the container URL (the API root) with :func:`set_rate_limiter`,
+        if any.
+
+        """
+        limiter = self._rate_limiter
+        if limiter is not None:
+            return limiter
+        container = self._container
+        if isinstance(container, RestResource):
+            return container.rate_limiter
+        if _root_rate_limiters:
+            return _root_rate_limiters.get(container.rstrip(SEPARATOR))
+        return None
+
+    @rate_limiter.setter
+    def rate_limiter(self, value):
+        self._rate_limiter = value
+
+    _retry_policy = None
+
+    @property
+    def retry_policy(self):
+        """The `~pyneric.requests.RetryPolicy` of requests, if any.
+
+        Unless this has been set, it is the retry policy of the
+        :attr:`container` if that is a resource; otherwise, it is `None`, so
+        failed requests are not retried.
+
+        """
+        policy = self._retry_policy
+        if policy is None and isinstance(self._container, RestResource):
+            return self._container.retry_policy
+        return policy
+
+    @retry_policy.setter
+    def retry_policy(self, value):
+        self._retry_policy = value
 
     @property
     def container(self):
@@ -279,6 +754,40 @@ class RestResource(future.with_metaclass(_RestMetaclass, object)):
         """The complete URL of the resource."""
         return self._url
 
+    def __eq__(self, other):
+        """Return whether the other resource has the same class and URL."""
+        if not isinstance(other, RestResource):
+            return NotImplemented
+        return type(self) is type(other) and self._url == other._url
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash((type(self), self._url))
+
+
+for _method in http.REQUEST_METHODS:
+    # A closure is needed to refer to the correct method.
+    def _get_method_func(method):
+        name = method.token.lower()
+
+        def _method_func(self, **kwargs):
+            if self._is_layered():
+                if method is http.HEAD:
+                    kwargs.setdefault('allow_redirects', False)
+                return self.request(method.token, **kwargs)
+            url = kwargs.pop('url', self._url)
+            kwargs.pop('priority', None)
+            return getattr(self.session_pool, name)(url, **kwargs)
+        _method_func.__name__ = future.native_str(name)
+        _method_func.__doc__ = (
+            "Make a {} request for this resource (see :meth:`request`)."
+            .format(method.token))
+        return _method_func
+    setattr(RestResource, _method.token.lower(), _get_method_func(_method))
+
 
 class _RestCollectionMetaclass(_RestMetaclass):
 
@@ -324,6 +833,13 @@ class RestCollection(future.with_metaclass(_RestCollectionMetaclass,
 
     """
 
+    pagination = None
+    """The default pagination strategy of :meth:`iter_members`.
+
+    This is a `Pagination` instance, or `None` for a `LinkHeaderPagination`.
+
+    """
+
     def __init__(self, container, id=None):
         """Initialize an instance of this REST collection or a member.
 
@@ -336,39 +852,158 @@ class RestCollection(future.with_metaclass(_RestCollectionMetaclass,
         """
         super().__init__(container)
         self._id = id = self.validate_id(id)
-        if id is None:
-            return
-        self._url = _url_join(self._url, id)
+        if id is not None:
+            self._url = _member_url(self._url, id)
 
     @classmethod
-    def _from_url(cls, url, **kwargs):
-        assert not kwargs, ("RestCollection._from_url should never receive "
-                            "keyword arguments.")
-        super_method = super()._from_url
-        try:
-            result = super_method(url)
-        except ValueError:
-            result = None
-        url_split = _url_split(_ensure_text(url))
-        url_split[2], id = url_split[2].rsplit(SEPARATOR, 1)
-        try:
-            id = cls.validate_id(_unquote(id))
-        except ValueError:
-            if result:
-                return result
-            raise
-        collection_url = urlunsplit(url_split)
+    def _intern_key(cls, container, id=None):
+        return container, cls.validate_id(id)
+
+    @classmethod
+    def fetch_many(cls, container, ids, max_workers=10, ordered=True,
+                   raise_for_status=False, stats=None, **kwargs):
+        """Fetch (GET) members of this collection concurrently.
+
+        :param str/RestResource container: See :attr:`RestResource.container`.
+        :param ids: The ids (see :attr:`id`) of the members.
+        :type ids: iterable
+        :param int max_workers: The maximum number of requests made at once
+            (by a pool of threads).
+        :param bool ordered: Whether the results are in the order of `ids`;
+            otherwise, they are in the order in which they complete.
+        :param bool raise_for_status: Whether a response with an error status
+            results in an error (see
+            `~requests:requests.Response.raise_for_status`).
+        :param stats: Statistics updated as the results are produced.
+        :type stats: `RestFetchStats` or None
+        :param kwargs: The keyword arguments of each request (see
+            :meth:`~RestResource.get`).
+        :returns: an iterator of a `RestFetchResult` for each id
+        :raises ValueError: if `max_workers` is not positive
+
+        The ids are validated with :meth:`validate_id`.  An invalid id, or an
+        exception raised while making a request, is the :attr:`error` of the
+        id's result rather than raised, so it does not abort the others.
+
+        The requests are made through the :attr:`~RestResource.session_pool`
+        (and the other layers, such as the
+        :attr:`~RestResource.retry_policy`, if any; see
+        :meth:`~RestResource.request`) of the collection; the pool's
+        `max_connections_per_host` should be at least `max_workers` for all
+        of the connections to be kept alive.  Only a few ids beyond those
+        with requests in progress are taken from `ids` at a time, so it may
+        be large (or lazily produced).
+
+        This requires `concurrent.futures` (the `futures` package on
+        Python 2).
+
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be positive.")
+        return _fetch_many(cls(container), ids, max_workers, ordered,
+                           raise_for_status, stats, kwargs)
+
+    @classmethod
+    def member_urls(cls, container, ids, sink=None, chunk_size=10000):
+        """Generate the URLs of many members of this collection.
+
+        :param str/RestResource container: See :attr:`RestResource.container`.
+        :param ids: The ids (see :attr:`id`) of the members.
+        :type ids: iterable, `array.array`, or NumPy array
+        :param sink: A file-like object (in text mode) to which the URLs are
+            written, each followed by a newline, instead of being returned.
+        :param int chunk_size: The number of URLs generated (and written) at
+            a time.
+        :returns: an iterator of the URLs or, if `sink` is given, the number
+            of URLs written
+        :raises ValueError: if an id is invalid or `None` or `chunk_size` is
+            not positive
+
+        Each URL is the same as the :attr:`~RestResource.url` of the member
+        instantiated with the id, but the URL of the collection is computed
+        only once.  The URL is simply appended to it for ids that need no
+        URL-quoting (such as integers and ASCII words), and an
+        `array.array` or NumPy array of integers is converted to integers a
+        chunk at a time.  The ids are taken from `ids` a chunk at a time, so
+        it may be large (or lazily produced); when writing to `sink`, the
+        chunks before that of an invalid id have already been written.
+
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive.")
+        chunks = _member_url_chunks(cls, cls(container).url, ids, chunk_size)
+        if sink is None:
+            return itertools.chain.from_iterable(chunks)
+        count = 0
+        for urls in chunks:
+            urls.append('')
+            sink.write('\n'.join(urls))
+            count += len(urls) - 1
+        return count
+
+    def iter_members(self, pagination=None, read_ahead=1, params=None,
+                     **kwargs):
+        """Iterate over the members listed by this collection, page by page.
+
+        :param pagination: The pagination strategy; by default, the
+            :attr:`pagination` of this collection.
+        :type pagination: `Pagination` or None
+        :param int read_ahead: The number of pages fetched (by a background
+            thread) ahead of the page whose members are being iterated over,
+            or 0 to fetch each page only when its members are needed.
+        :param params: The query parameters of the first page (which the
+            pagination strategy may carry over to subsequent pages).
+        :type params: dict or None
+        :param kwargs: The other keyword arguments of each request (see
+            :meth:`~RestResource.get`).
+        :returns: an iterator of the members (as decoded from JSON)
+        :raises ValueError: if this is a member rather than the collection or
+            `read_ahead` is negative
+
+        No request is made until the first member is needed, and at most
+        `read_ahead` pages beyond the current one are held at once.  An
+        error status of a response is raised (see
+        `~requests:requests.Response.raise_for_status`) when the members of
+        the page would have been reached.
+
+        """
+        if self._id is not None:
+            raise ValueError("{!r} is a member, not the collection."
+                             .format(self))
+        if read_ahead < 0:
+            raise ValueError("read_ahead must not be negative.")
+        if pagination is None:
+            pagination = self.pagination or LinkHeaderPagination()
+        pages = _iter_pages(self, pagination, params, kwargs)
+        if read_ahead:
+            pages = _read_ahead(pages, read_ahead)
+        return _iter_members(pages)
+
+    @classmethod
+    def _parse_segments(cls, url_split, segments, kwargs, url=None):
+        assert not kwargs, ("RestCollection._parse_segments should never "
+                            "receive keyword arguments.")
+        if len(segments) > 1 and not segments[-1]:
+            segments = _strip_trailing_empty(segments)
+        super_method = super()._parse_segments
+        result = super_method(url_split, segments, {}, url)
+        if isinstance(result, _ParseFailure):
+            failure, result = result, None
+        if len(segments) < 2:
+            return result or failure
         try:
-            member_result = super_method(collection_url, id=id)
-        except ValueError:
-            if result:
-                return result
-            raise
+            id = cls.validate_id(_unquote(segments[-1]))
+        except ValueError as exc:
+            return result or _ParseFailure(lambda exc=exc: str(exc))
+        member_result = super_method(url_split, segments[:-1], dict(id=id))
+        if isinstance(member_result, _ParseFailure):
+            return result or member_result
         if result:
-            raise ValueError(
-                "The URL {!r} is ambiguous for {} as to whether "
-                "it is for the collection or one of its members."
-                .format(url, cls.__name__))
+            return _ParseFailure(
+                lambda: "The URL {!r} is ambiguous for {} as to whether it is "
+                        "for the collection or one of its members."
+                        .format(_url_unsplit(url_split, segments)
+                                if url is None else url, cls.__name__))
         return member_result
 
     @classmethod
@@ -411,3 +1046,642 @@ class RestCollection(future.with_metaclass(_RestCollectionMetaclass,
 
         """
         return self._id
+
+
+@util.add_to_all
+class RestFetchResult(namedtuple('RestFetchResult', 'id url response error')):
+
+    """The result of fetching a member with :meth:`RestCollection.fetch_many`.
+
+    The :attr:`id` is as validated (or as given if it is invalid).  The
+    :attr:`url` and :attr:`response` are `None` if there is none, such as
+    when the id is invalid, and the :attr:`error` is the exception raised for
+    the member, if any.
+
+    """
+
+    __slots__ = ()
+
+
+@util.add_to_all
+class RestFetchStats(object):
+
+    """Throughput and latency statistics of :meth:`RestCollection.fetch_many`.
+
+    Pass an instance to `fetch_many` to have it updated as each result is
+    produced; its string representation is a summary.  The number of results
+    produced and of those with an error are the :attr:`count` and
+    :attr:`errors` attributes, the number of seconds from the start until the
+    last result is the :attr:`elapsed` attribute, and the number of seconds
+    taken by each request made are in the :attr:`latencies` list.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.latencies = []
+
+    def __str__(self):
+        if not self.latencies:
+            return "{} results ({} errors), no requests".format(
+                self.count, self.errors)
+        return (
+            "{} results ({} errors) in {:.3f} s ({:.1f}/s); latency (ms): "
+            "mean {:.1f}, median {:.1f}, 90% {:.1f}, 99% {:.1f}, max {:.1f}"
+            .format(self.count, self.errors, self.elapsed, self.throughput,
+                    *(1000 * x for x in (
+                        self.mean_latency, self.latency_percentile(50),
+                        self.latency_percentile(90),
+                        self.latency_percentile(99), self.max_latency))))
+
+    @property
+    def throughput(self):
+        """The number of results per second."""
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mean_latency(self):
+        """The mean number of seconds taken by a request."""
+        latencies = self.latencies
+        return sum(latencies) / len(latencies) if latencies else 0.0
+
+    @property
+    def max_latency(self):
+        """The maximum number of seconds taken by a request."""
+        return max(self.latencies) if self.latencies else 0.0
+
+    def latency_percentile(self, percent):
+        """Return the given percentile (nearest rank) of the latencies."""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return 0.0
+        rank = int(math.ceil(percent / 100 * len(latencies)))
+        return latencies[min(max(rank, 1), len(latencies)) - 1]
+
+    def _add(self, result, latency, start):
+        self.count += 1
+        if result.error is not None:
+            self.errors += 1
+        if latency is not None:
+            self.latencies.append(latency)
+        self.elapsed = _monotonic() - start
+
+
+_INTEGER_TYPECODES = frozenset('bBhHiIlLqQ')
+"""The `array.array` typecodes of integers"""
+
+
+def _iter_id_chunks(ids, size):
+    """Iterate over lists of at most `size` ids.
+
+    Whether each list contains only integers (of an integer array) is also
+    yielded.
+
+    """
+    typecode = getattr(ids, 'typecode', None)
+    dtype = getattr(ids, 'dtype', None)  # of a NumPy array
+    if (typecode in _INTEGER_TYPECODES or
+            getattr(dtype, 'kind', None) in ('i', 'u') and
+            getattr(ids, 'ndim', None) == 1):
+        for start in range(0, len(ids), size):
+            yield True, ids[start:start + size].tolist()
+        return
+    ids = iter(ids)
+    while True:
+        chunk = list(itertools.islice(ids, size))
+        if not chunk:
+            return
+        yield False, chunk
+
+
+def _member_url_chunks(cls, collection_url, ids, size):
+    """Iterate over lists of the member URLs (see `_member_url`) of ids."""
+    if _FAST_JOIN_BASE.match(collection_url):
+        if collection_url.endswith(SEPARATOR):
+            prefix, suffix = collection_url, SEPARATOR
+        else:
+            prefix, suffix = collection_url + SEPARATOR, ''
+    else:
+        prefix = None  # Each URL is joined by _url_join.
+    # Unless validate_id is overridden, an integer id is itself valid and
+    # needs no quoting if the id type is int or str, and a nonempty text id
+    # is itself valid if the id type is str.
+    default_validation = (getattr(cls.validate_id, '__func__', None) is
+                          RestCollection.validate_id.__func__)
+    integral = (default_validation and prefix is not None and
+                cls.id_type in (int, str))
+    textual = default_validation and cls.id_type is str
+    validate_id = cls.validate_id
+    unquoted = _UNQUOTED_SEGMENT.match
+    for integers, chunk in _iter_id_chunks(ids, size):
+        if integers and integral:
+            yield [prefix + x + suffix for x in map(str, chunk)]
+            continue
+        urls = []
+        for id in chunk:
+            if integral and type(id) is int:
+                urls.append(prefix + str(id) + suffix)
+                continue
+            if textual and type(id) is str and id:
+                path = id
+            else:
+                id = validate_id(id)
+                if id is None:
+                    raise ValueError(
+                        "A member id is required for {!r}.".format(cls))
+                path = _ensure_text(id)
+            if (prefix is not None and unquoted(path) and
+                    path not in ('.', '..')):
+                urls.append(prefix + path + suffix)
+            else:
+                urls.append(_member_url(collection_url, path))
+        yield urls
+
+
+_root_rate_limiters = {}
+"""The rate limiters set with `set_rate_limiter` keyed by API root URL
+
+The URLs are without trailing slashes.
+
+"""
+
+
+@util.add_to_all
+def set_rate_limiter(root, limiter):
+    """Set the rate limiter of the resources under an API root URL.
+
+    :param str root: The URL that is the container of the outermost
+        resources (see :attr:`RestResource.container`); whether it has a
+        trailing slash is not significant.
+    :param limiter: The `~pyneric.rate_limit.RateLimiter` of the resources
+        (see :attr:`RestResource.rate_limiter`), or `None` to remove it.
+
+    """
+    root = _ensure_text(root).rstrip(SEPARATOR)
+    if limiter is None:
+        _root_rate_limiters.pop(root, None)
+    else:
+        _root_rate_limiters[root] = limiter
+
+
+def _fetch_many(collection, ids, max_workers, ordered, raise_for_status,
+                stats, kwargs):
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    collection_url = collection.url
+    get = collection._get_function(kwargs.pop('priority', None))
+    ids = iter(ids)
+    window = 2 * max_workers  # the maximum number of pending results
+    pending = deque()  # (id, url, future of (response, error, latency))
+    start = _monotonic()
+    executor = ThreadPoolExecutor(max_workers)
+    try:
+        while True:
+            for id in ids:
+                try:
+                    id, url = _fetch_url(collection, collection_url, id)
+                except ValueError as exc:
+                    future = _completed_future((None, exc, None))
+                    url = None
+                else:
+                    future = executor.submit(_fetch, get, url,
+                                             raise_for_status, kwargs)
+                pending.append((id, url, future))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                break
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done_futures = wait([x[2] for x in pending],
+                                    return_when=FIRST_COMPLETED)[0]
+                done = [x for x in pending if x[2] in done_futures]
+                pending = deque(x for x in pending
+                                if x[2] not in done_futures)
+            for id, url, future in done:
+                response, error, latency = future.result()
+                result = RestFetchResult(id, url, response, error)
+                if stats is not None:
+                    stats._add(result, latency, start)
+                yield result
+    finally:
+        for entry in pending:
+            entry[2].cancel()
+        executor.shutdown(wait=False)
+
+
+def _fetch_url(collection, collection_url, id):
+    id = collection.validate_id(id)
+    if id is None:
+        raise ValueError("The id of a member cannot be None.")
+    return id, _member_url(collection_url, id)
+
+
+def _completed_future(result):
+    from concurrent.futures import Future
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _fetch(get, url, raise_for_status, kwargs):
+    start = _monotonic()
+    response = None
+    try:
+        response = get(url, **kwargs)
+        if raise_for_status:
+            response.raise_for_status()
+    except Exception as exc:
+        return response, exc, _monotonic() - start
+    return response, None, _monotonic() - start
+
+
+def _iter_pages(collection, pagination, params, kwargs):
+    get = collection._get_function(kwargs.pop('priority', None))
+    request = pagination.first_request(collection.url, dict(params or {}))
+    while request is not None:
+        response = get(request[0], params=request[1], **kwargs)
+        response.raise_for_status()
+        items, request = pagination.read_page(request, response)
+        yield items
+
+
+def _iter_members(pages):
+    try:
+        for page in pages:
+            for item in page:
+                yield item
+    finally:
+        close = getattr(pages, 'close', None)
+        if close:
+            close()
+
+
+_END = object()
+"""Marks the end of the values produced by `_read_ahead`"""
+
+
+def _read_ahead(iterable, size):
+    """Yield the values of `iterable`, iterated over by a background thread.
+
+    At most `size` values are produced (or being produced) ahead of the one
+    most recently yielded.  An exception raised by the iteration is raised
+    where the value would have been yielded.
+
+    """
+    iterator = iter(iterable)
+    results = queue.Queue()  # (value, exception)
+    slots = threading.Semaphore(size)
+    stopped = threading.Event()
+
+    def produce():
+        while True:
+            slots.acquire()
+            if stopped.is_set():
+                return
+            try:
+                value = next(iterator, _END)
+            except Exception as exc:
+                results.put((None, exc))
+                return
+            results.put((value, None))
+            if value is _END:
+                return
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            value, exc = results.get()
+            if exc is not None:
+                raise exc
+            if value is _END:
+                return
+            slots.release()
+            yield value
+    finally:
+        stopped.set()
+        slots.release()  # in case the thread is waiting for a slot
+
+
+@util.add_to_all
+class Pagination(object):
+
+    """Base class for pagination strategies of `RestCollection.iter_members`.
+
+    A strategy determines the request of each page of a collection, as a
+    tuple of its URL and query parameters (dict), and reads the members
+    listed by each response.
+
+    :param items_key: How the members are found in the content (decoded from
+        JSON) of a page: `None` if the content is the list of members, the
+        key of the list in the content, or a function given the content and
+        returning the list.
+
+    """
+
+    def __init__(self, items_key=None):
+        self.items_key = items_key
+
+    def first_request(self, url, params):
+        """Return the request of the first page.
+
+        :param str url: The URL of the collection.
+        :param dict params: The query parameters given to
+            :meth:`~RestCollection.iter_members` (a copy that may be changed).
+        :returns: the URL and query parameters of the first page
+        :rtype: tuple
+
+        """
+        return url, params
+
+    def read_page(self, request, response):
+        """Return the members of a page and the request of the next page.
+
+        :param tuple request: The request of the page.
+        :param response: The `~requests:requests.Response` of the page.
+        :returns: the list of members and the request of the next page (or
+            `None` if this is the last page)
+        :rtype: tuple
+
+        This must be overridden in a subclass.
+
+        """
+        raise NotImplementedError
+
+    def _get_items(self, content):
+        items_key = self.items_key
+        if items_key is None:
+            return content
+        if callable(items_key):
+            return items_key(content)
+        return content[items_key]
+
+
+@util.add_to_all
+class LinkHeaderPagination(Pagination):
+
+    """Follow the "next" link of the Link header of each page (RFC 5988).
+
+    :param items_key: See `Pagination`.
+
+    """
+
+    def read_page(self, request, response):
+        items = self._get_items(response.json())
+        link = response.links.get('next', {}).get('url')
+        if not link:
+            return items, None
+        return items, (urljoin(response.url, link), {})
+
+
+@util.add_to_all
+class OffsetPagination(Pagination):
+
+    """Request pages by offset and limit query parameters.
+
+    :param int limit: The number of members requested per page.
+    :param str offset_param: The query parameter of the offset.
+    :param str limit_param: The query parameter of the limit.
+    :param int start: The offset of the first page.
+    :param items_key: See `Pagination`.
+
+    A page with fewer members than the limit is the last page.
+
+    """
+
+    def __init__(self, limit=100, offset_param='offset', limit_param='limit',
+                 start=0, items_key=None):
+        super().__init__(items_key)
+        self.limit = limit
+        self.offset_param = offset_param
+        self.limit_param = limit_param
+        self.start = start
+
+    def first_request(self, url, params):
+        params[self.offset_param] = self.start
+        params[self.limit_param] = self.limit
+        return url, params
+
+    def read_page(self, request, response):
+        items = self._get_items(response.json())
+        if len(items) < self.limit:
+            return items, None
+        url, params = request
+        params = dict(params)
+        params[self.offset_param] += len(items)
+        return items, (url, params)
+
+
+@util.add_to_all
+class CursorPagination(Pagination):
+
+    """Request pages by the cursor given in the content of each page.
+
+    :param str cursor_param: The query parameter of the cursor.
+    :param next_cursor_key: The key of the next page's cursor in the content
+        (decoded from JSON) of a page, or a function given the content and
+        returning the cursor.  There is no next page if it is missing, empty,
+        or `None`.
+    :param items_key: See `Pagination`.
+
+    """
+
+    def __init__(self, cursor_param='cursor', next_cursor_key='next_cursor',
+                 items_key='items'):
+        super().__init__(items_key)
+        self.cursor_param = cursor_param
+        self.next_cursor_key = next_cursor_key
+
+    def read_page(self, request, response):
+        content = response.json()
+        items = self._get_items(content)
+        next_cursor_key = self.next_cursor_key
+        if callable(next_cursor_key):
+            cursor = next_cursor_key(content)
+        else:
+            cursor = content.get(next_cursor_key)
+        if cursor in (None, ''):
+            return items, None
+        url, params = request
+        params = dict(params)
+        params[self.cursor_param] = cursor
+        return items, (url, params)
+
+
+@util.add_to_all
+class RestRouteMatch(namedtuple('RestRouteMatch', 'resource_class ids')):
+
+    """The result of resolving a URL with a `RestRouter`.
+
+    The :attr:`ids` are the arguments (after the root URL) that, when passed
+    to the :meth:`~RestResource.url_for` method of :attr:`resource_class`,
+    return the resolved URL (apart from any trailing slash, query, or
+    fragment).
+
+    """
+
+    __slots__ = ()
+
+
+class _RouteNode(object):
+
+    __slots__ = ('static', 'ids', 'routes')
+
+    def __init__(self):
+        self.static = {}  # next nodes keyed by URL-quoted segment
+        self.ids = []  # (collection class, next node) for member ids
+        self.routes = []  # (resource class, ids layout) ending here
+
+
+@util.add_to_all
+class RestRouter(object):
+
+    """Resolve URLs to the resource classes that they represent.
+
+    The router is a trie of URL path segments built from the URL templates
+    (see :meth:`RestResource.url_for`) of the given resource classes, in
+    which the member ids of collections are placeholders.  Resolving a URL
+    walks the trie once, preferring literal segments to ids and backtracking
+    only when a path does not lead to a resource.  Ids are validated with
+    :meth:`RestCollection.validate_id`.
+
+    :param str root: The URL under which the outermost containers reside.
+    :param resource_classes: The resource classes to route to; by default,
+        all existing (non-abstract) resource classes are routed to (see
+        :meth:`~pyneric.meta.Metaclass.registered_classes`).  When more than
+        one class matches a URL, the earlier one (in this iterable or, by
+        default, by module and name) is the result.
+
+    """
+
+    def __init__(self, root, resource_classes=None):
+        root = _ensure_text(root)
+        self._prefix = self._normalize_netloc(root).rstrip(SEPARATOR)
+        self._root = _RouteNode()
+        if resource_classes is None:
+            resource_classes = sorted(
+                (x for x in RestResource.registered_classes()
+                 if not x.is_abstract),
+                key=lambda x: (x.__module__, x.__name__))
+        for resource_class in resource_classes:
+            self.add(resource_class)
+
+    @property
+    def root(self):
+        """The URL under which the outermost containers reside."""
+        return self._prefix
+
+    def add(self, resource_class):
+        """Add the routes of the given resource class.
+
+        :raises TypeError: if the resource class is abstract
+
+        """
+        variants = [((), ())]  # (tokens, ids layout)
+        for cls, _, quoted, _, takes_id, required in (
+                _get_url_template(resource_class).levels):
+            segments = tuple(quoted.rstrip(SEPARATOR).split(SEPARATOR))
+            variants = [(tokens + segments, layout)
+                        for tokens, layout in variants]
+            if not takes_id:
+                continue
+            with_id = [(tokens + (cls,), layout + (True,))
+                       for tokens, layout in variants]
+            if required:
+                variants = with_id
+            elif cls is resource_class:  # The collection itself
+                variants += with_id
+            else:  # Either the collection or a member contains the next.
+                variants = with_id + [(tokens, layout + (False,))
+                                      for tokens, layout in variants]
+        for tokens, layout in variants:
+            node = self._root
+            for token in tokens:
+                if isinstance(token, basestring):
+                    node = node.static.setdefault(token, _RouteNode())
+                    continue
+                for cls, next_node in node.ids:
+                    if cls is token:
+                        node = next_node
+                        break
+                else:
+                    next_node = _RouteNode()
+                    node.ids.append((token, next_node))
+                    node = next_node
+            node.routes.append((resource_class, layout))
+
+    def resolve(self, url):
+        """Return the `RestRouteMatch` for the given URL.
+
+        :returns: `None` if the URL is not that of a routed resource class
+
+        """
+        url = _ensure_text(url)
+        prefix = self._prefix
+        if not url.startswith(prefix):
+            url = self._normalize_netloc(url)
+            if not url.startswith(prefix):
+                return None
+        path = url[len(prefix):]
+        for delimiter in '?#':
+            path = path.split(delimiter, 1)[0]
+        if path and not path.startswith(SEPARATOR):
+            return None
+        path = path.strip(SEPARATOR)
+        segments = path.split(SEPARATOR) if path else []
+        return self._match(self._root, segments, 0, ())
+
+    def resolve_many(self, urls):
+        """Return a list of the results of :meth:`resolve` for the URLs.
+
+        Each distinct URL is only resolved once.
+
+        """
+        results = {}
+        resolve = self.resolve
+        return [results[url] if url in results else
+                results.setdefault(url, resolve(url))
+                for url in urls]
+
+    def _match(self, node, segments, index, ids):
+        if index == len(segments):
+            if not node.routes:
+                return None
+            resource_class, layout = node.routes[0]
+            ids = iter(ids)
+            return RestRouteMatch(resource_class,
+                                  tuple(next(ids) if x else None
+                                        for x in layout))
+        segment = segments[index]
+        if _UNQUOTED_SEGMENT.match(segment):
+            normalized = unquoted = segment
+        else:
+            try:
+                unquoted = _unquote(segment)
+            except UnicodeDecodeError:
+                return None
+            normalized = quote(unquoted)
+        next_node = node.static.get(normalized)
+        if next_node is not None:
+            result = self._match(next_node, segments, index + 1, ids)
+            if result is not None:
+                return result
+        for collection_class, next_node in node.ids:
+            try:
+                id = collection_class.validate_id(unquoted)
+            except ValueError:
+                continue
+            result = self._match(next_node, segments, index + 1,
+                                 ids + (id,))
+            if result is not None:
+                return result
+        return None
+
+    @staticmethod
+    def _normalize_netloc(url):
+        scheme, netloc, path = urlsplit(url)[:3]
+        return urlunsplit((scheme.lower(), netloc.lower(), path, '', ''))
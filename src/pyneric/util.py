@@ -6,13 +6,33 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from pyneric.future import *
 
+from collections import OrderedDict
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:  # Python 2
+    from collections import Mapping, Sequence
+import copy
 import keyword
 import inspect
 import re
+import threading
 
 
 __all__ = ['add_to_all']
 
+_PASCALIZE_PATTERN = re.compile('(?:^|_)(.)')
+
+_UNDERSCORE_PATTERNS = {
+    False: re.compile('([A-Z])'),
+    True: re.compile('([A-Z]+(?=($|[A-Z][a-z]))|[A-Z])'),
+}
+"""Compiled :func:`underscore` patterns keyed by the *multicap* argument"""
+
+_MISSING = object()
+
+_MOVE_TO_END = hasattr(OrderedDict, 'move_to_end')
+"""Whether OrderedDict.move_to_end is available (PY2 note: it is not)"""
+
 
 def add_to_all(named_object):
     """Add the name of the given object to its module's *__all__* attribute.
@@ -49,9 +69,193 @@ def add_to_all(named_object):
     return named_object
 
 
+@add_to_all
+class CaseConverter(object):
+
+    """Memoizing converter of identifiers between casing conventions.
+
+    The conversions are the same as those of :func:`pascalize` and
+    :func:`underscore` (which use a shared instance of this class), but each
+    result is kept in a bounded `LRUCache` so that converting an identifier
+    that has been seen before (along with its validation) costs only a cache
+    lookup.  Values that fail validation are never cached.
+
+    :param int cache_size: the maximum number of conversions to remember
+
+    """
+
+    def __init__(self, cache_size=4096):
+        self._cache = LRUCache(cache_size)
+
+    @property
+    def cache(self):
+        """The `LRUCache` containing the memoized conversions."""
+        return self._cache
+
+    def _convert(self, key, func, args):
+        cache = self._cache
+        try:
+            result = cache.get(key, _MISSING)
+        except TypeError:  # unhashable value; let func raise appropriately
+            return func(*args)
+        if result is _MISSING:
+            result = cache[key] = func(*args)
+        return result
+
+    def pascalize(self, value, validate=True):
+        """Return the memoized result of :func:`pascalize`."""
+        return self._convert(('p', type(value), value, validate),
+                             _pascalize, (value, validate))
+
+    def pascalize_many(self, values, validate=True):
+        """Return a list of the :meth:`pascalize` results for *values*."""
+        return self._convert_many(self.pascalize, values, (validate,))
+
+    def underscore(self, value, validate=True, multicap=True):
+        """Return the memoized result of :func:`underscore`."""
+        return self._convert(('u', type(value), value, validate, multicap),
+                             _underscore, (value, validate, multicap))
+
+    def underscore_many(self, values, validate=True, multicap=True):
+        """Return a list of the :meth:`underscore` results for *values*."""
+        return self._convert_many(self.underscore, values,
+                                  (validate, multicap))
+
+    @staticmethod
+    def _convert_many(convert, values, args):
+        # Repeated values within the batch skip even the shared cache (and its
+        # lock) by way of a local mapping.
+        local = {}
+        result = []
+        append = result.append
+        for value in values:
+            try:
+                converted = local.get((type(value), value), _MISSING)
+            except TypeError:  # unhashable value; let convert raise
+                converted = _MISSING
+            if converted is _MISSING:
+                converted = local[type(value), value] = convert(value, *args)
+            append(converted)
+        return result
+
+
+@add_to_all
+def convert_key_events(events, convert=None):
+    """Generate the given JSON parsing events with map keys converted.
+
+    :param events: ``(event, value)`` pairs such as those produced by
+                   ``ijson.basic_parse``
+    :type events: iterable of `tuple`
+    :param convert: the function used to convert each key (from camelCase or
+                    PascalCase to underscores by default; see
+                    :func:`convert_keys`)
+    :type convert: `callable` or `None`
+    :returns: the same events, but with the value of each ``'map_key'`` event
+              replaced by its conversion
+    :rtype: generator of `tuple`
+
+    This is the streaming counterpart of :func:`convert_keys`; since only one
+    event is handled at a time, the size of the document is irrelevant to the
+    memory used.  Each distinct key is converted only once per call.
+
+    """
+    if convert is None:
+        convert = _underscore_key
+    cache = {}
+    for event, value in events:
+        if event == 'map_key':
+            try:
+                value = cache[value]
+            except KeyError:
+                cache[value] = value = convert(value)
+        yield event, value
+
+
+@add_to_all
+def convert_keys(obj, convert=None, in_place=False):
+    r"""Return the given JSON-like object with its mapping keys converted.
+
+    :param obj: the object whose `dict`\ s (at any depth within `dict`\ s and
+                `list`\ s) shall have their string keys converted
+    :param convert: the function used to convert each key; by default, keys
+                    in camelCase or PascalCase are converted to underscores
+                    (like :func:`underscore`), and leading underscores are
+                    kept
+    :type convert: `callable` or `None`
+    :param bool in_place: whether to alter *obj* rather than return a copy
+    :returns: the converted object (*obj* itself if *in_place* is true)
+    :raises ValueError: if two keys of a `dict` convert to the same key, or
+                        if the default conversion of a key fails validation
+
+    Each distinct key is converted only once per call, so an array of many
+    objects with the same keys costs little more than a copy.  Passing a true
+    *in_place* avoids holding a converted copy of a large document in memory
+    alongside the original; the `dict`\ s are only altered once all of their
+    keys have been converted, so *obj* is unchanged if this raises.
+
+    Nesting depth is not limited by the recursion limit.  Values that are not
+    `dict`\ s or `list`\ s are neither copied nor traversed.
+
+    """
+    if convert is None:
+        convert = _underscore_key
+    if not isinstance(obj, (dict, list)):
+        return obj
+    cache = {}
+    result = obj if in_place else type(obj)()
+    replacements = []  # (dict, converted items) when in place
+    stack = [(obj, result)]
+    while stack:
+        source, target = stack.pop()
+        if isinstance(source, dict):
+            if in_place:
+                target = {}
+                replacements.append((source, target))
+            for key, value in source.items():
+                original = key
+                if isinstance(key, basestring):
+                    try:
+                        key = cache[key]
+                    except KeyError:
+                        cache[key] = key = convert(key)
+                if key in target:
+                    raise ValueError(
+                        "More than one key (including {!r}) converts to {!r}."
+                        .format(original, key))
+                if isinstance(value, (dict, list)):
+                    child = value if in_place else type(value)()
+                    stack.append((value, child))
+                    value = child
+                target[key] = value
+        elif in_place:
+            stack.extend((x, x) for x in source
+                         if isinstance(x, (dict, list)))
+        else:
+            for value in source:
+                if isinstance(value, (dict, list)):
+                    child = type(value)()
+                    stack.append((value, child))
+                    value = child
+                target.append(value)
+    for source, items in replacements:
+        source.clear()
+        source.update(items)
+    return result
+
+
+def _underscore_key(key):
+    """Return the :func:`underscore` conversion of a camelCase or PascalCase
+    key, keeping any leading underscores."""
+    valid_python_identifier(key, exception=True)
+    name = key.lstrip('_')
+    prefix = key[:len(key) - len(name)]
+    return prefix + _case_converter.underscore(name[:1].upper() + name[1:],
+                                               validate=False)
+
+
 @add_to_all
 def get_from_dict_or_objects(name, dict, objects, pop_from_dict=False):
-    """Attempt to get a value via name from a mapping then from objects.
+    r"""Attempt to get a value via name from a mapping then from objects.
 
     :param str name: the name for which to look
     :param dict dict: the mapping in which to look first (by key)
@@ -93,6 +297,211 @@ def get_function_name(back=0):
     return inspect.stack()[1 + back][3]
 
 
+def _hashable(value):
+    """Return a hashable equivalent of a JSON-like value.
+
+    Mappings are converted to sorted tuples of their items, and lists and
+    tuples to tuples of their converted items.
+
+    :raises TypeError: if the value (or one within it) is unhashable
+
+    """
+    if isinstance(value, Mapping):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(x) for x in value)
+    hash(value)
+    return value
+
+
+def _copy_exception(error):
+    """Return a copy of an exception, caused by it, to raise again.
+
+    An exception raised in several threads (or coroutines) is raised as a
+    copy in each, so they do not share (and add to) one traceback.  An
+    exception that cannot be copied is returned itself.
+
+    """
+    try:
+        copied = copy.copy(error)
+    except Exception:
+        return error
+    if copied is not error:
+        copied.__cause__ = error
+    return copied
+
+
+class _HandlerChain(Sequence):
+
+    """The handlers remaining in a chain of request handlers.
+
+    A chain is an immutable linked list built once (see `_pop_handler`), so
+    the rest of it is passed on to each handler without copying, and it may
+    be passed on again (such as when a request is retried).  It is equal to
+    (and hashed like) the tuple of its handlers.
+
+    """
+
+    __slots__ = ('_first', '_rest', '_length')
+
+    def __init__(self, first=None, rest=None):
+        self._first = first
+        self._rest = rest
+        self._length = 0 if rest is None else rest._length + 1
+
+    @classmethod
+    def of(cls, handlers):
+        """Return the chain of the handlers (a sequence)."""
+        chain = _EMPTY_HANDLER_CHAIN
+        for handler in reversed(tuple(handlers)):
+            chain = cls(handler, chain)
+        return chain
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("handler index out of range")
+        chain = self
+        for _ in range(index):
+            chain = chain._rest
+        return chain._first
+
+    def __iter__(self):
+        chain = self
+        while chain._rest is not None:
+            yield chain._first
+            chain = chain._rest
+
+    def __eq__(self, other):
+        if not isinstance(other, (tuple, _HandlerChain)):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, tuple(self))
+
+
+_EMPTY_HANDLER_CHAIN = _HandlerChain()
+
+
+def _pop_handler(kwargs):
+    """Return the first of the `_handlers` keyword argument, or `None`.
+
+    The rest of the handlers (a `_HandlerChain`) replace the argument in the
+    keyword arguments, unless there are none.
+
+    """
+    handlers = kwargs.pop('_handlers', None)
+    if type(handlers) is not _HandlerChain:
+        if not handlers:
+            return None
+        handlers = _HandlerChain.of(handlers)
+    rest = handlers._rest
+    if rest is None:
+        return None
+    kwargs['_handlers'] = rest
+    return handlers._first
+
+
+@add_to_all
+class LRUCache(object):
+
+    """A thread-safe mapping bounded to a maximum number of items.
+
+    :param int maxsize: the maximum number of items to keep
+
+    When an item is added to a full cache, the least recently used item (set
+    or retrieved) is discarded.  The numbers of successful and unsuccessful
+    retrievals are counted in :attr:`hits` and :attr:`misses`.
+
+    """
+
+    def __init__(self, maxsize=128):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive.")
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        """The maximum number of items kept in the cache."""
+        return self._maxsize
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        data = self._data
+        with self._lock:
+            data.pop(key, None)
+            data[key] = value
+            if len(data) > self._maxsize:
+                data.popitem(last=False)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        """Remove all items and reset the hit and miss counts."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the value for *key* (marking it as recently used).
+
+        :returns: *default* if *key* is not in the cache
+
+        """
+        data = self._data
+        with self._lock:
+            value = data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            if _MOVE_TO_END:
+                data.move_to_end(key)
+            else:  # pragma: no cover
+                data[key] = data.pop(key)
+            self.hits += 1
+        return value
+
+    def pop(self, key, default=None):
+        """Remove and return the value for *key* (or *default*)."""
+        with self._lock:
+            return self._data.pop(key, default)
+
+
+_case_converter = CaseConverter()
+"""The converter used by the module-level case conversion functions"""
+
+
 @add_to_all
 def module_attributes(module, use_all=None, include_underscored=False):
     """Return a set of the attribute names in the given module.
@@ -137,18 +546,46 @@ def pascalize(value, validate=True):
     This converts lower-case characters preceded by an underscore to upper-case
     without the underscore.
 
+    Results are memoized (see `CaseConverter`), so converting the same
+    identifiers repeatedly is inexpensive.
+
     """
+    return _case_converter.pascalize(value, validate)
+
+
+def _pascalize(value, validate):
     result_type = type(value)
     if validate:
         valid_python_identifier(value, exception=True)
     else:  # pragma: no cover
         value = ensure_text(value)
-    result = re.sub('(?:^|_)(.)', lambda x: x.group(0)[-1].upper(), value)
+    result = _PASCALIZE_PATTERN.sub(_pascalize_match, value)
     if type(result) is not result_type:  # pragma: no cover
         result = result_type(result)
     return result
 
 
+def _pascalize_match(match):
+    return match.group(1).upper()
+
+
+@add_to_all
+def pascalize_many(values, validate=True):
+    """Return a list of the :func:`pascalize` conversions of the given values.
+
+    :param values: the strings to convert
+    :type values: iterable of `str`
+    :param bool validate: see :func:`pascalize`
+    :rtype: `list`
+    :raises TypeError: if any value is not a string
+    :raises ValueError: if *validate* is true and any value fails validation
+
+    Each distinct value is converted (and validated) at most once per call.
+
+    """
+    return _case_converter.pascalize_many(values, validate)
+
+
 @add_to_all
 def raise_attribute_error(obj, attr):
     """Raise an instance of `AttributeError` with the standard message.
@@ -217,22 +654,48 @@ def underscore(value, validate=True, multicap=True):
     >>> underscore('ABCDefGHijKLMNOPqrs', multicap=False)
     'a_b_c_def_g_hij_k_l_m_n_o_pqrs'
 
+    Results are memoized (see `CaseConverter`), so converting the same
+    identifiers repeatedly is inexpensive.
+
     """
+    return _case_converter.underscore(value, validate, multicap)
+
+
+def _underscore(value, validate, multicap):
     result_type = type(value)
     if validate:
         valid_python_identifier(value, exception=True)
     else:  # pragma: no cover
         value = ensure_text(value)
-    patterns = ['[A-Z]']
-    if multicap:
-        patterns.insert(0, '[A-Z]+(?=($|[A-Z][a-z]))')
-    pattern = '(' + '|'.join(patterns) + ')'
-    result = re.sub(pattern, lambda x: "_" + x.groups()[0].lower(), value)[1:]
+    pattern = _UNDERSCORE_PATTERNS[bool(multicap)]
+    result = pattern.sub(_underscore_match, value)[1:]
     if type(result) is not result_type:  # pragma: no cover
         result = result_type(result)
     return result
 
 
+def _underscore_match(match):
+    return "_" + match.group(1).lower()
+
+
+@add_to_all
+def underscore_many(values, validate=True, multicap=True):
+    """Return a list of the :func:`underscore` conversions of the given values.
+
+    :param values: the strings to convert
+    :type values: iterable of `str`
+    :param bool validate: see :func:`underscore`
+    :param bool multicap: see :func:`underscore`
+    :rtype: `list`
+    :raises TypeError: if any value is not a string
+    :raises ValueError: if *validate* is true and any value fails validation
+
+    Each distinct value is converted (and validated) at most once per call.
+
+    """
+    return _case_converter.underscore_many(values, validate, multicap)
+
+
 @add_to_all
 def valid_python_identifier(value, dotted=False, exception=False):
     """Validate that the given string value is a valid Python identifier.
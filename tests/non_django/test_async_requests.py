@@ -0,0 +1,535 @@
+# -*- coding: utf-8 -*-
+"""Tests for pyneric.async_requests"""
+
+import sys
+import warnings
+
+if sys.version_info < (3, 5):
+    warnings.warn("The tests for pyneric.async_requests will not be run since "
+                  "the module requires Python 3.5+.", ImportWarning)
+else:
+    import asyncio
+    import json
+    from unittest import TestCase
+
+    from pyneric.async_requests import (
+        AsyncRequestHandler, AsyncResponse, AsyncSingleFlight, AsyncTransport,
+        Headers, HTTPError, StreamTransport, SUPPORTED_METHODS, acquire,
+        get_default_transport)
+    from pyneric.http import v1_1 as http
+    from pyneric.rate_limit import BATCH, INTERACTIVE, RateLimiter
+    from stand_in_async_http import StandInAsyncServer, delayed, echo, routed
+
+
+    class AsyncTestCase(TestCase):
+
+        """Run each test in a new event loop with a stand-in server."""
+
+        respond = staticmethod(echo)
+
+        def setUp(self):
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.server = self.run_async(
+                StandInAsyncServer(self.respond).__aenter__())
+
+        def tearDown(self):
+            self.run_async(self.server.__aexit__(None, None, None))
+            asyncio.set_event_loop(None)
+            self.loop.close()
+
+        def run_async(self, awaitable):
+            return self.loop.run_until_complete(awaitable)
+
+
+    class AsyncTransportTestCase(TestCase):
+
+        def test_abstract(self):
+            loop = asyncio.new_event_loop()
+            try:
+                transport = AsyncTransport()
+                self.assertIs(transport,
+                              loop.run_until_complete(transport.__aenter__()))
+                self.assertRaises(NotImplementedError, loop.run_until_complete,
+                                  transport.request('GET', 'http://a/'))
+                loop.run_until_complete(transport.__aexit__(None, None, None))
+            finally:
+                loop.close()
+
+
+    class HeadersTestCase(TestCase):
+
+        def test_case_insensitive(self):
+            headers = Headers({'Content-Type': 'text/plain'})
+            self.assertEqual('text/plain', headers['content-type'])
+            headers['CONTENT-TYPE'] = 'text/html'
+            self.assertEqual(['CONTENT-TYPE'], list(headers))
+            copy = headers.copy()
+            del headers['Content-Type']
+            self.assertEqual(0, len(headers))
+            self.assertEqual('text/html', copy['content-type'])
+            self.assertEqual("Headers({'CONTENT-TYPE': 'text/html'})",
+                             repr(copy))
+
+
+    class AsyncResponseTestCase(TestCase):
+
+        def _response(self, status_code=200, content_type='text/plain'):
+            return AsyncResponse('GET', 'http://example.com/', status_code,
+                                 'Reason', Headers({'Content-Type':
+                                                    content_type}),
+                                 '{"é": 1}'.encode('latin-1'))
+
+        def test_text(self):
+            self.assertEqual('{"�": 1}', self._response().text)
+            response = self._response(
+                content_type='application/json; charset="ISO-8859-1"')
+            self.assertEqual('ISO-8859-1', response.encoding)
+            self.assertEqual({'é': 1}, response.json())
+
+        def test_raise_for_status(self):
+            self._response().raise_for_status()
+            response = self._response(404)
+            self.assertEqual('<AsyncResponse [404]>', repr(response))
+            self.assertFalse(response.ok)
+            with self.assertRaises(HTTPError) as context:
+                response.raise_for_status()
+            self.assertIs(response, context.exception.response)
+
+
+    class StreamTransportTestCase(AsyncTestCase):
+
+        def test_invalid(self):
+            self.assertRaises(ValueError, StreamTransport, max_connections=0)
+            self.assertRaises(ValueError, StreamTransport,
+                              max_connections_per_host=0)
+            transport = StreamTransport()
+            self.assertEqual((100, 10, None),
+                             (transport.max_connections,
+                              transport.max_connections_per_host,
+                              transport.timeout))
+            self.assertRaises(ValueError, self.run_async,
+                              transport.request('GET', 'ftp://example.com/'))
+            self.assertRaises(ValueError, self.run_async,
+                              transport.request('GET', '/relative'))
+
+        def test_keep_alive(self):
+            transport = StreamTransport()
+            for path in ('/a', '/b?x=1', '/c'):
+                response = self.run_async(
+                    transport.request('GET', self.server.url + path))
+                self.assertEqual(200, response.status_code)
+                self.assertEqual(path, response.json()['path'])
+            self.assertEqual(1, self.server.connections)
+            self.assertEqual(1, transport.idle_connections)
+            self.run_async(transport.close())
+            self.assertEqual(0, transport.idle_connections)
+
+        def test_body(self):
+            transport = StreamTransport()
+            url = self.server.url + '/things'
+            response = self.run_async(transport.request(
+                'POST', url, params=dict(q='a b'), data=dict(name='x')))
+            self.assertEqual(
+                dict(method='POST', path='/things?q=a+b', body='name=x',
+                     content_type='application/x-www-form-urlencoded'),
+                response.json())
+            response = self.run_async(transport.request(
+                'PUT', url + '?a=1', params=[('b', '2')], json=[1]))
+            self.assertEqual('/things?a=1&b=2', response.json()['path'])
+            self.assertEqual('[1]', response.json()['body'])
+            self.assertEqual('application/json',
+                             response.json()['content_type'])
+            response = self.run_async(transport.request('HEAD', url))
+            self.assertEqual(b'', response.content)
+            self.assertEqual(1, self.server.connections)
+            self.run_async(transport.close())
+
+        def test_request_target_quoted(self):
+            transport = StreamTransport()
+            for path, expected in (('/a b?x=1', '/a%20b?x=1'),
+                                   ('/\xe9?q=\xfc', '/%C3%A9?q=%C3%BC'),
+                                   ('/%7Ea%2F', '/~a%2F'),
+                                   ('/%zz', '/%25zz')):
+                response = self.run_async(
+                    transport.request('GET', self.server.url + path))
+                self.assertEqual(expected, response.json()['path'])
+            self.run_async(transport.close())
+
+        def test_invalid_headers(self):
+            transport = StreamTransport()
+            for headers in ({'X-A': 'b\r\nX-Evil: 1'}, {'X-A': 'b\nc'},
+                            {'X-A\r\nX-Evil': '1'}, {'X A:': '1'},
+                            {'': '1'}):
+                self.assertRaises(ValueError, self.run_async,
+                                  transport.request('GET', self.server.url,
+                                                    headers=headers))
+            self.assertEqual([], self.server.requests)
+            self.run_async(transport.close())
+
+        def test_reconnect(self):
+            transport = StreamTransport()
+            self.run_async(transport.request('GET', self.server.url))
+            self.server.close_connections()
+            self.run_async(asyncio.sleep(0.01))
+            response = self.run_async(
+                transport.request('POST', self.server.url, data='x'))
+            self.assertEqual('x', response.json()['body'])
+            self.assertEqual(2, self.server.connections)
+            self.assertEqual(2, len(self.server.requests))
+            self.run_async(transport.close())
+
+        def test_dropped_reused_connection(self):
+            self.server.respond = routed({'/empty': b''})
+            transport = StreamTransport()
+            for method, attempts in (('POST', 1), ('get', 2)):
+                self.run_async(transport.request('GET', self.server.url))
+                requests_before = len(self.server.requests)
+                self.assertRaises(IOError, self.run_async, transport.request(
+                    method, self.server.url + '/empty'))
+                # Only an idempotent request is sent again.
+                self.assertEqual(attempts,
+                                 len(self.server.requests) - requests_before)
+            self.run_async(transport.close())
+
+        def test_concurrency_limit(self):
+            self.server.respond = delayed(0.01)
+            transport = StreamTransport(max_connections=3)
+            urls = [self.server.url + '/{}'.format(i) for i in range(10)]
+            responses = self.run_async(asyncio.gather(
+                *[transport.request('GET', x) for x in urls]))
+            self.assertEqual(urls, [x.url for x in responses])
+            self.assertEqual(3, self.server.max_concurrency)
+            self.assertEqual(3, self.server.connections)
+            self.assertEqual(3, transport.idle_connections)
+            self.run_async(transport.close())
+
+        def test_idle_limit(self):
+            self.server.respond = delayed(0.01)
+            transport = StreamTransport(max_connections_per_host=1)
+            self.run_async(asyncio.gather(
+                *[transport.request('GET', self.server.url)
+                  for _ in range(3)]))
+            self.assertEqual(3, self.server.connections)
+            self.assertEqual(1, transport.idle_connections)
+            self.run_async(transport.close())
+
+        def test_timeout(self):
+            self.server.respond = delayed(1)
+            transport = StreamTransport(timeout=0.01)
+            self.assertRaises(asyncio.TimeoutError, self.run_async,
+                              transport.request('GET', self.server.url))
+            self.assertEqual(0, transport.idle_connections)
+
+        def test_chunked(self):
+            self.server.respond = routed(
+                {'/': (200, {'Connection': 'close'}, [b'ab', b'c'])})
+            transport = StreamTransport()
+            response = self.run_async(
+                transport.request('GET', self.server.url))
+            self.assertEqual(b'abc', response.content)
+            self.assertEqual(0, transport.idle_connections)
+
+        def test_raw_responses(self):
+            self.server.respond = routed({
+                '/1.0': (b'HTTP/1.0 200 OK\r\nX-A: 1\r\nx-a: 2\r\n\r\n'
+                         b'until closed'),
+                '/interim': (b'HTTP/1.1 100 Continue\r\n\r\n'
+                             b'HTTP/1.1 204 No Content\r\n\r\n'),
+                '/trailer': (b'HTTP/1.1 200 OK\r\n'
+                             b'Transfer-Encoding: chunked\r\n\r\n'
+                             b'1\r\na\r\n0\r\nX-T: 1\r\n\r\n'),
+                '/invalid': b'HTTP/1.1 OK\r\n\r\n',
+                '/chunk': (b'HTTP/1.1 200 OK\r\n'
+                           b'Transfer-Encoding: chunked\r\n\r\nx\r\n'),
+                '/empty': b'',
+            })
+            transport = StreamTransport()
+            response = self.run_async(
+                transport.request('GET', self.server.url + '/1.0'))
+            self.assertEqual(b'until closed', response.content)
+            self.assertEqual('1, 2', response.headers['X-A'])
+            response = self.run_async(
+                transport.request('GET', self.server.url + '/interim'))
+            self.assertEqual(204, response.status_code)
+            response = self.run_async(
+                transport.request('GET', self.server.url + '/trailer'))
+            self.assertEqual(b'a', response.content)
+            for path in ('/invalid', '/chunk', '/empty'):
+                self.assertRaises(IOError, self.run_async, transport.request(
+                    'GET', self.server.url + path))
+            self.assertEqual(0, transport.idle_connections)
+
+        def test_redirects(self):
+            self.server.respond = routed({
+                '/moved': (303, {'Location': '/target'}, b''),
+                '/loop': (307, {'Location': '/loop'}, b''),
+            })
+            transport = StreamTransport()
+            url = self.server.url + '/moved'
+            response = self.run_async(
+                transport.request('POST', url, data='x'))
+            self.assertEqual(dict(method='GET', path='/target', body='',
+                                  content_type=None), response.json())
+            response = self.run_async(transport.request('HEAD', url))
+            self.assertEqual(303, response.status_code)
+            response = self.run_async(
+                transport.request('GET', url, allow_redirects=False))
+            self.assertEqual(303, response.status_code)
+            self.assertRaises(IOError, self.run_async, transport.request(
+                'GET', self.server.url + '/loop'))
+            self.run_async(transport.close())
+
+        def test_redirect_credentials(self):
+            async def respond(request):
+                if request.path == '/moved':
+                    return 302, {'Location': location}, b''
+                body = json.dumps([request.headers.get('authorization'),
+                                   request.headers.get('cookie'),
+                                   request.headers.get('x-other')])
+                return 200, {}, body.encode('utf-8')
+            self.server.respond = respond
+            transport = StreamTransport()
+            headers = {'Authorization': 'secret', 'Cookie': 'a=1',
+                       'X-Other': 'x'}
+            # The same origin keeps the credentials.
+            location = '/target'
+            response = self.run_async(transport.request(
+                'GET', self.server.url + '/moved', headers=headers))
+            self.assertEqual(['secret', 'a=1', 'x'], response.json())
+            # Another host (of the same server) does not get them.
+            location = self.server.url.replace('127.0.0.1', 'localhost')
+            response = self.run_async(transport.request(
+                'GET', self.server.url + '/moved', headers=headers))
+            self.assertEqual([None, None, 'x'], response.json())
+            self.assertEqual('secret', headers['Authorization'])
+            self.run_async(transport.close())
+
+        def test_default_transport(self):
+            transport = get_default_transport()
+            self.assertIsInstance(transport, StreamTransport)
+            self.assertIs(transport, get_default_transport())
+            loop = asyncio.new_event_loop()
+            try:
+                asyncio.set_event_loop(loop)
+                self.assertIsNot(transport, get_default_transport())
+            finally:
+                asyncio.set_event_loop(self.loop)
+                loop.close()
+
+
+    class AsyncSingleFlightTestCase(AsyncTestCase):
+
+        respond = staticmethod(delayed(0.05))
+
+        def setUp(self):
+            super().setUp()
+            self.transport = StreamTransport()
+            self.flight = AsyncSingleFlight()
+
+        def tearDown(self):
+            self.run_async(self.transport.close())
+            super().tearDown()
+
+        def request(self, method='GET', path='/', **kwargs):
+            return self.flight.request(self.transport.request, method,
+                                       self.server.url + path, **kwargs)
+
+        def test_invalid(self):
+            self.assertRaises(ValueError, AsyncSingleFlight,
+                              methods=[http.PUT])
+
+        def test_coalesced(self):
+            responses = self.run_async(asyncio.gather(
+                *[self.request() for _ in range(5)]))
+            self.assertEqual(1, len(self.server.requests))
+            self.assertEqual((1, 4), (self.flight.made,
+                                      self.flight.coalesced))
+            self.assertEqual([False] + [True] * 4,
+                             [x.coalesced for x in responses])
+            self.assertEqual({'/'}, set(x.json()['path'] for x in responses))
+            self.assertEqual(0, len(self.flight))
+            self.run_async(asyncio.gather(
+                self.request(), self.request(path='/other'),
+                self.request(params=dict(a=1)), self.request('POST'),
+                self.request('POST')))
+            self.assertEqual(6, len(self.server.requests))
+
+        def test_cancelled(self):
+            leader = asyncio.ensure_future(self.request())
+            follower = asyncio.ensure_future(self.request())
+            self.run_async(asyncio.sleep(0.01))
+            leader.cancel()
+            response = self.run_async(follower)
+            self.assertTrue(response.coalesced)
+            self.assertTrue(leader.cancelled())
+            self.assertEqual(1, len(self.server.requests))
+
+        def test_error(self):
+            self.server.respond = routed({'/invalid': b'HTTP/1.1 OK\r\n\r\n'})
+            results = self.run_async(asyncio.gather(
+                *[self.request(path='/invalid') for _ in range(3)],
+                return_exceptions=True))
+            self.assertEqual(3, len([x for x in results
+                                     if isinstance(x, IOError)]))
+            self.assertEqual(3, len(set(map(id, results))))
+            self.assertEqual([results[0]] * 2,
+                             [x.__cause__ for x in results[1:]])
+            self.assertEqual(1, len(self.server.requests))
+
+
+    class AcquireTestCase(TestCase):
+
+        def setUp(self):
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+
+        def tearDown(self):
+            asyncio.set_event_loop(None)
+            self.loop.close()
+
+        def test_priority(self):
+            limiter = RateLimiter(100, burst=1)
+            order = []
+
+            async def acquired(name, priority):
+                await acquire(limiter, priority=priority)
+                order.append(name)
+            self.loop.run_until_complete(asyncio.gather(
+                acquired('first', BATCH),
+                *[acquired('batch', BATCH) for _ in range(2)],
+                acquired('interactive', INTERACTIVE)))
+            self.assertEqual(['first', 'interactive', 'batch', 'batch'],
+                             order)
+            self.assertEqual((4, 0), (limiter.granted, limiter.queue_depth))
+            self.assertGreater(limiter.max_wait, 0.02)
+
+        def test_cancelled(self):
+            limiter = RateLimiter(1, burst=1)
+            self.loop.run_until_complete(acquire(limiter))
+            waiter = asyncio.ensure_future(acquire(limiter, 'POST'))
+            self.loop.run_until_complete(asyncio.sleep(0.01))
+            self.assertEqual(1, limiter.queue_depth)
+            waiter.cancel()
+            self.assertRaises(asyncio.CancelledError,
+                              self.loop.run_until_complete, waiter)
+            self.assertEqual((1, 0), (limiter.granted, limiter.queue_depth))
+
+
+    class AsyncRequestHandlerTestCase(AsyncTestCase):
+
+        respond = staticmethod(routed({
+            '/moved': (302, {'Location': '/target'}, b''),
+        }))
+
+        def setUp(self):
+            super().setUp()
+            self.handler = AsyncRequestHandler()
+            self.handler.transport = self.transport = StreamTransport()
+
+        def tearDown(self):
+            self.run_async(self.transport.close())
+            super().tearDown()
+
+        def test_supported_methods(self):
+            url = self.server.url + '/moved'
+            for method in SUPPORTED_METHODS:
+                response = self.run_async(
+                    getattr(self.handler, method.token.lower())(url))
+                # Safe methods follow redirects by default.
+                self.assertEqual(200 if method.safe else 302,
+                                 response.status_code)
+            response = self.run_async(
+                self.handler.get(url, allow_redirects=False))
+            self.assertEqual(302, response.status_code)
+            self.assertEqual(1, self.server.connections)
+
+        def test_alter_kwargs(self):
+            class Handler(AsyncRequestHandler):
+
+                def _alter_kwargs(self, kwargs):
+                    kwargs.pop('invalid', None)
+                    kwargs.update(method='PUT', params=dict(a=1))
+                    return super()._alter_kwargs(kwargs)
+
+            handler = Handler()
+            handler.transport = self.transport
+            response = self.run_async(handler.post(
+                self.server.url + '/a', invalid=object(), data='x'))
+            self.assertEqual(dict(method='PUT', path='/a?a=1', body='x',
+                                  content_type=None), response.json())
+
+        def test_request_handlers(self):
+            class Handler(AsyncRequestHandler):
+
+                def __init__(self):
+                    self.calls = 0
+
+                async def request(self, method, url, **kwargs):
+                    self.calls += 1
+                    return await super().request(method, url, **kwargs)
+
+            handler = Handler()
+            handler.transport = self.transport
+            response = self.run_async(handler.request(
+                'GET', self.server.url, _handlers=(handler, handler)))
+            self.assertEqual('GET', response.json()['method'])
+            self.assertEqual(3, handler.calls)
+            self.assertEqual(1, len(self.server.requests))
+
+        def test_request_handlers_resent(self):
+            class Handler(AsyncRequestHandler):
+
+                def __init__(self, transport):
+                    self.transport = transport
+                    self.calls = 0
+
+                async def request(self, method, url, **kwargs):
+                    self.calls += 1
+                    return await super().request(method, url, **kwargs)
+
+            class Twice(AsyncRequestHandler):
+
+                async def request(self, method, url, **kwargs):
+                    await super().request(method, url, **dict(kwargs))
+                    return await super().request(method, url, **kwargs)
+
+            self.server.respond = delayed(0.01)
+            last = Handler(self.transport)
+            self.handler.single_flight = flight = AsyncSingleFlight()
+            handlers = [Twice(), last]
+            responses = self.run_async(asyncio.gather(
+                *[self.handler.get(self.server.url, _handlers=handlers)
+                  for _ in range(3)]))
+            # The chained requests were coalesced, and the rest of the chain
+            # was sent through twice.
+            self.assertEqual((1, 2), (flight.made, flight.coalesced))
+            self.assertEqual([False, True, True],
+                             [x.coalesced for x in responses])
+            self.assertEqual(2, last.calls)
+            self.assertEqual(2, len(self.server.requests))
+
+        def test_default_transport(self):
+            handler = AsyncRequestHandler()
+            response = self.run_async(handler.head(self.server.url))
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(1, get_default_transport().idle_connections)
+            self.run_async(get_default_transport().close())
+
+        def test_timeout(self):
+            self.server.respond = delayed(1)
+            self.assertRaises(asyncio.TimeoutError, self.run_async,
+                              self.handler.get(self.server.url, timeout=0.01))
+
+        def test_layers(self):
+            self.server.respond = delayed(0.01)
+            self.handler.single_flight = flight = AsyncSingleFlight()
+            self.handler.rate_limiter = limiter = RateLimiter(1000)
+            responses = self.run_async(asyncio.gather(
+                *[self.handler.get(self.server.url, priority=BATCH)
+                  for _ in range(3)]))
+            self.assertEqual([False, True, True],
+                             [x.coalesced for x in responses])
+            self.assertEqual(1, len(self.server.requests))
+            self.assertEqual((1, 2), (flight.made, flight.coalesced))
+            self.assertEqual(1, limiter.granted)
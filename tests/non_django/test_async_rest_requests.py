@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Tests for pyneric.async_rest_requests"""
+
+import sys
+import warnings
+
+if sys.version_info < (3, 5):
+    warnings.warn("The tests for pyneric.async_rest_requests will not be run "
+                  "since the module requires Python 3.5+.", ImportWarning)
+else:
+    import asyncio
+    from unittest import TestCase
+
+    from pyneric.async_requests import (
+        AsyncSingleFlight, StreamTransport, get_default_transport)
+    from pyneric.async_rest_requests import (AsyncRestCollection,
+                                             AsyncRestResource)
+    from pyneric.rate_limit import BATCH, RateLimiter
+    from pyneric import rest_requests
+    from stand_in_async_http import StandInAsyncServer, delayed
+
+
+    class AsyncRestResourceTestCase(TestCase):
+
+        def setUp(self):
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.server = self.run_async(StandInAsyncServer().__aenter__())
+
+        def tearDown(self):
+            self.run_async(self.server.__aexit__(None, None, None))
+            asyncio.set_event_loop(None)
+            self.loop.close()
+
+        def run_async(self, awaitable):
+            return self.loop.run_until_complete(awaitable)
+
+        def test_classes(self):
+            class Things(AsyncRestCollection):
+                url_path = 'things'
+                id_type = int
+
+            class Detail(AsyncRestResource):
+                url_path = 'detail'
+                container_class = Things
+
+            self.assertTrue(AsyncRestResource.is_abstract)
+            self.assertTrue(issubclass(Things, rest_requests.RestCollection))
+            url = Detail.url_for(self.server.url, 7)
+            self.assertEqual(self.server.url + '/things/7/detail', url)
+            detail = Detail.from_url(url)
+            self.assertEqual(7, detail.container.id)
+            self.assertIs(Things, type(detail.container))
+            match = rest_requests.RestRouter(
+                self.server.url, [Things, Detail]).resolve(url)
+            self.assertEqual((Detail, (7,)), match)
+
+        def test_transport(self):
+            class Things(AsyncRestCollection):
+                url_path = 'things'
+                id_type = int
+
+            class Detail(AsyncRestResource):
+                url_path = 'detail'
+                container_class = Things
+
+            thing = Things(self.server.url, 1)
+            detail = Detail(thing)
+            self.assertIs(get_default_transport(), detail.transport)
+            transport = StreamTransport()
+            thing.transport = transport
+            self.assertIs(transport, detail.transport)
+            other_transport = StreamTransport()
+            detail.transport = other_transport
+            self.assertIs(other_transport, detail.transport)
+            self.assertIs(transport, thing.transport)
+
+        def test_requests(self):
+            class Things(AsyncRestCollection):
+                url_path = 'things'
+                id_type = int
+
+            class Detail(AsyncRestResource):
+                url_path = 'detail'
+                container_class = Things
+
+            transport = StreamTransport()
+            things = Things(self.server.url)
+            things.transport = transport
+            response = self.run_async(things.post(json=dict(name='x')))
+            self.assertEqual(dict(method='POST', path='/things',
+                                  body='{"name": "x"}',
+                                  content_type='application/json'),
+                             response.json())
+            detail = Detail(Things(self.server.url, 1))
+            detail.transport = transport
+            response = self.run_async(detail.request('PUT', data='y'))
+            self.assertEqual('PUT', response.json()['method'])
+            self.assertEqual('/things/1/detail', response.json()['path'])
+            response = self.run_async(
+                detail.delete(url=self.server.url + '/other'))
+            self.assertEqual('/other', response.json()['path'])
+            self.assertEqual(1, self.server.connections)
+            self.run_async(transport.close())
+
+        def test_concurrent_requests(self):
+            class Things(AsyncRestCollection):
+                url_path = 'things'
+                id_type = int
+
+            class Detail(AsyncRestResource):
+                url_path = 'detail'
+                container_class = Things
+
+            self.server.respond = delayed(0.01)
+            transport = StreamTransport(max_connections=4)
+            details = [Detail(Things(self.server.url, i)) for i in range(20)]
+            for detail in details:
+                detail.transport = transport
+            responses = self.run_async(
+                asyncio.gather(*[x.get() for x in details]))
+            self.assertEqual([x.url for x in details],
+                             [x.url for x in responses])
+            self.assertEqual(4, self.server.max_concurrency)
+            self.assertEqual(4, self.server.connections)
+            self.run_async(transport.close())
+
+        def test_single_flight(self):
+            class Things(AsyncRestCollection):
+                url_path = 'things'
+                id_type = int
+
+            class Detail(AsyncRestResource):
+                url_path = 'detail'
+                container_class = Things
+
+            self.server.respond = delayed(0.01)
+            thing = Things(self.server.url, 1)
+            self.assertIsNone(Detail(thing).single_flight)
+            flight = AsyncSingleFlight()
+            thing.single_flight = flight
+            thing.transport = transport = StreamTransport()
+            detail = Detail(thing)
+            self.assertIs(flight, detail.single_flight)
+            responses = self.run_async(asyncio.gather(
+                detail.get(), detail.request('GET'), detail.get(),
+                detail.put()))
+            self.assertEqual(['GET', 'GET', 'GET', 'PUT'],
+                             [x.json()['method'] for x in responses])
+            self.assertEqual(2, len(self.server.requests))
+            self.assertEqual(2, flight.coalesced)
+            self.run_async(transport.close())
+
+        def test_rate_limiter(self):
+            class Things(AsyncRestCollection):
+                url_path = 'things'
+                id_type = int
+
+            class Detail(AsyncRestResource):
+                url_path = 'detail'
+                container_class = Things
+
+            thing = Things(self.server.url, 1)
+            thing.rate_limiter = limiter = RateLimiter(100, burst=1)
+            thing.transport = transport = StreamTransport()
+            detail = Detail(thing)
+            self.assertIs(limiter, detail.rate_limiter)
+            responses = self.run_async(asyncio.gather(
+                detail.get(priority=BATCH), detail.post(priority=BATCH),
+                detail.request('GET')))
+            self.assertEqual(['GET', 'POST', 'GET'],
+                             [x.json()['method'] for x in responses])
+            self.assertEqual('GET', self.server.requests[1][0])
+            self.assertEqual((3, 0), (limiter.granted, limiter.queue_depth))
+            self.run_async(transport.close())
+
+        def test_synchronous_collection_methods(self):
+            class Things(AsyncRestCollection):
+                url_path = 'things'
+                id_type = int
+
+            things = Things(self.server.url)
+            self.assertRaises(TypeError, Things.fetch_many, self.server.url,
+                              [1, 2])
+            self.assertRaises(TypeError, things.iter_members)
+            self.assertRaises(TypeError, things._get_function)
+            self.assertRaises(TypeError, things._request_function)
+            self.assertEqual([], self.server.requests)
+
+        def test_unsupported_layers(self):
+            from pyneric.requests import ResponseCache, RetryPolicy
+
+            class Things(rest_requests.RestCollection):
+                url_path = 'things'
+
+            class Detail(AsyncRestResource):
+                url_path = 'detail'
+                container_class = Things
+
+            thing = Things(self.server.url, 1)
+            detail = Detail(thing)
+            self.assertRaises(TypeError, setattr, detail, 'response_cache',
+                              ResponseCache())
+            self.assertRaises(TypeError, setattr, detail, 'retry_policy',
+                              RetryPolicy())
+            detail.response_cache = detail.retry_policy = None
+            for attr, value in (('response_cache', ResponseCache()),
+                                ('retry_policy', RetryPolicy())):
+                setattr(thing, attr, value)
+                self.assertIs(value, getattr(detail, attr))
+                self.assertRaises(TypeError, self.run_async, detail.get())
+                setattr(thing, attr, None)
+            self.assertEqual([], self.server.requests)
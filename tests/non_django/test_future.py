@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Tests for pyneric.future"""
+
+from unittest import TestCase
+
+from pyneric import future
+
+
+class BasestringTestCase(TestCase):
+
+    def test_isinstance(self):
+        for value in (b'bytes', u'text', str('native')):
+            self.assertIsInstance(value, future.basestring)
+        for value in (None, 1, bytearray(b'bytes'), object()):
+            self.assertNotIsInstance(value, future.basestring)
+
+
+class EnsureTextTestCase(TestCase):
+
+    func = staticmethod(future.ensure_text)
+
+    def test_text(self):
+        self.assertEqual(u'text', self.func(u'text'))
+        self.assertIsInstance(self.func(u'text'), future.future.text_type)
+
+    def test_bytes(self):
+        self.assertEqual(u'bytés', self.func(u'bytés'.encode('utf-8'),
+                                             'utf-8'))
+        self.assertRaises(UnicodeDecodeError, self.func, b'\xcd', 'utf-8')
+        self.assertEqual(u'', self.func(b'\xcd', 'utf-8', 'ignore'))
+
+    def test_coerce(self):
+        self.assertRaises(TypeError, self.func, 1)
+        self.assertEqual(u'1', self.func(1, coerce=True))
+
+    def test_exports(self):
+        for name in ('future', 'basestring', 'ensure_text'):
+            self.assertIn(name, future.__all__)
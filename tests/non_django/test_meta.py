@@ -7,6 +7,7 @@ from unittest import TestCase
 from future.utils import with_metaclass
 
 import pyneric
+from pyneric import meta
 
 
 class MetadataBehaviourTestCase(TestCase):
@@ -172,6 +173,42 @@ class MetaclassTestCase(TestCase):
             pass
         self.assertRaises(AttributeError, M._get_metadata, 'x')
 
+        class C(with_metaclass(M, object)):
+            pass
+        self.assertRaises(AttributeError, C._get_metadata, 'x')
+
+    def test_inherited_metadata_access(self):
+        class M(pyneric.Metaclass):
+            __metadata__ = dict(a=None)
+            __propagate__ = ('a',)
+
+        class C(with_metaclass(M, object)):
+            a = 1
+
+        class C1(C):
+            a = 2
+
+        class C2(C1):
+            pass
+        self.assertEqual((1, 2), (C.a, C1.a))
+        self.assertEqual((1, 2), (C().a, C1().a))
+        self.assertEqual(C2._get_metadata('a'), C2().a)
+
+    def test_missing_metadata_access(self):
+        class M(pyneric.Metaclass):
+            __metadata__ = dict(a=None)
+            __propagate__ = ('a',)
+
+        class C(with_metaclass(M, object)):
+            a = 1
+        obj = C()
+        self.assertEqual(1, obj.a)
+        del vars(C)['__metadata__']['a']
+        self.assertRaises(AttributeError, getattr, C, 'a')
+        self.assertRaises(AttributeError, getattr, obj, 'a')
+        self.assertFalse(hasattr(obj, 'a'))
+        self.assertEqual('default', getattr(obj, 'a', 'default'))
+
     def test_invalid_metadata(self):
         self.assertRaises(TypeError, type, 'M', (pyneric.Metaclass,),
                           dict(__metadata__=object()))
@@ -279,6 +316,69 @@ class MetaclassCustomBehaviourTestCase(TestCase):
         self.assertIsInstance(C1.a, list)
         self.assertEqual({'another', 'one', 'transformed'}, set(C1.a))
 
+    def test_get_metadata_override(self):
+        class CustomMetadataBehaviour(pyneric.MetadataBehaviour):
+            def get_metadata(self, cls, attr=None):
+                result = super(CustomMetadataBehaviour, self).get_metadata(
+                    cls, attr)
+                return result * 2 if attr else result
+
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = CustomMetadataBehaviour()
+            __metadata__ = dict(a=1)
+            __propagate__ = ('a',)
+
+        class C(with_metaclass(M, object)):
+            a = 2
+        # Access is not compiled when get_metadata is customized.
+        self.assertEqual(4, C.a)
+        self.assertEqual(4, C().a)
+        self.assertEqual(4, C._get_metadata('a'))
+
+    def test_non_mapping_storage(self):
+        class MetadataStorage(object):
+            def __init__(self, **kwargs):
+                self.__dict__.update(kwargs)
+
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = pyneric.MetadataBehaviour(
+                storage_class=MetadataStorage)
+            __metadata__ = dict(a=1)
+            __propagate__ = ('a',)
+
+        class C(with_metaclass(M, object)):
+            a = 2
+        self.assertEqual(2, C.a)
+        self.assertEqual(2, C().a)
+        self.assertEqual(2, C._get_metadata('a'))
+        self.assertIsInstance(C._get_metadata(), MetadataStorage)
+        self.assertRaises(AttributeError, C._get_metadata, 'b')
+
+    def test_resolution_cached(self):
+        calls = []
+
+        class CustomMetadataBehaviour(pyneric.MetadataBehaviour):
+            def get_behavioural_data(self, cls):
+                calls.append(cls)
+                return super(CustomMetadataBehaviour,
+                             self).get_behavioural_data(cls)
+
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = CustomMetadataBehaviour()
+            __metadata__ = dict(a=None)
+            __propagate__ = ('a',)
+
+            @staticmethod
+            def validate_a(value):
+                calls.append(value)
+
+        class Base(with_metaclass(M, object)):
+            pass
+        for value in range(3):
+            C = M(str('C'), (Base,), dict(a=value))
+            self.assertEqual(value, C().a)
+        self.assertEqual([M, None, 0, 1, 2], calls)
+
     def test_metadata_behaviour_similar_to_django_model(self):
         class CustomMetadataBehaviour(pyneric.MetadataBehaviour):
             def __init__(self, storage_class, metadata_attr='Meta',
@@ -329,3 +429,338 @@ class MetaclassCustomBehaviourTestCase(TestCase):
         self.assertEqual(True, C.abstract)
         self.assertEqual('tbl1', C1.db_table)
         self.assertEqual(False, C1.abstract)
+
+
+class MetaclassDeferredValidationTestCase(TestCase):
+
+    def setUp(self):
+        self._flags = meta.DEFER_VALIDATION, meta.STRICT_VALIDATION
+        meta.DEFER_VALIDATION, meta.STRICT_VALIDATION = False, False
+
+    def tearDown(self):
+        meta.DEFER_VALIDATION, meta.STRICT_VALIDATION = self._flags
+
+    def test_deferred(self):
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = pyneric.MetadataBehaviour(
+                defer_validation=True)
+            __metadata__ = dict(a=1)
+            __propagate__ = ('a',)
+            __indexed_metadata__ = ('a',)
+
+            @staticmethod
+            def validate_a(value):
+                if value < 0:
+                    raise ValueError(value)
+                return value * 2
+
+        class C(with_metaclass(M, object)):
+            a = -1
+        for _ in range(2):
+            self.assertRaises(ValueError, getattr, C, 'a')
+            self.assertRaises(ValueError, C._get_metadata)
+            self.assertRaises(ValueError, C)
+        # Registration indexes the metadata without validating it.
+        self.assertEqual({C}, M.find_classes(a=-1))
+        self.assertRaises(ValueError, getattr, C, 'a')
+
+    def test_deferred_until_instantiation(self):
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = pyneric.MetadataBehaviour(
+                defer_validation=True)
+            __metadata__ = dict(a=1)
+            __propagate__ = ('a',)
+
+            @staticmethod
+            def validate_a(value):
+                if value < 0:
+                    raise ValueError(value)
+                return value * 2
+
+        class C(with_metaclass(M, object)):
+            a = 2
+        self.assertNotIsInstance(vars(C)['__metadata__'], dict)
+        self.assertTrue(vars(C)['_Metaclass__pending'])
+        obj = C()
+        self.assertIsInstance(vars(C)['__metadata__'], dict)
+        self.assertEqual(2, C.a)
+        self.assertEqual(2, obj.a)
+        self.assertFalse(vars(C)['_Metaclass__pending'])
+        # Each class has its own pending flag.
+
+        class D(C):
+            pass
+
+        class E(D):
+            pass
+        self.assertTrue(vars(E)['_Metaclass__pending'])
+        D()
+        self.assertFalse(vars(D)['_Metaclass__pending'])
+        self.assertTrue(vars(E)['_Metaclass__pending'])
+        E()
+        self.assertFalse(vars(E)['_Metaclass__pending'])
+
+    def test_deferred_transforms(self):
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = pyneric.MetadataBehaviour(
+                defer_validation=True, validate_transforms=True)
+            __metadata__ = dict(a=1)
+            __propagate__ = ('a',)
+            __indexed_metadata__ = ('a',)
+
+            @staticmethod
+            def validate_a(value):
+                if value < 0:
+                    raise ValueError(value)
+                return value * 2
+
+        class C(with_metaclass(M, object)):
+            a = 2
+        self.assertEqual({C}, M.find_classes(a=4))
+        self.assertEqual(4, C().a)
+        self.assertEqual(4, C.a)
+
+    def test_module_flags(self):
+        class M(pyneric.Metaclass):
+            __metadata__ = dict(a=1)
+
+            @staticmethod
+            def validate_a(value):
+                if value < 0:
+                    raise ValueError(value)
+                return value * 2
+
+        with self.assertRaises(ValueError):
+            class C0(with_metaclass(M, object)):
+                a = -1
+        meta.DEFER_VALIDATION = True
+
+        class C1(with_metaclass(M, object)):
+            a = -1
+        self.assertRaises(ValueError, getattr, C1, 'a')
+        meta.STRICT_VALIDATION = True
+        with self.assertRaises(ValueError):
+            class C2(with_metaclass(M, object)):
+                a = -1
+
+        class M1(pyneric.Metaclass):
+            __metadata_behaviour__ = pyneric.MetadataBehaviour(
+                defer_validation=True)
+            __metadata__ = dict(a=1)
+
+            @staticmethod
+            def validate_a(value):
+                if value < 0:
+                    raise ValueError(value)
+                return value * 2
+
+        with self.assertRaises(ValueError):
+            class C3(with_metaclass(M1, object)):
+                a = -1
+
+
+class MetaclassRegistryTestCase(TestCase):
+
+    def test_not_registered(self):
+        class M(pyneric.Metaclass):
+            __metadata__ = ('a',)
+        self.assertRaises(TypeError, M.registered_classes)
+        self.assertRaises(TypeError, M.find_classes, a=1)
+
+    def test_invalid(self):
+        class M(pyneric.Metaclass):
+            __metadata__ = ('a',)
+            __indexed_metadata__ = 'a'
+        self.assertRaises(TypeError, M, str('C'), (object,), {})
+
+    def test_registered_classes(self):
+        class M(pyneric.Metaclass):
+            __metadata__ = dict(a=None)
+            __indexed_metadata__ = ('a',)
+
+        class M1(M):
+            pass
+
+        class C(with_metaclass(M, object)):
+            a = 1
+
+        class C1(with_metaclass(M1, object)):
+            a = 1
+
+        class C2(with_metaclass(M1, object)):
+            a = 2
+
+        self.assertEqual({C, C1, C2}, M.registered_classes())
+        self.assertEqual({C1, C2}, M1.registered_classes())
+        self.assertEqual({C1, C2}, C1.registered_classes())
+
+    def test_find_classes(self):
+        class M(pyneric.Metaclass):
+            __metadata__ = dict(a=None, b=None, c=None)
+            __indexed_metadata__ = ('a', 'c')
+
+        class M1(M):
+            pass
+
+        class C(with_metaclass(M, object)):
+            a = 1
+
+        class C1(with_metaclass(M1, object)):
+            a = 1
+            b = 'x'
+            c = ['unhashable']
+
+        class C2(with_metaclass(M1, object)):
+            a = C
+            b = 'x'
+
+        self.assertEqual({C, C1}, M.find_classes(a=1))
+        self.assertEqual({C1}, M1.find_classes(a=1))
+        self.assertEqual({C2}, M.find_classes(a=C))
+        self.assertEqual({C1, C2}, M.find_classes(b='x'))
+        self.assertEqual({C1}, M.find_classes(a=1, b='x'))
+        self.assertEqual({C1}, M.find_classes(c=['unhashable']))
+        self.assertEqual({C, C2}, M.find_classes(c=None))
+        self.assertEqual(set(), M.find_classes(a=2))
+        self.assertEqual(set(), M.find_classes(a=1, b='y'))
+        self.assertEqual({C, C1, C2}, M.find_classes())
+
+    def test_weak_references(self):
+        import gc
+
+        class M(pyneric.Metaclass):
+            __metadata__ = dict(a=None)
+            __indexed_metadata__ = ('a',)
+
+        class C(with_metaclass(M, object)):
+            a = 1
+
+        class C1(with_metaclass(M, object)):
+            a = 1
+
+        del C1
+        gc.collect()
+        self.assertEqual({C}, M.registered_classes())
+        self.assertEqual({C}, M.find_classes(a=1))
+        del C
+        gc.collect()
+        self.assertEqual(set(), M.registered_classes())
+
+
+class FrozenMetadataTestCase(TestCase):
+
+    behaviour = pyneric.MetadataBehaviour(storage_class=pyneric.FrozenMetadata)
+
+    def test_access(self):
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = self.behaviour
+            __metadata__ = dict(a=None, b=None)
+            __propagate__ = ('a',)
+            __base_overrides__ = dict(b=1)
+
+        class C(with_metaclass(M, object)):
+            a = 'a'
+
+        self.assertEqual('a', C.a)
+        self.assertEqual(1, C.b)
+        self.assertEqual('a', C().a)
+        self.assertEqual('a', C._get_metadata('a'))
+        self.assertRaises(AttributeError, C._get_metadata, 'c')
+        metadata = C._get_metadata()
+        self.assertIsInstance(metadata, pyneric.FrozenMetadata)
+        expected = dict(a='a', b=1, __propagate__={'a'},
+                        __base_overrides__=dict(b=1))
+        self.assertEqual(expected, metadata._asdict())
+
+    def test_behavioural_data(self):
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = self.behaviour
+            __metadata__ = dict(a=object(), b=None)
+            __propagate__ = ('a',)
+
+        class M1(M):
+            __base_overrides__ = dict(b=1)
+
+        metadata, propagate, base_overrides = M1.behavioural_data
+        self.assertEqual(set(('a', 'b')), set(metadata))
+        self.assertEqual({'a'}, propagate)
+        self.assertEqual(dict(b=1), base_overrides)
+
+    def test_immutable(self):
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = self.behaviour
+            __metadata__ = dict(a=None)
+
+        class C(with_metaclass(M, object)):
+            a = 'a'
+
+        metadata = C._get_metadata()
+        self.assertRaises(AttributeError, setattr, metadata, 'a', None)
+        self.assertRaises(AttributeError, setattr, metadata, 'z', None)
+        self.assertRaises(AttributeError, delattr, metadata, 'a')
+        import copy
+        self.assertIs(metadata, copy.copy(metadata))
+        self.assertEqual(metadata, copy.deepcopy(metadata))
+
+    def test_shared(self):
+        class M(pyneric.Metaclass):
+            __metadata_behaviour__ = self.behaviour
+            __metadata__ = dict(a=None, b=None)
+            __propagate__ = ('a',)
+            __base_overrides__ = dict(b=1)
+
+        class C(with_metaclass(M, object)):
+            a = 'a'
+
+        class C1(with_metaclass(M, object)):
+            a = 'different'
+
+        storage = C._get_metadata(), C1._get_metadata()
+        self.assertIs(type(storage[0]), type(storage[1]))
+        for attr in ('__propagate__', '__base_overrides__'):
+            self.assertIs(getattr(storage[0], attr), getattr(storage[1], attr))
+        self.assertFalse(hasattr(storage[0], '__dict__'))
+
+    def test_released(self):
+        import gc
+        metadata = pyneric.FrozenMetadata(
+            released=1, __propagate__={'released'},
+            __base_overrides__=dict(released=2))
+        self.assertIs(metadata.__propagate__,
+                      pyneric.FrozenMetadata(
+                          released=3, __propagate__=['released'],
+                          __base_overrides__={}).__propagate__)
+        key = pyneric.FrozenMetadata, tuple(sorted(vars(type(metadata))
+                                                   ['__slots__']))
+        self.assertIs(type(metadata), meta.FrozenMetadata._record_classes[key])
+        self.assertIn(frozenset(['released']), meta._interned)
+        del metadata
+        gc.collect()
+        self.assertNotIn(key, meta.FrozenMetadata._record_classes)
+        self.assertNotIn(frozenset(['released']), meta._interned)
+        self.assertNotIn(meta._FrozenDict(released=2), meta._interned)
+
+    def test_memory(self):
+        try:
+            import tracemalloc
+        except ImportError:  # pragma: no cover
+            self.skipTest("tracemalloc is not available")
+        metadata = dict(url_path='things', container_class=None,
+                        container_is_collection=False,
+                        reference_attribute=None, id_type=str,
+                        __base_overrides__={})
+        names = ('url_path', 'container_class', 'container_is_collection',
+                 'reference_attribute', 'id_type', 'is_abstract')
+
+        def allocated(storage_class):
+            tracemalloc.start()
+            try:
+                storage = [storage_class(__propagate__=set(names), **metadata)
+                           for _ in range(1000)]
+                self.assertEqual(1000, len(storage))
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+        dict_size = allocated(dict)
+        frozen_size = allocated(pyneric.FrozenMetadata)
+        self.assertLess(frozen_size * 4, dict_size)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Tests for pyneric (the package's __init__ module)"""
+
+import os
+import subprocess
+import sys
+from unittest import TestCase, skipIf
+
+import pyneric
+
+
+LAZY = sys.version_info >= (3, 7)
+
+
+class PackageTestCase(TestCase):
+
+    def test_exports(self):
+        from pyneric import meta, rest_requests, util
+        for module in (meta, rest_requests, util):
+            for name in module.__all__:
+                self.assertIs(getattr(module, name), getattr(pyneric, name))
+                self.assertIn(name, pyneric.__all__)
+                self.assertIn(name, dir(pyneric))
+
+    def test_exporting_modules(self):
+        from pyneric import util
+        self.assertIs(util, pyneric.util)
+
+    def test_invalid_attribute(self):
+        self.assertRaises(AttributeError, getattr, pyneric, 'nonexistent')
+
+    def test_star_import(self):
+        namespace = {}
+        exec('from pyneric import *', namespace)
+        self.assertIs(pyneric.RestResource, namespace['RestResource'])
+        self.assertIs(pyneric.tryf, namespace['tryf'])
+
+    def _loaded_modules(self, code):
+        """Return the pyneric modules loaded in a new interpreter."""
+        code += ("\nimport sys\n"
+                 "print(' '.join(x for x in sys.modules"
+                 " if x.startswith('pyneric')))")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         env=env)
+        return set(output.decode().split())
+
+    @skipIf(not LAZY, "module __getattr__ is not supported")
+    def test_lazy_import(self):
+        modules = self._loaded_modules('import pyneric')
+        self.assertEqual({'pyneric', 'pyneric._version'}, modules)
+
+    @skipIf(not LAZY, "module __getattr__ is not supported")
+    def test_lazy_attribute(self):
+        modules = self._loaded_modules('import pyneric; pyneric.tryf')
+        self.assertIn('pyneric.util', modules)
+        self.assertNotIn('pyneric.meta', modules)
+        self.assertNotIn('pyneric.rest_requests', modules)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Tests for pyneric.rate_limit"""
+
+from email.utils import formatdate
+import threading
+import time
+from unittest import TestCase
+
+from pyneric.http import v1_1 as http
+from pyneric.rate_limit import BATCH, INTERACTIVE, RateLimiter
+from pyneric import rate_limit
+
+
+class Response(object):
+
+    """A stand-in response."""
+
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class RateLimiterTestCase(TestCase):
+
+    # The rate is a power of 2 so that the clock advances exactly.
+    RATE = 1024
+
+    def setUp(self):
+        self.now = 0
+
+    def limiter(self, *args, **kwargs):
+        return RateLimiter(*args, clock=lambda: self.now, **kwargs)
+
+    def acquired(self, limiter, count, method='GET'):
+        """Return how many of the requests may be made without waiting."""
+        return sum(limiter.acquire(method, timeout=0) for _ in range(count))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, RateLimiter, 0)
+        self.assertRaises(ValueError, RateLimiter, 1, burst=0)
+        self.assertRaises(ValueError, RateLimiter,
+                          method_rates={http.POST: (1, 0.5)})
+
+    def test_burst(self):
+        limiter = self.limiter(2, burst=3)
+        self.assertEqual(3, self.acquired(limiter, 5))
+        self.now = 0.5
+        self.assertEqual(1, self.acquired(limiter, 2))
+        self.now = 10
+        self.assertEqual(3, self.acquired(limiter, 5))
+        self.assertEqual(7, limiter.granted)
+        self.assertEqual(0, limiter.queue_depth)
+        self.assertEqual(1, self.acquired(self.limiter(0.5), 2))
+
+    def test_method_rates(self):
+        limiter = self.limiter(method_rates={http.POST: 1, 'put': (2, 1)})
+        self.assertEqual(100, self.acquired(limiter, 100))
+        self.assertEqual(1, self.acquired(limiter, 3, 'post'))
+        self.assertEqual(1, self.acquired(limiter, 3, 'PUT'))
+        self.now = 0.5
+        self.assertEqual(0, self.acquired(limiter, 1, 'POST'))
+        self.assertEqual(1, self.acquired(limiter, 3, 'PUT'))
+
+    def test_priority(self):
+        limiter = self.limiter(self.RATE, burst=1)
+        limiter.acquire()
+        order = []
+
+        def acquire(name, priority):
+            limiter.acquire(priority=priority)
+            order.append(name)
+        threads = [threading.Thread(target=acquire, args=('batch', BATCH))
+                   for _ in range(3)]
+        threads.append(threading.Thread(target=acquire,
+                                        args=('interactive', INTERACTIVE)))
+        for count, thread in enumerate(threads, 1):
+            thread.start()
+            while limiter.queue_depth < count:
+                time.sleep(0.001)
+        self.assertEqual({BATCH: 3, INTERACTIVE: 1}, limiter.queue_depths)
+        for count in range(1, 5):
+            self.now += 1 / self.RATE
+            while len(order) < count:
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(['interactive'] + ['batch'] * 3, order)
+        self.assertEqual(5, limiter.granted)
+        self.assertEqual(4 / self.RATE, limiter.max_wait)
+        self.assertEqual((1 + 2 + 3 + 4) / self.RATE, limiter.total_wait)
+        self.assertEqual(limiter.total_wait / 5, limiter.mean_wait)
+
+    def test_timeout(self):
+        limiter = self.limiter(self.RATE, burst=1)
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire(timeout=0))
+        self.assertEqual(0, limiter.queue_depth)
+        self.now += 1 / self.RATE
+        self.assertTrue(limiter.acquire(timeout=0))
+        self.assertEqual(0, limiter.mean_wait)
+
+    def test_retry_after(self):
+        limiter = self.limiter()
+        self.assertIsNone(limiter.observe(Response(200)))
+        self.assertIsNone(limiter.observe(
+            Response(200, {'Retry-After': '5'})))
+        self.assertIsNone(limiter.observe(Response(429)))
+        self.assertEqual(1, self.acquired(limiter, 1))
+        self.assertEqual(2, limiter.observe(
+            Response(429, {'Retry-After': '2'})))
+        self.assertEqual(1, limiter.observe(
+            Response(503, {'Retry-After': '1'})))
+        self.assertEqual(0, self.acquired(limiter, 1))
+        self.now = 1.5
+        self.assertEqual(0, self.acquired(limiter, 1, 'POST'))
+        self.now = 2
+        self.assertEqual(2, self.acquired(limiter, 2))
+        self.assertEqual(2, limiter.throttled)
+
+    def test_retry_after_seconds(self):
+        seconds = rate_limit._retry_after_seconds
+        self.assertEqual(120, seconds(' 120 '))
+        self.assertEqual(30, seconds(formatdate(1000030, usegmt=True),
+                                     now=1000000))
+        self.assertEqual(0, seconds(formatdate(1000000, usegmt=True),
+                                    now=1000030))
+        for value in (None, '', '-1', 'soon'):
+            self.assertIsNone(seconds(value))
+
+    def test_request(self):
+        limiter = self.limiter(1, burst=1)
+        calls = []
+
+        def send(**kwargs):
+            calls.append(kwargs)
+            return Response(429, {'Retry-After': '3'})
+        response = limiter.request(send, 'GET', 'http://a/', priority=BATCH,
+                                   params=dict(a=1))
+        self.assertEqual(429, response.status_code)
+        self.assertEqual([dict(method='GET', url='http://a/',
+                               params=dict(a=1))], calls)
+        self.assertEqual((1, 1), (limiter.granted, limiter.throttled))
+        self.now = 2
+        self.assertEqual(0, self.acquired(limiter, 1))
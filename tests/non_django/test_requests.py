@@ -1,7 +1,17 @@
+from email.utils import formatdate
+import io
 from mock import patch
+import threading
+import time
 from unittest import TestCase
 
-from pyneric.requests import RequestHandler, SUPPORTED_METHODS
+import requests
+
+from pyneric.http import v1_1 as http
+from pyneric.requests import (Middleware, RequestHandler, ResponseCache,
+                              RetryPolicy, SessionPool, SingleFlight,
+                              SUPPORTED_METHODS, get_default_session_pool)
+from stand_in_http import StandInServer, echo, flaky
 
 
 @patch('pyneric.requests.requests.request')
@@ -71,3 +81,748 @@ class RequestHandlerTestCase(TestCase):
         handler.request(_handlers=(handler, handler), **kwargs)
         request_mock.assert_called_once_with(**kwargs)
         self.assertEqual(3, handler.calls)
+        request_mock.reset_mock()
+        handler.request(_handlers=iter([handler]), **kwargs)
+        request_mock.assert_called_once_with(**kwargs)
+        self.assertEqual(5, handler.calls)
+
+    def test_request_handlers_resent(self, request_mock):
+        class Handler(RequestHandler):
+
+            def __init__(self):
+                self.calls = 0
+
+            def request(self, method, url, **kwargs):
+                self.calls += 1
+                return super(Handler, self).request(method, url, **kwargs)
+
+        class Terminal(object):
+
+            def __init__(self):
+                self.calls = []
+                self.release = threading.Event()
+
+            def request(self, **kwargs):
+                self.calls.append(kwargs)
+                if len(self.calls) == 1:
+                    raise requests.ConnectionError()
+                self.release.wait()
+                return requests.Response()
+
+        a, b, terminal = Handler(), Handler(), Terminal()
+        handler = RequestHandler()
+        handler.retry_policy = RetryPolicy(backoff=0)
+        handler.single_flight = flight = SingleFlight()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            handler.get('http://a/', _handlers=[a, b, terminal])))
+            for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while flight.made + flight.coalesced < 3 or len(terminal.calls) < 2:
+            time.sleep(0.001)
+        terminal.release.set()
+        for thread in threads:
+            thread.join()
+        # The retry went through the rest of the chain again, and the
+        # chained requests were coalesced.
+        self.assertEqual(0, request_mock.call_count)
+        self.assertEqual((2, 2, 2), (a.calls, b.calls, len(terminal.calls)))
+        self.assertEqual((1, 2), (flight.made, flight.coalesced))
+        self.assertEqual([False, True, True],
+                         sorted(x.coalesced for x in results))
+        self.assertEqual((), terminal.calls[1]['_handlers'])
+
+    def test_request_handlers_passing_on(self, request_mock):
+        class Handler(RequestHandler):
+
+            def request(self, method, url, **kwargs):
+                chains.append(tuple(kwargs['_handlers']))
+                return super(Handler, self).request(method, url, **kwargs)
+
+        class Terminal(object):
+
+            @staticmethod
+            def request(**kwargs):
+                chains.append(tuple(kwargs['_handlers']))
+                return kwargs
+
+        chains = []
+        plain, piped, custom = RequestHandler(), RequestHandler(), Handler()
+        piped.middleware = [Middleware()]
+        handler = RequestHandler()
+        handler.get('http://a/',
+                    _handlers=[plain, plain, custom, plain, Terminal])
+        handler.get('http://a/', _handlers=[plain, piped, plain, Terminal])
+        # Only the plain handlers at the start were left out, so the others
+        # were given the chains they would have been.
+        self.assertEqual([(plain, Terminal), (), ()], chains)
+        handler.get('http://a/', _handlers=iter([plain, plain]))
+        request_mock.assert_called_once_with(method='GET', url='http://a/',
+                                             allow_redirects=True)
+
+    def test_middleware(self, request_mock):
+        calls = []
+
+        class Recorder(Middleware):
+
+            def __init__(self, name):
+                self.name = name
+
+            def before(self, kwargs):
+                calls.append(('before', self.name))
+                return dict(kwargs, headers={'X-Name': self.name})
+
+            def after(self, kwargs, response):
+                calls.append(('after', self.name, kwargs['headers']))
+                return response, self.name
+
+        class Before(Middleware):
+
+            def before(self, kwargs):
+                calls.append('before only')
+                return kwargs
+
+        handler = RequestHandler()
+        handler.middleware = (Recorder('a'), Before(), Recorder('b'))
+        response = handler.get('http://a/')
+        self.assertEqual(((request_mock.return_value, 'b'), 'a'), response)
+        request_mock.assert_called_once_with(
+            method='GET', url='http://a/', allow_redirects=True,
+            headers={'X-Name': 'b'})
+        self.assertEqual([('before', 'a'), 'before only', ('before', 'b'),
+                          ('after', 'b', {'X-Name': 'b'}),
+                          ('after', 'a', {'X-Name': 'b'})], calls)
+        befores, afters = handler._pipeline()
+        self.assertEqual((3, 2), (len(befores), len(afters)))
+        self.assertIs(befores, handler._pipeline()[0])
+        handler.middleware = [Middleware()]
+        self.assertEqual(((), ()), handler._pipeline())
+        self.assertIs(request_mock.return_value, handler.get('http://a/'))
+
+
+class SessionPoolTestCase(TestCase):
+
+    def test_keep_alive(self):
+        with StandInServer() as server, SessionPool() as pool:
+            for method in SUPPORTED_METHODS:
+                response = getattr(pool, method.token.lower())(server.url)
+                self.assertEqual(200, response.status_code)
+            response = pool.request('GET', server.url + '/path?x')
+            self.assertEqual('/path?x', response.json()['path'])
+        self.assertEqual(len(SUPPORTED_METHODS) + 1, len(server.requests))
+        self.assertEqual(1, server.connections)
+
+    def test_redirect_defaults(self):
+        with SessionPool() as pool:
+            session = pool.session_for('http://host.net/a')
+            for method in SUPPORTED_METHODS:
+                name = method.token.lower()
+                with patch.object(session, 'request') as request_mock:
+                    getattr(pool, name)('http://host.net/b')
+                args, kwargs = request_mock.call_args
+                self.assertEqual(method.token, args[0])
+                # As with the requests functions, only HEAD does not allow
+                # redirects by default.
+                self.assertEqual(name != 'head',
+                                 kwargs.get('allow_redirects', True))
+
+    def test_sessions_keyed_by_scheme_and_host(self):
+        with SessionPool() as pool:
+            session = pool.session_for('http://host.net/a')
+            self.assertIs(session, pool.session_for('HTTP://Host.net?b'))
+            self.assertIsNot(session, pool.session_for('https://host.net/'))
+            self.assertIsNot(session, pool.session_for('http://host.net:81'))
+            self.assertEqual(3, len(pool))
+        self.assertEqual(0, len(pool))
+
+    def test_pool_size(self):
+        with SessionPool(pool_size=2) as pool:
+            first = pool.session_for('http://a')
+            second = pool.session_for('http://b')
+            self.assertIs(first, pool.session_for('http://a'))
+            with patch.object(second, 'close') as close:
+                pool.session_for('http://c')  # Evicts b (least recent).
+            close.assert_called_once_with()
+            self.assertEqual(2, len(pool))
+            self.assertIs(first, pool.session_for('http://a'))
+        self.assertRaises(ValueError, SessionPool, pool_size=0)
+        self.assertRaises(ValueError, SessionPool, max_connections_per_host=0)
+
+    def test_idle_timeout(self):
+        now = [0]
+        with SessionPool(idle_timeout=10, clock=lambda: now[0]) as pool:
+            first = pool.session_for('http://a')
+            now[0] = 5
+            self.assertIs(first, pool.session_for('http://a'))
+            now[0] = 14.9
+            self.assertIs(first, pool.session_for('http://a'))
+            now[0] = 25
+            self.assertIsNot(first, pool.session_for('http://a'))
+
+    def test_close_when_unused(self):
+        now = [0]
+        pool = SessionPool(pool_size=1, idle_timeout=10, clock=lambda: now[0])
+        closed = []
+
+        def request(session, evict):
+            def send(*args, **kwargs):
+                evict()
+                self.assertNotIn(session, closed)
+                return 'response'
+            session.close = lambda: closed.append(session)
+            session.request = send
+            return session
+
+        # Evicted by another host.
+        first = request(pool.session_for('http://a'),
+                        lambda: pool.session_for('http://b'))
+        self.assertEqual('response', pool.get('http://a'))
+        self.assertEqual([first], closed)
+        # Expired while in use.
+        del closed[:]
+
+        def expire():
+            now[0] = 20
+            pool.session_for('http://a')
+
+        second = request(pool.session_for('http://b'), expire)
+        self.assertEqual('response', pool.request('GET', 'http://b'))
+        self.assertEqual([second], closed)
+        # The pool is closed while a session is in use.
+        del closed[:]
+        third = request(pool.session_for('http://a'), pool.close)
+        self.assertEqual('response', pool.get('http://a'))
+        self.assertEqual([third], closed)
+        self.assertEqual({}, pool._in_use)
+        self.assertEqual(set(), pool._retired)
+
+    def test_cookies(self):
+        with StandInServer() as server:
+            with SessionPool() as pool:
+                pool.get(server.url + '/set-cookie')
+                self.assertIsNone(pool.get(server.url).json()['cookie'])
+            with SessionPool(keep_cookies=True) as pool:
+                pool.get(server.url + '/set-cookie')
+                self.assertEqual('name=value',
+                                 pool.get(server.url).json()['cookie'])
+
+    def test_default_session_pool(self):
+        pool = get_default_session_pool()
+        self.assertIsInstance(pool, SessionPool)
+        self.assertIs(pool, get_default_session_pool())
+
+
+class ResponseCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = ResponseCache(clock=lambda: self.now)
+        self.response_headers = {}  # keyed by path (without the query)
+        self.server = StandInServer(self.respond)
+        self.server.__enter__()
+        self.pool = SessionPool()
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.__exit__(None, None, None)
+
+    def respond(self, request):
+        path = request.path.split('?')[0]
+        headers = dict(self.response_headers.get(path, {}))
+        etag = headers.get('ETag')
+        if etag and request.headers.get('If-None-Match') == etag:
+            return 304, headers, b''
+        if (request.headers.get('If-Modified-Since') and
+                request.headers['If-Modified-Since'] ==
+                headers.get('Last-Modified')):
+            return 304, headers, b''
+        status, _, body = echo(request)
+        headers['Content-Type'] = 'application/json'
+        if path == '/moved':
+            status = 201
+        return status, headers, body
+
+    def request(self, method, path, **kwargs):
+        return self.cache.request(self.pool.request, method,
+                                  self.server.url + path, **kwargs)
+
+    def assertCounts(self, hits, revalidations, misses):
+        self.assertEqual(
+            (hits, revalidations, misses),
+            (self.cache.hits, self.cache.revalidations, self.cache.misses))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, ResponseCache, methods=(http.PUT,))
+        self.assertRaises(ValueError, ResponseCache,
+                          methods=(http.patch.PATCH,))
+        self.assertRaises(ValueError, ResponseCache, maxsize=0)
+
+    def test_max_age(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60'}
+        first = self.request('GET', '/a')
+        self.assertFalse(first.from_cache)
+        self.now = 59
+        second = self.request('GET', '/a')
+        self.assertTrue(second.from_cache)
+        self.assertEqual(first.json(), second.json())
+        self.assertCounts(1, 0, 1)
+        self.assertEqual(1, len(self.server.requests))
+        self.now = 60
+        self.assertFalse(self.request('GET', '/a').from_cache)
+        self.assertCounts(1, 0, 2)
+        self.assertEqual(1, len(self.cache))
+
+    def test_request_directives(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60'}
+        self.request('GET', '/a')
+        self.now = 20
+        # Each new response is stored (at 20) except with no-store.
+        for headers in ({'cache-control': 'max-age=10'},
+                        {'Cache-Control': 'no-cache'},
+                        {'pragma': 'no-cache'},
+                        {'Cache-Control': 'no-store'}):
+            self.assertFalse(
+                self.request('GET', '/a', headers=headers).from_cache)
+        self.assertTrue(self.request('GET', '/a').from_cache)
+        self.assertFalse(self.request('GET', '/a', stream=True).from_cache)
+
+    def test_expires(self):
+        # The lifetime is relative to the Date header added by the server.
+        self.response_headers['/a'] = {
+            'Expires': formatdate(time.time() + 60, usegmt=True)}
+        self.response_headers['/b'] = {'Expires': '0'}
+        self.request('GET', '/a')
+        self.request('GET', '/b')
+        self.now = 30
+        self.assertTrue(self.request('GET', '/a').from_cache)
+        self.assertFalse(self.request('GET', '/b').from_cache)
+        self.now = 61
+        self.assertFalse(self.request('GET', '/a').from_cache)
+
+    def test_not_stored(self):
+        self.response_headers['/no-store'] = {
+            'Cache-Control': 'max-age=60, no-store'}
+        self.response_headers['/private'] = {
+            'Cache-Control': 'private, max-age=60'}
+        self.response_headers['/vary'] = {
+            'Cache-Control': 'max-age=60', 'Vary': '*'}
+        self.response_headers['/moved'] = {'ETag': '"1"'}  # status 201
+        for path in ('/no-store', '/private', '/vary', '/moved', '/none'):
+            self.request('GET', path)
+            self.assertFalse(self.request('GET', path).from_cache, path)
+        self.assertEqual(0, len(self.cache))
+        self.cache = ResponseCache(shared=False)
+        self.request('GET', '/private')
+        self.assertTrue(self.request('GET', '/private').from_cache)
+
+    def test_authorization(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60'}
+        self.response_headers['/b'] = {'Cache-Control': 'max-age=60, public'}
+        for path in ('/a', '/b'):
+            self.request('GET', path, headers={'Authorization': 'x'})
+        self.assertFalse(self.request('GET', '/a').from_cache)
+        self.assertTrue(self.request('GET', '/b').from_cache)
+
+    def test_revalidation(self):
+        self.response_headers['/etag'] = {'ETag': '"1"'}
+        self.response_headers['/modified'] = {
+            'Cache-Control': 'max-age=10',
+            'Last-Modified': 'Sun, 06 Nov 1994 08:49:37 GMT'}
+        for path in ('/etag', '/modified'):
+            first = self.request('GET', path)
+        self.assertCounts(0, 0, 2)
+        response = self.request('GET', '/etag')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(first.json()['path'], '/modified')
+        self.assertEqual('/etag', response.json()['path'])
+        self.assertCounts(0, 1, 2)
+        self.assertTrue(self.request('GET', '/modified').from_cache)
+        self.assertCounts(1, 1, 2)
+        self.now = 10
+        self.response_headers['/modified']['Cache-Control'] = 'max-age=20'
+        response = self.request('GET', '/modified')
+        self.assertTrue(response.from_cache)
+        self.assertEqual('max-age=20', response.headers['Cache-Control'])
+        self.assertCounts(1, 2, 2)
+        self.now = 29
+        self.assertTrue(self.request('GET', '/modified').from_cache)
+        self.assertCounts(2, 2, 2)
+        self.response_headers['/etag']['ETag'] = '"2"'
+        self.assertFalse(self.request('GET', '/etag').from_cache)
+        self.assertCounts(2, 2, 3)
+        self.assertEqual(5, len(self.server.requests))
+
+    def test_head(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60'}
+        self.request('HEAD', '/a')
+        self.assertEqual(0, len(self.cache))
+        self.request('GET', '/a')
+        response = self.request('HEAD', '/a')
+        self.assertTrue(response.from_cache)
+        self.assertEqual(b'', response.content)
+        self.assertNotEqual(b'', self.request('GET', '/a').content)
+
+    def test_vary(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60',
+                                       'Vary': 'Accept'}
+        json_headers = {'Accept': 'application/json'}
+        self.request('GET', '/a', headers=json_headers)
+        self.request('GET', '/a', headers={'Accept': 'text/plain'})
+        self.assertFalse(self.request('GET', '/a').from_cache)
+        self.assertTrue(self.request(
+            'GET', '/a', headers={'accept': 'application/json'}).from_cache)
+        self.assertTrue(self.request('GET', '/a').from_cache)
+
+    def test_params(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60'}
+        self.request('GET', '/a', params=dict(x=1))
+        self.assertFalse(self.request('GET', '/a').from_cache)
+        response = self.request('GET', '/a?x=1')
+        self.assertTrue(response.from_cache)
+        self.assertEqual('/a?x=1', response.json()['path'])
+
+    def test_unsafe_invalidation(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60'}
+        self.response_headers['/moved'] = {'Location': '/a'}
+        self.request('GET', '/a')
+        self.request('OPTIONS', '/a')
+        self.assertEqual(1, len(self.cache))
+        self.request('POST', '/a')
+        self.assertEqual(0, len(self.cache))
+        self.request('GET', '/a')
+        self.request('PUT', '/moved')
+        self.assertEqual(0, len(self.cache))
+
+    def test_cacheable_patch(self):
+        self.cache = ResponseCache(
+            clock=lambda: self.now,
+            methods=(http.GET, http.patch.CACHEABLE_PATCH))
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60',
+                                       'Content-Location': '/a'}
+        self.response_headers['/b'] = {'Cache-Control': 'max-age=60'}
+        self.response_headers['/c'] = {'Content-Location': '/c',
+                                       'ETag': '"1"'}
+        for path in ('/a', '/b', '/c'):
+            self.request('PATCH', path, data='x')
+        self.assertEqual(1, len(self.cache))
+        response = self.request('GET', '/a')
+        self.assertTrue(response.from_cache)
+        self.assertEqual('PATCH', response.json()['method'])
+        self.assertFalse(self.request('PATCH', '/a').from_cache)
+
+    def test_maxsize(self):
+        self.cache = ResponseCache(maxsize=2, clock=lambda: self.now)
+        for path in ('/a', '/b', '/c'):
+            self.response_headers[path] = {'Cache-Control': 'max-age=60'}
+        self.request('GET', '/a')
+        self.request('GET', '/b')
+        self.request('GET', '/a')
+        self.request('GET', '/c')  # Evicts /b (least recently used).
+        self.assertEqual(2, self.cache.maxsize)
+        self.assertTrue(self.request('GET', '/a').from_cache)
+        self.assertFalse(self.request('GET', '/b').from_cache)
+        self.cache.clear()
+        self.assertEqual(0, len(self.cache))
+        self.assertCounts(0, 0, 0)
+
+    def test_request_handler(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60'}
+        handler = RequestHandler()
+        handler.response_cache = self.cache
+        self.assertFalse(handler.get(self.server.url + '/a').from_cache)
+        self.assertTrue(handler.get(self.server.url + '/a').from_cache)
+        self.assertTrue(self.cache.shared)
+
+    def test_nested_request_handlers(self):
+        self.response_headers['/a'] = {'Cache-Control': 'max-age=60'}
+        self.response_headers['/b'] = {'Cache-Control': 'no-cache',
+                                       'ETag': '"1"'}
+        outer, inner = RequestHandler(), RequestHandler()
+        outer.response_cache = inner.response_cache = self.cache
+        handlers = [inner]
+        for path in ('/a', '/b'):
+            self.assertFalse(outer.get(self.server.url + path,
+                                       _handlers=handlers).from_cache)
+            self.assertTrue(outer.get(self.server.url + path,
+                                      _handlers=handlers).from_cache)
+        self.assertCounts(1, 1, 2)
+        self.assertEqual(3, len(self.server.requests))
+
+
+class SingleFlightTestCase(TestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = []
+        self.release = threading.Event()
+        self.error = None
+
+    def send(self, **kwargs):
+        """Make a stand-in request, waiting for it to be released."""
+        self.calls.append(kwargs)
+        self.release.wait()
+        if self.error is not None:
+            raise self.error
+        response = requests.Response()
+        response.url = kwargs['url']
+        return response
+
+    def request_concurrently(self, count, method='GET', url='http://a/',
+                             **kwargs):
+        """Make requests in threads, releasing them once all have started.
+        """
+        results = [None] * count
+
+        def request(index):
+            try:
+                results[index] = self.flight.request(self.send, method, url,
+                                                     **kwargs)
+            except Exception as exc:
+                results[index] = exc
+        threads = [threading.Thread(target=request, args=(x,))
+                   for x in range(count)]
+        started = self.flight.made + self.flight.coalesced
+        for thread in threads:
+            thread.start()
+        while (self.flight.made + self.flight.coalesced - started < count or
+               len(self.calls) < self.flight.made):
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.release.clear()
+        return results
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, SingleFlight, methods=[http.POST])
+        SingleFlight(methods=[http.OPTIONS])
+
+    def test_coalesced(self):
+        responses = self.request_concurrently(10)
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual((1, 9), (self.flight.made, self.flight.coalesced))
+        self.assertEqual(10, len(set(map(id, responses))))  # copies
+        self.assertEqual([False] + [True] * 9,
+                         sorted(x.coalesced for x in responses))
+        self.assertEqual({'http://a/'}, set(x.url for x in responses))
+        self.assertEqual(0, len(self.flight))
+        # Another request is made once those have completed.
+        self.request_concurrently(1, 'get')
+        self.assertEqual(2, len(self.calls))
+
+    def test_distinct(self):
+        self.request_concurrently(2, headers={'Accept': 'text/plain'})
+        self.request_concurrently(2, headers={'Accept': 'text/html'})
+        self.request_concurrently(2, params=dict(a=1))
+        self.assertEqual(3, len(self.calls))
+        for kwargs in (dict(method='POST'), dict(stream=True),
+                       dict(data=bytearray(b'x'))):
+            self.request_concurrently(2, **kwargs)
+        self.assertEqual(9, len(self.calls))
+        self.assertEqual((9, 3), (self.flight.made, self.flight.coalesced))
+
+    def test_error(self):
+        self.error = IOError('failed')
+        errors = self.request_concurrently(3)
+        self.assertEqual(1, len(self.calls))
+        # The others raise copies of the exception caused by it.
+        self.assertEqual(3, len(set(map(id, errors))))
+        self.assertIn(self.error, errors)
+        for error in errors:
+            self.assertIs(IOError, type(error))
+            self.assertEqual(('failed',), error.args)
+            if error is not self.error:
+                self.assertIs(self.error, error.__cause__)
+        self.assertEqual(0, len(self.flight))
+
+    def test_request_handler(self):
+        with StandInServer() as server:
+            handler = RequestHandler()
+            handler.single_flight = self.flight
+            response = handler.get(server.url + '/a')
+            self.assertEqual('/a', response.json()['path'])
+            self.assertFalse(response.coalesced)
+            handler.response_cache = ResponseCache()
+            self.assertFalse(handler.head(server.url).coalesced)
+        self.assertEqual(2, self.flight.made)
+
+
+class RetryPolicyTestCase(TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.delays = []
+        self.attempts = []
+        self.pool = SessionPool()
+
+    def tearDown(self):
+        self.pool.close()
+
+    def sleep(self, seconds):
+        self.delays.append(seconds)
+        self.now += seconds
+
+    def policy(self, **kwargs):
+        kwargs.setdefault('backoff', 0.25)
+        return RetryPolicy(clock=lambda: self.now, sleep=self.sleep,
+                           on_attempt=self.attempts.append, **kwargs)
+
+    def request(self, policy, failures, method='GET', **kwargs):
+        """Make a request to a server failing the first requests."""
+        with StandInServer(flaky(failures)) as server:
+            try:
+                return policy.request(self.pool.request, method,
+                                      server.url + '/a', **kwargs)
+            finally:
+                self.requests = server.requests
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, RetryPolicy, max_attempts=0)
+        self.assertRaises(ValueError, RetryPolicy, budget=0.5)
+
+    def test_retried(self):
+        policy = self.policy()
+        response = self.request(policy, [None, 503])
+        self.assertEqual('/a', response.json()['path'])
+        self.assertEqual(3, len(self.requests))
+        self.assertEqual((3, 2, 0),
+                         (policy.attempts, policy.retries, policy.denied))
+        self.assertEqual([1, 2, 3], [x.number for x in self.attempts])
+        self.assertIsInstance(self.attempts[0].error,
+                              requests.ConnectionError)
+        self.assertEqual(503, self.attempts[1].response.status_code)
+        self.assertEqual([True, True, False],
+                         [x.retrying for x in self.attempts])
+        self.assertTrue(0 <= self.delays[0] <= 0.25)
+        self.assertTrue(0 <= self.delays[1] <= 0.5)
+
+    def test_exhausted(self):
+        policy = self.policy(max_attempts=2)
+        self.assertEqual(502, self.request(policy, [503, 502]).status_code)
+        self.assertRaises(requests.ConnectionError, self.request, policy,
+                          [None, None])
+        self.assertEqual(4, policy.attempts)
+
+    def test_not_retried(self):
+        policy = self.policy()
+        self.assertEqual(500, self.request(policy, [500]).status_code)
+        self.assertEqual(503, self.request(policy, [503], 'POST').status_code)
+        self.assertRaises(requests.ConnectionError, self.request, policy,
+                          [None], http.patch.PATCH.token)
+        self.assertEqual((3, 0), (policy.attempts, policy.retries))
+        response = self.request(policy, [503], 'POST',
+                                headers={'idempotency-key': 'x'})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, policy.retries)
+
+    def test_retry_after(self):
+        policy = self.policy()
+        throttled = []
+
+        def respond(request):
+            if throttled:
+                return echo(request)
+            throttled.append(request.path)
+            return 429, {'Retry-After': '3'}, b''
+        with StandInServer(respond) as server:
+            response = policy.request(self.pool.request, 'GET', server.url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([3], self.delays)
+
+    def test_max_retry_after(self):
+        def send(**kwargs):
+            response = requests.Response()
+            response.status_code = 503
+            response.headers['Retry-After'] = '3600'
+            response.raw = io.BytesIO()
+            return response
+        policy = self.policy(max_retry_after=60)
+        self.assertEqual(503, policy.request(send, 'GET', 'http://a/')
+                         .status_code)
+        self.assertEqual((1, 0, 1),
+                         (policy.attempts, policy.retries, policy.denied))
+        self.assertEqual([], self.delays)
+        policy = self.policy(max_retry_after=None, max_attempts=2)
+        policy.request(send, 'GET', 'http://a/')
+        self.assertEqual([3600], self.delays)
+
+    def test_body_not_replayable(self):
+        policy = self.policy()
+        for kwargs in (dict(data=iter([b'a'])), dict(data=io.BytesIO(b'a')),
+                       dict(files={'f': io.BytesIO(b'a')}),
+                       dict(files=[('f', ('f.txt', io.BytesIO(b'a')))])):
+            self.assertEqual(503, self.request(policy, [503], 'PUT',
+                                               **kwargs).status_code)
+        self.assertEqual((4, 0), (policy.attempts, policy.retries))
+        for kwargs in (dict(data=b'a'), dict(data={'a': 'b'}),
+                       dict(files={'f': ('f.txt', b'a')})):
+            self.assertEqual(200, self.request(policy, [503], 'PUT',
+                                               **kwargs).status_code)
+        self.assertEqual(3, policy.retries)
+
+    def test_budget(self):
+        policy = self.policy(budget=4, budget_ratio=0.5, max_attempts=10)
+        with StandInServer(flaky([503] * 3)) as server:
+            url = server.url
+            response = policy.request(self.pool.request, 'GET', url)
+            self.assertEqual(503, response.status_code)
+            # The second failure leaves only half of the tokens.
+            self.assertEqual((2, 1, 1), (policy.attempts, policy.retries,
+                                         policy.denied))
+            self.assertEqual(2, policy.tokens(url))
+            response = policy.request(self.pool.request, 'GET', url)
+            self.assertEqual((3, 1, 2), (policy.attempts, policy.retries,
+                                         policy.denied))
+            for _ in range(3):
+                policy.request(self.pool.request, 'GET', url)
+        self.assertEqual(2.5, policy.tokens(url))
+        self.assertEqual(4, policy.tokens('https://other/'))
+
+    def test_deadline(self):
+        policy = self.policy(deadline=1, backoff=0.4, max_attempts=10)
+        timeouts = []
+
+        def send(**kwargs):
+            timeouts.append(kwargs['timeout'])
+            self.now += min(0.25, kwargs['timeout'])
+            raise requests.ConnectTimeout()
+        self.assertRaises(requests.ConnectTimeout, policy.request, send,
+                          'GET', 'http://a/', timeout=5)
+        self.assertEqual(1, timeouts[0])
+        self.assertTrue(all(0 < x < 1 for x in timeouts[1:]))
+        self.assertLessEqual(round(self.now, 9), 1)
+        self.assertEqual(1, policy.denied)
+
+    def test_deadline_passed_while_waiting(self):
+        policy = RetryPolicy(deadline=1, clock=lambda: self.now,
+                             sleep=lambda seconds: self.sleep(1))
+        response = requests.Response()
+        response.status_code = 503
+        response.raw = io.BytesIO()
+        sent = []
+
+        def send(**kwargs):
+            sent.append(kwargs['timeout'])
+            return response
+        # The last response is returned (not closed) without another
+        # attempt (with no time left).
+        self.assertIs(response, policy.request(send, 'GET', 'http://a/'))
+        self.assertFalse(response.raw.closed)
+        self.assertEqual([1], sent)
+        self.assertEqual((1, 0, 1),
+                         (policy.attempts, policy.retries, policy.denied))
+
+        def send(**kwargs):
+            sent.append(kwargs['timeout'])
+            raise requests.ConnectTimeout()
+        self.assertRaises(requests.ConnectTimeout, policy.request, send,
+                          'GET', 'http://a/')
+        self.assertEqual([1, 1], sent)
+
+    def test_request_handler(self):
+        handler = RequestHandler()
+        handler.retry_policy = policy = self.policy()
+        with StandInServer(flaky([None])) as server:
+            self.assertEqual('PUT', handler.put(server.url).json()['method'])
+        self.assertEqual((2, 1), (policy.attempts, policy.retries))
@@ -3,13 +3,24 @@
 
 from future.utils import PY2
 
+import array
+import gc
+import io
+import itertools
+import json
+import time
 from unittest import TestCase
 if PY2:
     from urllib import quote
+    from urlparse import parse_qsl, urlsplit
 else:
-    from urllib.parse import quote
+    from urllib.parse import parse_qsl, quote, urlsplit
+
+import requests
 
 from pyneric import rest_requests
+from pyneric.requests import SessionPool, get_default_session_pool
+from stand_in_http import StandInServer, echo
 
 
 # The test root just has to be a valid URL.
@@ -246,6 +257,29 @@ class RestResourceTestCase(TestCase):
 
         self.assertRaises(ValueError, Resource.from_url, 'invalid://url')
 
+    def test_from_url_invalid_message(self):
+        class Container(rest_requests.RestResource):
+            url_path = 'container'
+
+        class Resource(rest_requests.RestResource):
+            url_path = 'resource'
+            container_class = Container
+
+        # The URL is named as given, and each container's URL as derived.
+        with self.assertRaises(ValueError) as context:
+            Resource.from_url('/?q=1')
+        self.assertEqual(
+            "The URL '/?q=1' is invalid for Resource.  The last segment of "
+            "the URL '/?q=1' is invalid for Resource.",
+            str(context.exception))
+        with self.assertRaises(ValueError) as context:
+            Resource.from_url(ROOT + '/other/resource/?q=1')
+        self.assertEqual(
+            "The URL '{0}/other/resource/?q=1' is invalid for Resource.  The "
+            "URL '{0}/other' is invalid for Container.  The last segment of "
+            "the URL '{0}/other' is invalid for Container.".format(ROOT),
+            str(context.exception))
+
     def test_methods_with_or_without_url_parameter(self):
         class Resource(rest_requests.RestResource):
             url_path = 'a'
@@ -269,6 +303,26 @@ class RestResourceTestCase(TestCase):
         self.assertEqual('a', Resource0.url_path)
         self.assertEqual('b', Resource1.url_path)
 
+    def test_find_classes_by_container(self):
+        class Container(rest_requests.RestResource):
+            url_path = 'container'
+
+        class Resource0(rest_requests.RestResource):
+            url_path = 'a'
+            container_class = Container
+
+        class Resource1(rest_requests.RestCollection):
+            url_path = 'b'
+            container_class = Container
+
+        self.assertEqual(
+            {Resource0, Resource1},
+            rest_requests.RestResource.find_classes(container_class=Container))
+        self.assertEqual(
+            {Resource1},
+            rest_requests.RestCollection.find_classes(
+                container_class=Container))
+
 
 class RestCollectionTestCase(TestCase):
 
@@ -388,6 +442,20 @@ class RestCollectionTestCase(TestCase):
         self.assertEqual(ROOT, obj.container)
         self.assertEqual(id_, obj.id)
 
+    def test_from_url_member_slash_in_container(self):
+        class Container(rest_requests.RestCollection):
+            url_path = 'things'
+
+        class Resource(rest_requests.RestCollection):
+            url_path = 'others'
+            container_class = Container
+
+        url = Resource(Container(ROOT, 'a/b'), 'c/d').url
+        obj = Resource.from_url(url)
+        self.assertEqual('a/b', obj.container_.id)
+        self.assertEqual('c/d', obj.id)
+        self.assertEqual(url, obj.url)
+
     def test_from_url_member_invalid_collection(self):
         class Collection(rest_requests.RestCollection):
             url_path = 'things'
@@ -455,6 +523,677 @@ class RestCollectionTestCase(TestCase):
         self.assertEqual(Collection.id_type, obj.id_type)
 
 
+class RestInternTestCase(TestCase):
+
+    def test_equality(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = int
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Things
+
+        thing = Things(ROOT, 1)
+        self.assertIsNot(thing, Things(ROOT, 1))
+        self.assertEqual(thing, Things(ROOT, '1'))
+        self.assertEqual(hash(thing), hash(Things(ROOT, '1')))
+        self.assertNotEqual(thing, Things(ROOT + '/', 1))
+        self.assertNotEqual(thing, Things(ROOT, 2))
+        self.assertNotEqual(thing, Things(ROOT))
+        self.assertNotEqual(thing, thing.url)
+        self.assertEqual(Detail(thing), Detail(Things(ROOT, 1)))
+        OtherThings = type(Things)(str('OtherThings'), (Things,),
+                                   dict(url_path='things'))
+        self.assertNotEqual(thing, OtherThings(ROOT, 1))
+        self.assertEqual({thing: 1}, {Things(ROOT, 1): 1})
+
+    def test_interned(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = int
+            interned = True
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Things
+            interned = True
+
+        thing = Things(ROOT, 1)
+        self.assertIs(thing, Things(ROOT, 1))
+        self.assertIs(thing, Things(ROOT, id='1'))
+        self.assertIs(thing, Things.from_url(thing.url))
+        self.assertIsNot(thing, Things(ROOT, 2))
+        self.assertIsNot(thing, Things(ROOT))
+        detail = Detail(thing)
+        self.assertIs(detail, Detail(Things(ROOT, 1)))
+        self.assertIs(detail, Detail.from_url(detail.url))
+        self.assertRaises(ValueError, Things, ROOT, 'x')
+        self.assertRaises(TypeError, Things, ROOT, 1, 2)
+
+    def test_interned_weakly(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = int
+            interned = True
+
+        url = Things(ROOT, 1).url
+        gc.collect()
+        thing = Things(ROOT, 1)
+        self.assertEqual(url, thing.url)
+        thing.attribute = 'value'
+        del thing
+        gc.collect()
+        self.assertFalse(hasattr(Things(ROOT, 1), 'attribute'))
+
+    def test_interned_unhashable(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = list
+            interned = True
+
+        thing = Things(ROOT, [1])
+        self.assertEqual(ROOT + '/things/%5B1%5D', thing.url)
+        self.assertIsNot(thing, Things(ROOT, [1]))
+        self.assertEqual(thing, Things(ROOT, [1]))
+
+
+class RestUrlForTestCase(TestCase):
+
+    ROOTS = (ROOT, ROOT + '/', 'http://host.net', 'https://host.net/a//b/../c',
+             'ftp://host.net/v1', 'relative/path', b'http://host.net/v1')
+
+    def test_url_for(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = int
+
+        class Parts(rest_requests.RestCollection):
+            url_path = 'the parts/'
+            container_class = Things
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Parts
+
+        class Count(rest_requests.RestResource):
+            url_path = 'count'
+            container_class = Parts
+            container_is_collection = True
+
+        class Either(rest_requests.RestResource):
+            url_path = 'either/./x'
+            container_class = Parts
+            container_is_collection = None
+
+        for root in self.ROOTS:
+            things = Things(root)
+            thing = Things(root, '1')
+            part = Parts(thing, 'a/b')
+            cases = (
+                (things.url, Things.url_for(root)),
+                (thing.url, Things.url_for(root, '1')),
+                (Parts(thing).url, Parts.url_for(root, 1)),
+                (part.url, Parts.url_for(root, 1, 'a/b')),
+                (Parts(thing, '..').url, Parts.url_for(root, 1, '..')),
+                (Parts(thing, 'é').url, Parts.url_for(root, 1, 'é')),
+                (Detail(part).url, Detail.url_for(root, 1, 'a/b')),
+                (Count(Parts(thing)).url, Count.url_for(root, 1)),
+                (Either(part).url, Either.url_for(root, 1, 'a/b')),
+                (Either(Parts(thing)).url, Either.url_for(root, 1, None)),
+            )
+            for expected, actual in cases:
+                self.assertEqual(expected, actual)
+
+    def test_url_for_invalid(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = int
+
+        class Parts(rest_requests.RestCollection):
+            url_path = 'the parts/'
+            container_class = Things
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Parts
+
+        class Count(rest_requests.RestResource):
+            url_path = 'count'
+            container_class = Parts
+            container_is_collection = True
+
+        self.assertRaises(TypeError, Detail.url_for, ROOT, 1)
+        self.assertRaises(TypeError, Detail.url_for, ROOT, 1, 2, 3)
+        self.assertRaises(TypeError, Parts.url_for, ROOT)
+        self.assertRaises(TypeError, Count.url_for, ROOT, 1, 2)
+        self.assertRaises(ValueError, Detail.url_for, ROOT, 1, None)
+        self.assertRaises(ValueError, Detail.url_for, ROOT, 'x', 'a')
+        self.assertRaises(ValueError, Detail.url_for, object(), 1, 'a')
+        self.assertRaises(TypeError, rest_requests.RestResource.url_for,
+                          ROOT)
+
+    def test_url_for_template_not_inherited(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = int
+
+        class Others(Things):
+            url_path = 'others'
+
+        self.assertEqual(ROOT + '/things/1', Things.url_for(ROOT, 1))
+        self.assertEqual(ROOT + '/others/1', Others.url_for(ROOT, 1))
+
+
+class RestRouterTestCase(TestCase):
+
+    def test_resolve(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = int
+
+        class Parts(rest_requests.RestCollection):
+            url_path = 'the parts/'
+            container_class = Things
+
+        class Count(rest_requests.RestResource):
+            url_path = 'count'
+            container_class = Parts
+            container_is_collection = True
+
+        class Either(rest_requests.RestResource):
+            url_path = 'either'
+            container_class = Parts
+            container_is_collection = None
+
+        class Special(rest_requests.RestCollection):
+            url_path = 'things/special'
+
+        classes = Things, Parts, Count, Either, Special
+        router = rest_requests.RestRouter(ROOT + '/', classes)
+        self.assertEqual(ROOT, router.root)
+        cases = (
+            ('/things', Things, ()),
+            ('/things/1/', Things, (1,)),
+            ('/things/1/the%20parts/a%2Fb/?q=1#f', Parts, (1, 'a/b')),
+            ('/things/1/the parts', Parts, (1,)),
+            ('/things/1/the parts/count', Count, (1,)),
+            ('/things/1/the parts/count/either', Either, (1, 'count')),
+            ('/things/1/the parts/either', Either, (1, None)),
+            ('/things/special', Special, ()),
+            ('/things/special/3', Special, ('3',)),
+        )
+        for path, resource_class, ids in cases:
+            match = router.resolve(ROOT + path)
+            self.assertEqual((resource_class, ids), match)
+            url = resource_class.url_for(ROOT, *match.ids)
+            self.assertEqual(match, router.resolve(url))
+        self.assertEqual((Things, (1,)),
+                         router.resolve('HTTP://HOST.NET/v1/things/1'))
+        for path in ('', '/things/x', '/things/1/other', '0/things'):
+            self.assertIsNone(router.resolve(ROOT + path))
+        self.assertIsNone(router.resolve('http://other.net/v1/things'))
+
+    def test_resolve_registered_classes(self):
+        class Registered(rest_requests.RestCollection):
+            url_path = 'registered-only-here'
+            id_type = int
+
+        router = rest_requests.RestRouter(ROOT)
+        self.assertEqual((Registered, (2,)),
+                         router.resolve(ROOT + '/registered-only-here/2'))
+
+    def test_resolve_many(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            id_type = int
+
+        router = rest_requests.RestRouter(ROOT, [Things])
+        urls = [ROOT + '/things/1', ROOT + '/nothing', ROOT + '/things/1']
+        self.assertEqual([router.resolve(x) for x in urls],
+                         router.resolve_many(urls))
+
+
+class RestSessionPoolTestCase(TestCase):
+
+    def test_inherited(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Things
+
+        thing = Things(ROOT, 'a')
+        detail = Detail(thing)
+        self.assertIs(get_default_session_pool(), detail.session_pool)
+        pool = SessionPool()
+        thing.session_pool = pool
+        self.assertIs(pool, detail.session_pool)
+        other_pool = SessionPool()
+        detail.session_pool = other_pool
+        self.assertIs(other_pool, detail.session_pool)
+        self.assertIs(pool, thing.session_pool)
+
+    def test_requests_through_pool(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Things
+
+        with StandInServer() as server, SessionPool() as pool:
+            thing = Things(server.url, 'a')
+            thing.session_pool = pool
+            self.assertEqual('/things/a', thing.get().json()['path'])
+            response = Detail(thing).post(data='x')
+            self.assertEqual('POST', response.json()['method'])
+            self.assertEqual('PUT', thing.request('PUT').json()['method'])
+        self.assertEqual(1, server.connections)
+        self.assertEqual(3, len(server.requests))
+
+    def test_request_methods(self):
+        from pyneric.requests import SUPPORTED_METHODS
+        for method in SUPPORTED_METHODS:
+            self.assertTrue(callable(
+                vars(rest_requests.RestResource)[method.token.lower()]))
+
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+
+        thing = Things(ROOT, 'a')
+        self.assertFalse(hasattr(thing, 'missing'))
+        with StandInServer() as server:
+            thing.session_pool = SessionPool()
+            response = thing.delete(url=server.url + '/other')
+            self.assertEqual('/other', response.json()['path'])
+            self.assertEqual('DELETE', response.json()['method'])
+
+    def test_response_cache(self):
+        from pyneric.requests import ResponseCache
+
+        def respond(request):
+            status, headers, body = echo(request)
+            headers['Cache-Control'] = 'max-age=60'
+            return status, headers, body
+
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Things
+
+        thing = Things(ROOT, 'a')
+        detail = Detail(thing)
+        self.assertIsNone(detail.response_cache)
+        cache = ResponseCache()
+        thing.response_cache = cache
+        self.assertIs(cache, detail.response_cache)
+        with StandInServer(respond) as server, SessionPool() as pool:
+            thing = Things(server.url, 'a')
+            thing.session_pool = pool
+            thing.response_cache = cache
+            self.assertFalse(thing.get().from_cache)
+            self.assertTrue(thing.get().from_cache)
+            self.assertTrue(thing.request('GET').from_cache)
+            self.assertFalse(Detail(thing).get().from_cache)
+            thing.put(data='x')
+            self.assertFalse(thing.get().from_cache)
+        self.assertEqual(4, len(server.requests))
+
+    def test_single_flight(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from pyneric.requests import SingleFlight
+
+        def respond(request):
+            time.sleep(0.05)
+            return echo(request)
+
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Things
+
+        thing = Things(ROOT, 'a')
+        self.assertIsNone(Detail(thing).single_flight)
+        flight = SingleFlight()
+        thing.single_flight = flight
+        self.assertIs(flight, Detail(thing).single_flight)
+        with StandInServer(respond) as server, SessionPool() as pool:
+            thing = Things(server.url, 'a')
+            thing.session_pool = pool
+            thing.single_flight = flight
+            with ThreadPoolExecutor(4) as executor:
+                responses = list(executor.map(lambda _: thing.get(),
+                                              range(4)))
+            self.assertEqual(1, len(server.requests))
+            self.assertEqual(3, sum(x.coalesced for x in responses))
+            self.assertEqual('GET', Detail(thing).get().json()['method'])
+            self.assertEqual('PUT', thing.put().json()['method'])
+        self.assertEqual((3, 3), (flight.made, flight.coalesced))
+
+    def test_rate_limiter(self):
+        from pyneric.rate_limit import BATCH, RateLimiter
+
+        def respond(request):
+            if request.path.endswith('/detail'):
+                return 429, {'Retry-After': '0'}, b''
+            return echo(request)
+
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Things
+
+        thing = Things(ROOT, 'a')
+        self.assertIsNone(Detail(thing).rate_limiter)
+        limiter = RateLimiter(1000)
+        rest_requests.set_rate_limiter(ROOT + '/', limiter)
+        try:
+            self.assertIs(limiter, Detail(thing).rate_limiter)
+            other = RateLimiter(1000)
+            thing.rate_limiter = other
+            self.assertIs(other, Detail(thing).rate_limiter)
+        finally:
+            rest_requests.set_rate_limiter(ROOT, None)
+        self.assertIsNone(Things(ROOT, 'a').rate_limiter)
+        with StandInServer(respond) as server, SessionPool() as pool:
+            thing = Things(server.url, 'a')
+            thing.session_pool = pool
+            self.assertEqual(200, thing.get(priority=BATCH).status_code)
+            thing.rate_limiter = limiter
+            self.assertEqual('PUT', thing.put(priority=BATCH).json()['method'])
+            self.assertEqual(429, Detail(thing).get().status_code)
+            self.assertEqual(200, thing.request('GET').status_code)
+            self.assertEqual(4, len(server.requests))
+        self.assertEqual((3, 1), (limiter.granted, limiter.throttled))
+
+    def test_retry_policy(self):
+        from pyneric.requests import RetryPolicy
+        from stand_in_http import flaky
+
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+
+        class Detail(rest_requests.RestResource):
+            url_path = 'detail'
+            container_class = Things
+
+        thing = Things(ROOT, 'a')
+        self.assertIsNone(Detail(thing).retry_policy)
+        policy = RetryPolicy(backoff=0)
+        thing.retry_policy = policy
+        self.assertIs(policy, Detail(thing).retry_policy)
+        with StandInServer(flaky([None, 503])) as server, \
+                SessionPool() as pool:
+            thing = Things(server.url, 'a')
+            thing.session_pool = pool
+            thing.retry_policy = policy
+            self.assertEqual('/things/a/detail',
+                             Detail(thing).get().json()['path'])
+            self.assertEqual(3, len(server.requests))
+        self.assertEqual((3, 2), (policy.attempts, policy.retries))
+
+
+class RestMemberUrlsTestCase(TestCase):
+
+    class Things(rest_requests.RestCollection):
+        url_path = 'things'
+        id_type = int
+
+    class Names(rest_requests.RestCollection):
+        url_path = 'names/'
+
+    def assertMemberUrls(self, cls, container, ids, **kwargs):
+        expected = [cls(container, x).url for x in ids]
+        self.assertEqual(expected,
+                         list(cls.member_urls(container, ids, **kwargs)))
+        sink = io.StringIO()
+        self.assertEqual(len(expected),
+                         cls.member_urls(container, ids, sink, **kwargs))
+        self.assertEqual(''.join(x + '\n' for x in expected),
+                         sink.getvalue())
+
+    def test_integers(self):
+        ids = [0, 7, -3, 10 ** 20, '42', True, 5.0]
+        self.assertMemberUrls(self.Things, ROOT, ids)
+        self.assertMemberUrls(self.Things, ROOT + '/', ids, chunk_size=2)
+        self.assertMemberUrls(self.Things, 'file:///v1', ids)
+        self.assertMemberUrls(self.Names, ROOT, ids, chunk_size=3)
+
+    def test_text(self):
+        ids = ['a', 'a b', 'a/b', '.', '..', u'\xe9', 'x_y-z.1', 7]
+        self.assertMemberUrls(self.Names, ROOT, ids)
+        self.assertMemberUrls(self.Names, 'file:///v1', ids, chunk_size=1)
+        thing = self.Things(ROOT, 1)
+
+        class Parts(rest_requests.RestCollection):
+            url_path = 'parts'
+            container_class = self.Things
+
+        self.assertMemberUrls(Parts, thing, ids)
+
+    def test_arrays(self):
+        ids = array.array('l', [3, -1, 2 ** 31 - 1])
+        self.assertMemberUrls(self.Things, ROOT, ids)
+        self.assertMemberUrls(self.Names, ROOT, ids, chunk_size=2)
+        self.assertMemberUrls(self.Things, ROOT, array.array('d', [1.0]))
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover
+            return
+        ids = numpy.arange(-5, 5, dtype=numpy.int64)
+        self.assertMemberUrls(self.Things, ROOT, ids, chunk_size=4)
+        self.assertMemberUrls(self.Names, ROOT, ids)
+
+    def test_lazy(self):
+        urls = self.Things.member_urls(ROOT, itertools.count(), chunk_size=3)
+        self.assertEqual(ROOT + '/things/4', next(itertools.islice(
+            urls, 4, None)))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self.Things.member_urls, ROOT, [],
+                          chunk_size=0)
+        for id in ('x', None):
+            self.assertRaises(ValueError, list,
+                              self.Things.member_urls(ROOT, [1, id]))
+        sink = io.StringIO()
+        self.assertRaises(ValueError, self.Things.member_urls, ROOT,
+                          [1, 2, 'x'], sink, chunk_size=2)
+        self.assertEqual(ROOT + '/things/1\n' + ROOT + '/things/2\n',
+                         sink.getvalue())
+
+    def test_invalid_text(self):
+        self.assertRaises(ValueError, self.Names, ROOT, '')
+        self.assertRaises(ValueError, list,
+                          self.Names.member_urls(ROOT, ['a', '']))
+        self.assertRaises(ValueError, self.Names.member_urls, ROOT, [''],
+                          io.StringIO())
+
+        class Codes(rest_requests.RestCollection):
+            url_path = 'codes'
+
+            @classmethod
+            def validate_id(cls, id):
+                id = super(Codes, cls).validate_id(id)
+                if id is not None and not id.isupper():
+                    raise ValueError("Codes are uppercase.")
+                return id
+
+        self.assertMemberUrls(Codes, ROOT, ['AB', 'C'])
+        for id in ('ab', 1):
+            self.assertRaises(ValueError, list, Codes.member_urls(ROOT, [id]))
+
+
+class RestFetchManyTestCase(TestCase):
+
+    class Things(rest_requests.RestCollection):
+        url_path = 'things'
+        id_type = int
+
+    @staticmethod
+    def respond(request):
+        path = request.path.split('?')[0]
+        if path == '/things/0':
+            time.sleep(0.2)
+        elif path == '/things/4':
+            return 404, {}, b''
+        return echo(request)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self.Things.fetch_many, ROOT, [1],
+                          max_workers=0)
+
+    def test_ordered(self):
+        with StandInServer(self.respond) as server:
+            stats = rest_requests.RestFetchStats()
+            results = list(self.Things.fetch_many(
+                server.url, ['0', 1, 'x', None, 4] + list(range(5, 30)),
+                max_workers=3, stats=stats, params=dict(a='b')))
+        self.assertEqual([0, 1, 'x', None] + list(range(4, 30)),
+                         [x.id for x in results])
+        self.assertEqual(server.url + '/things/1', results[1].url)
+        self.assertEqual('/things/1?a=b', results[1].response.json()['path'])
+        for result in results[2:4]:
+            self.assertEqual((None, None), result[1:3])
+            self.assertIsInstance(result.error, ValueError)
+        self.assertEqual(404, results[4].response.status_code)
+        self.assertIsNone(results[4].error)
+        self.assertEqual(28, len(server.requests))
+        self.assertEqual(3, server.connections)
+        self.assertEqual((30, 2, 28), (stats.count, stats.errors,
+                                       len(stats.latencies)))
+        self.assertGreaterEqual(stats.max_latency, 0.2)
+        self.assertEqual(stats.max_latency, stats.latency_percentile(100))
+        self.assertGreater(stats.throughput, 0)
+        self.assertIn("30 results (2 errors)", str(stats))
+
+    def test_as_completed(self):
+        with StandInServer(self.respond) as server:
+            results = list(self.Things.fetch_many(
+                server.url, range(10), max_workers=4, ordered=False,
+                raise_for_status=True))
+        self.assertEqual(0, results[-1].id)
+        self.assertEqual(set(range(10)), set(x.id for x in results))
+        errors = [x for x in results if x.error is not None]
+        self.assertEqual([4], [x.id for x in errors])
+        self.assertEqual(404, errors[0].response.status_code)
+        self.assertIs(errors[0].response, errors[0].error.response)
+
+    def test_connection_error(self):
+        with StandInServer() as server:
+            url = server.url
+        stats = rest_requests.RestFetchStats()
+        self.assertEqual("0 results (0 errors), no requests", str(stats))
+        results = list(self.Things.fetch_many(url, [1, 2], stats=stats))
+        self.assertEqual([1, 2], [x.id for x in results])
+        for result in results:
+            self.assertIsNone(result.response)
+            self.assertIsInstance(result.error, IOError)
+        self.assertEqual(2, stats.errors)
+
+
+class RestIterMembersTestCase(TestCase):
+
+    class Things(rest_requests.RestCollection):
+        url_path = 'things'
+
+    @staticmethod
+    def respond(request):
+        """Serve 10 things in pages of 3 by Link header, offset, or cursor."""
+        url = urlsplit(request.path)
+        query = dict(parse_qsl(url.query))
+        headers = {'Content-Type': 'application/json'}
+        if url.path == '/link/things':
+            page = int(query.get('page', 0))
+            if page == 2 and query.get('fail'):
+                return 500, headers, b'{}'
+            if page < 3:
+                headers['Link'] = '<{}?page={}&fail={}>; rel="next"'.format(
+                    url.path, page + 1, query.get('fail', ''))
+            content = list(range(page * 3, min(page * 3 + 3, 10)))
+        elif url.path == '/offset/things':
+            offset, limit = int(query['offset']), int(query['limit'])
+            content = dict(things=list(range(offset, min(offset + limit, 10))),
+                           filter=query.get('filter'))
+        else:
+            cursor = int(query.get('cursor', 0))
+            content = dict(items=list(range(cursor, min(cursor + 3, 10))),
+                           next_cursor=str(cursor + 3) if cursor < 7 else None)
+        return 200, headers, json.dumps(content).encode('utf-8')
+
+    def test_invalid(self):
+        things = self.Things(ROOT, 1)
+        self.assertRaises(ValueError, things.iter_members)
+        things = self.Things(ROOT)
+        self.assertRaises(ValueError, things.iter_members, read_ahead=-1)
+        self.assertRaises(NotImplementedError,
+                          rest_requests.Pagination().read_page, None, None)
+
+    def test_link_header(self):
+        with StandInServer(self.respond) as server:
+            things = self.Things(server.url + '/link')
+            members = things.iter_members()
+            self.assertEqual(0, len(server.requests))
+            self.assertEqual(list(range(10)), list(members))
+            self.assertEqual(4, len(server.requests))
+
+    def test_offset(self):
+        class Things(rest_requests.RestCollection):
+            url_path = 'things'
+            pagination = rest_requests.OffsetPagination(
+                limit=3, items_key='things')
+
+        with StandInServer(self.respond) as server:
+            things = Things(server.url + '/offset')
+            self.assertEqual(list(range(10)), list(things.iter_members(
+                read_ahead=2, params=dict(filter='x'))))
+            self.assertEqual(4, len(server.requests))
+            self.assertTrue(all('filter=x' in x[1] for x in server.requests))
+            pagination = rest_requests.OffsetPagination(
+                limit=5, items_key=lambda x: x['things'][:4], start=2)
+            self.assertEqual([2, 3, 4, 5], list(things.iter_members(
+                pagination, read_ahead=0)))
+
+    def test_cursor(self):
+        with StandInServer(self.respond) as server:
+            things = self.Things(server.url + '/cursor')
+            self.assertEqual(list(range(10)), list(things.iter_members(
+                rest_requests.CursorPagination())))
+            pagination = rest_requests.CursorPagination(
+                next_cursor_key=lambda x: None)
+            self.assertEqual([0, 1, 2], list(things.iter_members(pagination)))
+
+    def test_read_ahead(self):
+        with StandInServer(self.respond) as server:
+            things = self.Things(server.url + '/link')
+            for read_ahead in (0, 1, 2):
+                del server.requests[:]
+                members = things.iter_members(read_ahead=read_ahead)
+                self.assertEqual(0, next(members))
+                time.sleep(0.1)
+                self.assertEqual(1 + read_ahead, len(server.requests))
+                members.close()
+                time.sleep(0.1)
+                self.assertEqual(1 + read_ahead, len(server.requests))
+
+    def test_error(self):
+        with StandInServer(self.respond) as server:
+            things = self.Things(server.url + '/link')
+            for read_ahead in (0, 1):
+                members = things.iter_members(read_ahead=read_ahead,
+                                              params=dict(fail=1))
+                self.assertEqual(list(range(6)),
+                                 [next(members) for _ in range(6)])
+                self.assertRaises(requests.HTTPError, next, members)
+
+
 class RestCallTestCase(TestCase):
 
     """This test case contains actual calls to public APIs.
@@ -63,6 +63,157 @@ class AddToAllInvalidTestCase(AddToAllTestMixin, TestCase):
         self.assertRaises(TypeError, self.func, TestClass)
 
 
+class CaseConverterTestCase(TestCase):
+
+    def setUp(self):
+        self.converter = pyneric.util.CaseConverter(cache_size=2)
+
+    def test_pascalize(self):
+        name = 'basic_python_identifier'
+        self.assertEqual('BasicPythonIdentifier',
+                         self.converter.pascalize(name))
+        self.assertEqual('BasicPythonIdentifier',
+                         self.converter.pascalize(name))
+        self.assertEqual(1, self.converter.cache.hits)
+
+    def test_underscore(self):
+        name = 'IdentifierWITHMultipleUppers'
+        self.assertEqual('identifier_with_multiple_uppers',
+                         self.converter.underscore(name))
+        self.assertEqual('identifier_w_i_t_h_multiple_uppers',
+                         self.converter.underscore(name, multicap=False))
+        self.assertEqual('identifier_with_multiple_uppers',
+                         self.converter.underscore(name))
+        self.assertEqual(1, self.converter.cache.hits)
+
+    def test_invalid_not_cached(self):
+        name = 'B@sicPythonIdentifier'
+        for _ in range(2):
+            self.assertRaises(ValueError, self.converter.underscore, name)
+        self.assertEqual(0, len(self.converter.cache))
+        self.assertEqual('b@sic_python_identifier',
+                         self.converter.underscore(name, validate=False))
+        self.assertRaises(ValueError, self.converter.underscore, name)
+
+    def test_type_unhashable(self):
+        self.assertRaises(TypeError, self.converter.underscore, [])
+        self.assertRaises(TypeError, self.converter.pascalize_many, [[]])
+
+    def test_many(self):
+        names = ['BasicName', 'OtherName', 'BasicName', 'ThirdName']
+        expected = [pyneric.util.underscore(x) for x in names]
+        self.assertEqual(expected, self.converter.underscore_many(names))
+        names = [pyneric.util.underscore(x) for x in names]
+        expected = [pyneric.util.pascalize(x) for x in names]
+        self.assertEqual(expected, self.converter.pascalize_many(names))
+
+
+class ConvertKeyEventsTestCase(TestCase):
+
+    func = staticmethod(pyneric.util.convert_key_events)
+
+    def test_basic(self):
+        events = [('start_map', None), ('map_key', 'TheKey'),
+                  ('string', 'TheValue'), ('end_map', None)]
+        expected = [('start_map', None), ('map_key', 'the_key'),
+                    ('string', 'TheValue'), ('end_map', None)]
+        self.assertEqual(expected, list(self.func(iter(events))))
+
+    def test_camel_case(self):
+        events = [('map_key', 'theKey'), ('map_key', '_the_key')]
+        self.assertEqual([('map_key', 'the_key'), ('map_key', '_the_key')],
+                         list(self.func(events)))
+
+    def test_key_cache(self):
+        calls = []
+
+        def convert(key):
+            calls.append(key)
+            return key.lower()
+
+        events = [('map_key', 'A'), ('number', 1), ('map_key', 'A')]
+        self.assertEqual([('map_key', 'a'), ('number', 1), ('map_key', 'a')],
+                         list(self.func(events, convert)))
+        self.assertEqual(['A'], calls)
+
+
+class ConvertKeysTestCase(TestCase):
+
+    func = staticmethod(pyneric.util.convert_keys)
+
+    def setUp(self):
+        self.document = {'TopLevel': [{'ItemId': 1, 'SubItems': [[{'X': 2}]]},
+                                      {'ItemId': 3, 'SubItems': []}],
+                         'Other': 'NotAKey', 5: {'Y': None}}
+        self.expected = {'top_level': [{'item_id': 1,
+                                        'sub_items': [[{'x': 2}]]},
+                                       {'item_id': 3, 'sub_items': []}],
+                         'other': 'NotAKey', 5: {'y': None}}
+
+    def test_copy(self):
+        result = self.func(self.document)
+        self.assertEqual(self.expected, result)
+        self.assertIn('TopLevel', self.document)
+        self.assertIsNot(self.document['TopLevel'], result['top_level'])
+
+    def test_in_place(self):
+        items = self.document['TopLevel']
+        result = self.func(self.document, in_place=True)
+        self.assertIs(self.document, result)
+        self.assertEqual(self.expected, result)
+        self.assertIs(items, result['top_level'])
+
+    def test_pascalize(self):
+        result = self.func(self.expected, pyneric.util.pascalize)
+        self.assertEqual(self.document, result)
+
+    def test_camel_case(self):
+        document = {'fooBar': [{'getHTTPResponse': 1, 'x': 2}],
+                    'snake_case': 3, '_private': 4, '__dunder__': 5}
+        self.assertEqual({'foo_bar': [{'get_http_response': 1, 'x': 2}],
+                          'snake_case': 3, '_private': 4, '__dunder__': 5},
+                         self.func(document))
+
+    def test_collision(self):
+        for in_place in (False, True):
+            document = {'fooBar': 1, 'foo_bar': 2}
+            self.assertRaises(ValueError, self.func, document,
+                              in_place=in_place)
+            self.assertEqual({'fooBar': 1, 'foo_bar': 2}, document)
+
+    def test_in_place_failure(self):
+        document = {'fooBar': 1, 'nested': [{'aB': 2}],
+                    'last': {'bad key': 3}}
+        self.assertRaises(ValueError, self.func, document, in_place=True)
+        self.assertEqual({'fooBar': 1, 'nested': [{'aB': 2}],
+                          'last': {'bad key': 3}}, document)
+
+    def test_key_cache(self):
+        calls = []
+
+        def convert(key):
+            calls.append(key)
+            return key.lower()
+
+        document = [{'A': x} for x in range(10)]
+        self.assertEqual([{'a': x} for x in range(10)],
+                         self.func(document, convert))
+        self.assertEqual(['A'], calls)
+
+    def test_not_container(self):
+        value = object()
+        self.assertIs(value, self.func(value))
+
+    def test_deep(self):
+        document = leaf = {}
+        for _ in range(5000):
+            leaf['Next'] = leaf = {}
+        result = self.func(document)
+        for _ in range(5000):
+            result = result['next']
+        self.assertEqual({}, result)
+
+
 class GetFromDictOrObjectsTestCase(TestCase):
 
     func = staticmethod(pyneric.util.get_from_dict_or_objects)
@@ -112,6 +263,42 @@ class GetFunctionNameTestCase(TestCase):
         inner()
 
 
+class LRUCacheTestCase(TestCase):
+
+    def test_eviction(self):
+        cache = pyneric.util.LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(1, cache['a'])
+        cache['c'] = 3
+        self.assertEqual(2, len(cache))
+        self.assertNotIn('b', cache)
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_counts(self):
+        cache = pyneric.util.LRUCache()
+        cache['a'] = 1
+        cache.get('a')
+        self.assertRaises(KeyError, cache.__getitem__, 'b')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+        cache.clear()
+        self.assertEqual((0, 0, 0), (len(cache), cache.hits, cache.misses))
+
+    def test_delete_and_pop(self):
+        cache = pyneric.util.LRUCache()
+        cache['a'] = 1
+        cache['b'] = 2
+        del cache['a']
+        self.assertEqual(2, cache.pop('b'))
+        self.assertIsNone(cache.pop('b'))
+        self.assertEqual(0, len(cache))
+
+    def test_invalid_maxsize(self):
+        self.assertRaises(ValueError, pyneric.util.LRUCache, 0)
+
+
 class ModuleAttributesTestCase(TestCase):
 
     func = staticmethod(pyneric.util.module_attributes)
@@ -190,6 +377,20 @@ class PascalizeTestCase(TestCase):
         self.assertRaises(TypeError, self.func, object(), validate=False)
 
 
+class PascalizeManyTestCase(TestCase):
+
+    func = staticmethod(pyneric.util.pascalize_many)
+
+    def test_basic(self):
+        names = ('basic_identifier', 'other', 'basic_identifier')
+        self.assertEqual(['BasicIdentifier', 'Other', 'BasicIdentifier'],
+                         self.func(names))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self.func, ['valid', 'in valid'])
+        self.assertEqual(['In valid'], self.func(['in valid'], validate=False))
+
+
 class TryfTestCase(TestCase):
 
     func = staticmethod(pyneric.util.tryf)
@@ -272,6 +473,23 @@ class UnderscoreTestCase(TestCase):
         self.assertRaises(TypeError, self.func, object(), validate=False)
 
 
+class UnderscoreManyTestCase(TestCase):
+
+    func = staticmethod(pyneric.util.underscore_many)
+
+    def test_basic(self):
+        names = ('BasicIdentifier', 'UppersAtEND', 'BasicIdentifier')
+        self.assertEqual(['basic_identifier', 'uppers_at_end',
+                          'basic_identifier'], self.func(names))
+
+    def test_multicap_false(self):
+        self.assertEqual(['uppers_at_e_n_d'],
+                         self.func(['UppersAtEND'], multicap=False))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self.func, ['Valid', 'In valid'])
+
+
 class ValidPythonIdentifierTestCase(TestCase):
 
     func = staticmethod(pyneric.util.valid_python_identifier)
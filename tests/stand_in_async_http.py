@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""A local stand-in asyncio HTTP server for tests of asynchronous requests.
+
+This module requires Python 3.5+.
+
+"""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import asyncio
+import json
+
+_current_task = getattr(asyncio, 'current_task', None)
+if _current_task is None:  # Python < 3.7
+    _current_task = asyncio.Task.current_task
+
+
+class StandInRequest(object):
+
+    """A request received by a `StandInAsyncServer`."""
+
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers  # keyed by lower-case name
+        self.body = body
+
+
+async def echo(request):
+    """Respond with a JSON description of the request."""
+    body = json.dumps(dict(method=request.method, path=request.path,
+                           body=request.body.decode('utf-8'),
+                           content_type=request.headers.get('content-type')))
+    return 200, {'Content-Type': 'application/json'}, body.encode('utf-8')
+
+
+def delayed(seconds, respond=echo):
+    """Return a responder like *respond* that first sleeps for *seconds*."""
+    async def delayed_respond(request):
+        await asyncio.sleep(seconds)
+        return await respond(request)
+    return delayed_respond
+
+
+def routed(responses, respond=echo):
+    """Return a responder of fixed responses keyed by path.
+
+    Requests for other paths are responded to by *respond*.
+
+    """
+    async def routed_respond(request):
+        try:
+            return responses[request.path]
+        except KeyError:
+            return await respond(request)
+    return routed_respond
+
+
+class StandInAsyncServer(object):
+
+    """An HTTP/1.1 server on an unused local port in the current event loop.
+
+    :param respond: A coroutine function given the `StandInRequest` and
+        returning the status, headers (dict), and body (bytes) of the
+        response; by default, :func:`echo`.  The body may instead be a list
+        of byte strings sent as chunks, or the whole response may instead be
+        bytes sent as is before the connection is closed.
+
+    The number of connections accepted, the (method, path) of each request
+    received, and the maximum number of requests handled at once are
+    recorded in the :attr:`connections`, :attr:`requests`, and
+    :attr:`max_concurrency` attributes.  The server runs while used as an
+    asynchronous context manager.
+
+    """
+
+    def __init__(self, respond=echo):
+        self.respond = respond
+        self.connections = 0
+        self.requests = []
+        self.concurrency = self.max_concurrency = 0
+        self._server = None
+        self._writers = set()  # of idle connections
+        self._tasks = set()  # handling connections
+
+    @property
+    def url(self):
+        port = self._server.sockets[0].getsockname()[1]
+        return 'http://127.0.0.1:{}'.format(port)
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(
+            self._handle, '127.0.0.1', 0)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._server.close()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
+    def close_connections(self):
+        """Close the connections (kept alive) that are not handling requests.
+        """
+        for writer in list(self._writers):
+            writer.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        task = _current_task()
+        self._tasks.add(task)
+        try:
+            while await self._handle_request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError,
+                asyncio.CancelledError):
+            pass  # The connection is closed (or the server is closing).
+        finally:
+            self._tasks.discard(task)
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _handle_request(self, reader, writer):
+        line = await reader.readline()
+        if not line:
+            return False
+        method, path, _ = line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        body = await reader.readexactly(length) if length else b''
+        self.requests.append((method, path))
+        self._writers.discard(writer)
+        self.concurrency += 1
+        self.max_concurrency = max(self.max_concurrency, self.concurrency)
+        try:
+            response = await self.respond(
+                StandInRequest(method, path, headers, body))
+        finally:
+            self.concurrency -= 1
+        if isinstance(response, bytes):
+            writer.write(response)
+            await writer.drain()
+            return False
+        status, response_headers, content = response
+        lines = ['HTTP/1.1 {} Stand-In'.format(status)]
+        lines.extend('{}: {}'.format(*x) for x in response_headers.items())
+        if isinstance(content, list):
+            lines.append('Transfer-Encoding: chunked')
+            content = b''.join(
+                '{:x}\r\n'.format(len(x)).encode('ascii') + x + b'\r\n'
+                for x in content + [b''])
+        else:
+            lines.append('Content-Length: {}'.format(len(content)))
+        lines.extend(('', ''))
+        if method == 'HEAD':
+            content = b''
+        writer.write('\r\n'.join(lines).encode('latin-1') + content)
+        await writer.drain()
+        self._writers.add(writer)
+        return 'close' not in response_headers.get('Connection', '')
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""A local stand-in HTTP server for tests (and benchmarks) making requests."""
+
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import json
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+def echo(request):
+    """Respond with a JSON description of the request."""
+    body = json.dumps(dict(method=request.command, path=request.path,
+                           cookie=request.headers.get('Cookie')))
+    headers = {'Content-Type': 'application/json'}
+    if request.path.startswith('/set-cookie'):
+        headers['Set-Cookie'] = 'name=value; Path=/'
+    return 200, headers, body.encode('utf-8')
+
+
+def flaky(failures, respond=echo):
+    """Return a responder like *respond* that first fails some requests.
+
+    :param failures: The failures of the first requests in order: a status
+        code to respond with, or `None` to close the connection without
+        responding.
+
+    """
+    failures = list(failures)
+    lock = threading.Lock()
+
+    def flaky_respond(request):
+        with lock:
+            if failures:
+                failure = failures.pop(0)
+                if failure is None:
+                    return None
+                return failure, {}, b''
+        return respond(request)
+    return flaky_respond
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    # Write each response at once (flushed after each request is handled)
+    # to avoid delays from Nagle's algorithm on kept-alive connections.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        BaseHTTPRequestHandler.handle(self)
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path))
+        response = self.server.respond(self)
+        if response is None:
+            self.close_connection = True
+            return
+        status, headers, body = response
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_GET = do_HEAD = do_OPTIONS = do_POST = do_PUT = do_PATCH = \
+        do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class StandInServer(object):
+
+    """A threaded HTTP/1.1 server on an unused local port.
+
+    :param respond: A function given the request handler (with a `body`
+        attribute) and returning the status, headers (dict), and body (bytes)
+        of the response, or `None` to close the connection without
+        responding; by default, :func:`echo`.
+
+    The number of connections accepted and the (method, path) of each request
+    received are recorded in the :attr:`connections` and :attr:`requests`
+    attributes.  The server runs while used as a context manager.
+
+    """
+
+    def __init__(self, respond=echo):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.respond = respond
+        self._server.lock = threading.Lock()
+        self._server.connections = 0
+        self._server.requests = []
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    @property
+    def connections(self):
+        return self._server.connections
+
+    @property
+    def requests(self):
+        return self._server.requests
+
+    def __enter__(self):
+        # Poll often so that shutting down does not delay the tests.
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.01,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()